@@ -1,12 +1,64 @@
 const { spawn } = require('child_process');
 const path = require('path');
 
-const MAX_CHUNK_SIZE = 9999;
+// Version 2 of the stdin/stdout protocol: after a "PROTOCOL 2" handshake line, requests and responses are
+// JSON messages, each preceded by its length as a 4-byte big-endian integer, so text can contain newlines
+const PROTOCOL_HANDSHAKE = 'PROTOCOL 2';
+const FRAME_HEADER_SIZE = 4;
 
 let pythonProcess = null;
 let isInitialized = false;
 let pendingRequests = new Map();
 let requestId = 0;
+let outputBuffer = Buffer.alloc(0);
+let handshakeComplete = false;
+
+function rejectPendingRequests(error) {
+    for (const { reject } of pendingRequests.values()) {
+        reject(error);
+    }
+    pendingRequests.clear();
+}
+
+function handleOutput(data) {
+    outputBuffer = Buffer.concat([outputBuffer, data]);
+    if (!handshakeComplete) {
+        const newlineIndex = outputBuffer.indexOf(0x0a);
+        if (newlineIndex === -1) return;
+        const reply = outputBuffer.subarray(0, newlineIndex).toString('utf8');
+        outputBuffer = outputBuffer.subarray(newlineIndex + 1);
+        if (reply !== `${PROTOCOL_HANDSHAKE} OK`) {
+            rejectPendingRequests(new Error(`Unexpected protocol handshake reply: ${reply}`));
+            return;
+        }
+        handshakeComplete = true;
+    }
+    // Parse the response frames: {"id": ..., "text": ...}, or {"id": ..., "error": ...} for a failed request
+    while (outputBuffer.length >= FRAME_HEADER_SIZE) {
+        const length = outputBuffer.readUInt32BE(0);
+        if (outputBuffer.length < FRAME_HEADER_SIZE + length) break;
+        const message = JSON.parse(outputBuffer.subarray(FRAME_HEADER_SIZE, FRAME_HEADER_SIZE + length).toString('utf8'));
+        outputBuffer = outputBuffer.subarray(FRAME_HEADER_SIZE + length);
+        const request = pendingRequests.get(message.id);
+        if (request) {
+            pendingRequests.delete(message.id);
+            if (message.error !== undefined) {
+                request.reject(new Error(`Conversion failed: ${message.error}`));
+                continue;
+            }
+            // Plain text conversion ends every line with a newline; only keep the last one if the input had it
+            const dropNewline = !request.endsWithNewline && message.text.endsWith('\n');
+            request.resolve(dropNewline ? message.text.slice(0, -1) : message.text);
+        }
+    }
+}
+
+function writeFrame(message) {
+    const payload = Buffer.from(JSON.stringify(message), 'utf8');
+    const header = Buffer.alloc(FRAME_HEADER_SIZE);
+    header.writeUInt32BE(payload.length, 0);
+    pythonProcess.stdin.write(Buffer.concat([header, payload]));
+}
 
 function initializePythonProcess() {
     if (isInitialized) return;
@@ -38,76 +90,52 @@ function initializePythonProcess() {
         stdio: ['pipe', 'pipe', 'pipe']
     });
     isInitialized = true;
-    let buffer = '';
-    pythonProcess.stdout.on('data', (data) => {
-        buffer += data.toString();
-        const lines = buffer.split('\n');
-        buffer = lines.pop();
-        for (const line of lines) {
-            // Parse the response format: "ID:RESULT"
-            const colonIndex = line.indexOf(':');
-            if (colonIndex !== -1) {
-                const id = parseInt(line.substring(0, colonIndex));
-                const result = line.substring(colonIndex + 1);
-                const request = pendingRequests.get(id);
-                if (request) {
-                    pendingRequests.delete(id);
-                    request.resolve(result);
-                }
-            }
-        }
+    outputBuffer = Buffer.alloc(0);
+    handshakeComplete = false;
+    // Requests can follow the handshake straight away, since the converter reads its input in order
+    pythonProcess.stdin.write(`${PROTOCOL_HANDSHAKE}\n`);
+    // A process closed by closePythonProcess may still answer, or exit, after its replacement has started
+    const child = pythonProcess;
+    child.stdout.on('data', (data) => {
+        if (pythonProcess === child) handleOutput(data);
     });
-    pythonProcess.stderr.on('data', (data) => {
+    child.stderr.on('data', (data) => {
         // Silence stderr in production
     });
-    pythonProcess.on('exit', (code) => {
+    child.on('exit', (code) => {
+        if (pythonProcess !== child) return;
         isInitialized = false;
         pythonProcess = null;
+        // Requests still waiting will never be answered
+        rejectPendingRequests(new Error(`Converter exited with code ${code}`));
     });
 }
 
-// Internal function that processes a single chunk without recursion
-async function processChunk(text) {
+// Convert text of any length in a single request. options.mode is "auto" (HTML if the text starts with an HTML
+// doctype), "plain" or "html", e.g. for whole XHTML documents.
+async function latin2shaw(text, options = {}) {
+    initializePythonProcess();
     return new Promise((resolve, reject) => {
         const id = requestId++;
-        pendingRequests.set(id, { resolve, reject });
-        // Send request with ID: "ID:TEXT"
-        pythonProcess.stdin.write(`${id}:${text}\n`);
+        pendingRequests.set(id, { resolve, reject, endsWithNewline: text.endsWith('\n') });
+        writeFrame({ id, text, options });
     });
 }
 
-async function latin2shaw(text) {
-    initializePythonProcess();
-    if (text.length > MAX_CHUNK_SIZE) {
-        // Split into chunks and process sequentially
-        let result = '';
-        for (let i = 0; i < text.length; i += MAX_CHUNK_SIZE) {
-            const chunk = text.slice(i, i + MAX_CHUNK_SIZE);
-            // Await each chunk in sequence to preserve order
-            // eslint-disable-next-line no-await-in-loop
-            result += await processChunk(chunk);
-        }
-        return result;
-    }
-    return processChunk(text);
-}
-
 function closePythonProcess() {
     if (pythonProcess) {
         try {
             // Clear any pending requests
-            for (const { reject } of pendingRequests.values()) {
-                reject(new Error('Process terminated'));
-            }
-            pendingRequests.clear();
+            rejectPendingRequests(new Error('Process terminated'));
             
             // End stdin gracefully
-            pythonProcess.stdin.end();
+            const child = pythonProcess;
+            child.stdin.end();
             
-            // Kill the process after a short delay
+            // Kill the process after a short delay; by then a new one may have been started in its place
             setTimeout(() => {
-                if (pythonProcess && !pythonProcess.killed) {
-                    pythonProcess.kill();
+                if (!child.killed) {
+                    child.kill();
                 }
             }, 100);
             
@@ -37,10 +37,24 @@ describe('latin2shaw-wrapper', () => {
   });
 
   it('handles very large input', async () => {
-    const big = 'hello '.repeat(10000); // > 9999 chars
+    const big = 'hello '.repeat(10000); // Sent as a single request
     const result = await latin2shaw(big);
     expect(typeof result).toBe('string');
     expect(result.length).toBeGreaterThan(0);
+    expect(result).not.toContain('\n');
+  });
+
+  it('keeps newlines in multi-line text', async () => {
+    const result = await latin2shaw('hello\nworld\n');
+    expect(result.split('\n')).toHaveLength(3);
+    expect(result.endsWith('\n')).toBe(true);
+  });
+
+  it('converts a whole XHTML document in html mode', async () => {
+    const xhtml = '<?xml version="1.0" encoding="utf-8"?>\n<html><body>\n<p class="hello">hello</p>\n</body></html>';
+    const result = await latin2shaw(xhtml, { mode: 'html' });
+    expect(result.startsWith('<?xml version="1.0" encoding="utf-8"?>\n<html><body>\n<p class="hello">')).toBe(true);
+    expect(result).toMatch(/\uD801[\uDC50-\uDC7F]/);
   });
 
   it('handles malformed input (binary data)', async () => {
@@ -49,6 +63,12 @@ describe('latin2shaw-wrapper', () => {
     expect(typeof result).toBe('string');
   });
 
+  it('rejects a request the converter reports as failed', async () => {
+    await expect(latin2shaw('hello', { mode: 'no-such-mode' })).rejects.toThrow(/Conversion failed/);
+    // Later requests are still answered
+    expect(await latin2shaw('hello')).toMatch(/\uD801[\uDC50-\uDC7F]/);
+  });
+
   it('rejects all pending requests if the process is closed', async () => {
     const p1 = latin2shaw('test1');
     const p2 = latin2shaw('test2');
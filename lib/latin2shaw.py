@@ -1,33 +1,1153 @@
+from __future__ import annotations
+
 import json
 import csv
+import ctypes
+import ctypes.util
 import re
 import sys
-import unidecode
-import smartypants
-import spacy
-from spacy.util import compile_infix_regex, compile_prefix_regex, compile_suffix_regex, filter_spans
-from spacy.tokens import Doc, Span
-from spacy.matcher import PhraseMatcher
-from bs4 import BeautifulSoup
-import eng_to_ipa as ipa
 import subprocess
+import multiprocessing
+import multiprocessing.connection
+import os
+import platform
+import random
+import signal
+import functools
+import gc
+import hashlib
+import itertools
+import html
+import html.entities
+import importlib.metadata
+import io
+import mmap
+import posixpath
+import shutil
+import sqlite3
+import struct
+import time
+import urllib.parse
+import zipfile
+import zlib
+import xml.etree.ElementTree as ElementTree
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator
+
+# spaCy, BeautifulSoup, smartypants, eng_to_ipa and asyncio are slow to import, so they are only imported where they are first
+# needed; commands like build-index never load them at all
+if TYPE_CHECKING:
+    import asyncio
+    import concurrent.futures
+    import spacy
+    from spacy.tokens import Doc
+
+
+# Reserved stdin/stdout request that returns profiling counters instead of converting text
+STATS_REQUEST = "STATS"
+# Socket server request that withdraws an earlier request
+CANCEL_REQUEST = "CANCEL"
+
+# How convert_text decides whether its input is HTML
+CONVERSION_MODES = ("auto", "plain", "html")
+
+# Versions of the stdin/stdout protocol; clients select a version other than the first with a "PROTOCOL N" line
+PROTOCOL_VERSIONS = (1, 2)
+_FRAME_HEADER = struct.Struct(">I")
+
+# Bump when the layout of pipeline snapshots or phrase caches changes
+PIPELINE_SNAPSHOT_VERSION = 2
+PHRASE_CACHE_VERSION = 1
+
+# Rules added to spaCy's tokeniser so that initial and final dashes and dashes between words aren't stuck to one of
+# the surrounding words. Pipeline snapshots record a hash of them, so changing them makes old snapshots stale.
+TOKENIZER_PREFIXES = (r'''^[-–—]+''',)
+TOKENIZER_INFIXES = (r'''[.,?!:;\-–—"~\(\)\[\]]+''',)
+TOKENIZER_SUFFIXES = (r'''[-–—]+$''',)
+
+# Bump when the phonetic fallback changes in a way that invalidates cached spellings
+PHONETIC_CACHE_VERSION = 1
+
+READLEX_INDEX_MAGIC = b"SHAWIDX1"
+# Header: magic, number of keys, number of hash table slots, SHA-256 of the source JSON
+_INDEX_HEADER = struct.Struct("<8sII32s")
+_UINT32 = struct.Struct("<I")
+_EMPTY_SLOT = 0xFFFFFFFF
+
+# Media types of the EPUB spine items that are converted; anything else in the book is copied unchanged
+EPUB_DOCUMENT_TYPES = ("application/xhtml+xml", "text/html")
+_OPF_NAMESPACE = "{http://www.idpf.org/2007/opf}"
+_CONTAINER_NAMESPACE = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+# Entities that XML defines itself; XHTML documents can't use any other named entity
+_XML_ENTITIES = frozenset(("amp", "lt", "gt", "quot", "apos"))
+
+
+@functools.cache
+def _source_hash() -> str:
+    """Return the SHA-256 of this module's source, so that caches of converted text don't outlive code changes."""
+    try:
+        with open(__file__, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return "unknown"
+
+
+# Plain text containing any of these characters is post-processed by smartypants and BeautifulSoup themselves, since
+# they are markup, entities or smartypants escapes
+_LEGACY_TYPOGRAPHY_REGEX = re.compile("[<>&\\\\`]")
+# smartypants' character classes for deciding whether a quote opens or closes
+_QUOTE_CLOSE_CLASS = r"[^\ \t\r\n\[\{\(\-]"
+_QUOTE_PUNCT_CLASS = r"""[!"#\$\%'()*+,-.\/:;<=>?\@\[\\\]\^_`{|}~]"""
+# smartypants' quote rules in the order it applies them, writing the angle quotes the curly ones are mapped to. Its
+# opening rules also list dashes and entities, but in plain text without "&" only whitespace can match there (the
+# decimal dash entities are lost to a comment in its verbose pattern)
+_QUOTE_RULES: list[tuple[re.Pattern, str]] = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r""""'(?=\w)""", "«‹"),
+    (r"""'"(?=\w)""", "‹«"),
+    (r"\b'(?=\d{2}s)", "›"),
+    (r"(\s)'(?=\w)", r"\1‹"),
+    (rf"({_QUOTE_CLOSE_CLASS})'(?!\s|s\b|\d)", r"\1›"),
+    (rf"({_QUOTE_CLOSE_CLASS})'(\s|s\b)", r"\1›\2"),
+    (r"'", "‹"),
+    (r'(\s)"(?=\w)', r"\1«"),
+    (r'"(?=\s)', "»"),
+    (rf'^"(?={_QUOTE_PUNCT_CLASS})', "»"),
+    (rf'({_QUOTE_CLOSE_CLASS})"', r"\1»"),
+    (r'"', "«"),
+)]
+
+
+def educate_plain_text(text: str) -> str | None:
+    """
+    Give plain text the same result as smartypants, the mapping of curly quotes to angle quotes and the BeautifulSoup
+    round-trip in _finish_text, writing the characters straight out rather than as entities to be decoded again.
+
+    Returns None for text this can't handle identically (see _LEGACY_TYPOGRAPHY_REGEX). The quote rules depend on what
+    earlier ones have done, so they still run in turn, but only over text that has quotes at all.
+    """
+    if _LEGACY_TYPOGRAPHY_REGEX.search(text) or text.isspace():
+        # BeautifulSoup also collapses text that is nothing but whitespace
+        return None
+    text = text.replace("--", "—").replace("...", "…").replace(". . .", "…").replace("''", "»")
+    if "'" in text or '"' in text:
+        for pattern, replacement in _QUOTE_RULES:
+            text = pattern.sub(replacement, text)
+    return text
+
+
+class SymbolMap:
+    """
+    Replaces symbols of one or two characters, matching them left to right and preferring two-character symbols, and
+    keeps every other character as it is.
+
+    Single characters are replaced by str.translate after the two-character symbols, so only those need a regex; this
+    relies on the replacements only containing characters that are unmapped or map to themselves.
+    """
+
+    def __init__(self, mapping: dict[str, str]):
+        self.mapping = mapping
+        digraphs: list[str] = [symbol for symbol in mapping if len(symbol) == 2]
+        self._digraph_regex: re.Pattern | None = re.compile("|".join(map(re.escape, digraphs))) if digraphs else None
+        self._table: dict[int, str] = {ord(symbol): value for symbol, value in mapping.items() if len(symbol) == 1}
+
+    def __call__(self, text: str) -> str:
+        if self._digraph_regex is not None:
+            text = self._digraph_regex.sub(lambda match: self.mapping[match[0]], text)
+        return text.translate(self._table)
+
+
+def default_index_path(readlex_path: str) -> str:
+    """Return where the compiled index for a ReadLex JSON file lives by default."""
+    return os.path.splitext(readlex_path)[0] + ".idx"
+
+
+def default_snapshot_path(phrases_path: str) -> str:
+    """Return where the spaCy pipeline snapshot lives by default, which is next to the phrases file."""
+    return os.path.join(os.path.dirname(phrases_path), "spacy-snapshot")
+
+
+def default_phrase_cache_path(phrases_path: str) -> str:
+    """Return where the tokenised patterns for a phrases file are cached by default."""
+    return os.path.splitext(phrases_path)[0] + ".patterns"
+
+
+def build_readlex_index(readlex_path: str, index_path: str) -> int:
+    """
+    Compile a ReadLex converter JSON file into a binary index that ReadLexIndex can memory-map.
+
+    The file holds a header, the key and record offset tables, an open-addressing hash table of key numbers and then
+    the UTF-8 keys and records. Each record is the word's (tag, Shaw) entries joined by control characters, in ReadLex
+    order. Returns the number of words written.
+    """
+    with open(readlex_path, "rb") as file:
+        json_data = file.read()
+    readlex_dict: dict[str, list[dict[str, str]]] = json.loads(json_data)
+
+    keys: list[bytes] = sorted(word.encode("utf-8") for word in readlex_dict)
+    key_offsets: list[int] = [0]
+    record_offsets: list[int] = [0]
+    key_blob = bytearray()
+    record_blob = bytearray()
+    for key in keys:
+        key_blob += key
+        key_offsets.append(len(key_blob))
+        entries = readlex_dict[key.decode("utf-8")]
+        record_blob += "\x1e".join(f"{entry['tag']}\x1f{entry['Shaw']}" for entry in entries).encode("utf-8")
+        record_offsets.append(len(record_blob))
+
+    table_size = 1
+    while table_size < 2 * len(keys):
+        table_size *= 2
+    table: list[int] = [_EMPTY_SLOT] * table_size
+    for number, key in enumerate(keys):
+        slot = zlib.crc32(key) & (table_size - 1)
+        while table[slot] != _EMPTY_SLOT:
+            slot = (slot + 1) & (table_size - 1)
+        table[slot] = number
+
+    header = _INDEX_HEADER.pack(READLEX_INDEX_MAGIC, len(keys), table_size, hashlib.sha256(json_data).digest())
+    tables = struct.pack(f"<{len(key_offsets)}I", *key_offsets) + struct.pack(f"<{len(record_offsets)}I", *record_offsets)
+    tables += struct.pack(f"<{table_size}I", *table)
+
+    # Write to a temporary file first so running converters never see a half-written index
+    temp_path = index_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(header + tables + key_blob + record_blob)
+    os.replace(temp_path, index_path)
+    return len(keys)
+
+
+class ReadLexIndex(Mapping):
+    """
+    A read-only, memory-mapped view of a compiled ReadLex index, used in place of the dict loaded from JSON.
+
+    Nothing is decoded up front, so opening the index is nearly instant, and every process that maps the same file
+    shares its pages through the OS page cache.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._key_count, self._table_size, source_hash = _INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != READLEX_INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a ReadLex index")
+        self.source_hash: str = source_hash.hex()
+        self._key_offsets = _INDEX_HEADER.size
+        self._record_offsets = self._key_offsets + 4 * (self._key_count + 1)
+        self._table = self._record_offsets + 4 * (self._key_count + 1)
+        self._keys = self._table + 4 * self._table_size
+        self._records = self._keys + _UINT32.unpack_from(self._map, self._record_offsets - 4)[0]
+
+    def _span(self, table: int, number: int) -> tuple[int, int]:
+        """Return the start and end offsets of item number in one of the offset tables."""
+        start, end = struct.unpack_from("<II", self._map, table + 4 * number)
+        return start, end
+
+    def _find(self, word: str) -> int:
+        """Return the key number of word, or -1 if it isn't in the index."""
+        key = word.encode("utf-8", errors="surrogatepass")
+        mask = self._table_size - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            number = _UINT32.unpack_from(self._map, self._table + 4 * slot)[0]
+            if number == _EMPTY_SLOT:
+                return -1
+            start, end = self._span(self._key_offsets, number)
+            if self._map[self._keys + start:self._keys + end] == key:
+                return number
+            slot = (slot + 1) & mask
+
+    def __contains__(self, word: object) -> bool:
+        return isinstance(word, str) and self._find(word) != -1
+
+    def __getitem__(self, word: str) -> list[dict[str, str]]:
+        number = self._find(word)
+        if number == -1:
+            raise KeyError(word)
+        start, end = self._span(self._record_offsets, number)
+        record = self._map[self._records + start:self._records + end].decode("utf-8")
+        return [{"tag": tag, "Shaw": shaw} for tag, shaw in (entry.split("\x1f") for entry in record.split("\x1e"))]
+
+    def __iter__(self) -> Iterator[str]:
+        for number in range(self._key_count):
+            start, end = self._span(self._key_offsets, number)
+            yield self._map[self._keys + start:self._keys + end].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._key_count
+
+
+class ReadLexWord:
+    """
+    A ReadLex word's spellings resolved by part of speech, each as a pair of the spelling without and with a namer dot
+    (which initialisms marked with ⸰ never get).
+
+    spelling() gives the first entry that has the tag, is for every part of speech ("0"), or is a common noun (NN or
+    NNS) where the tag is for a proper noun (NNP or NNPS), as convert() has always picked them. base_spelling() leaves
+    out the proper noun fallback, for the first part of a word with an apostrophe.
+    """
+
+    __slots__ = ("by_tag", "base_by_tag", "default", "first", "unused")
+
+    def __init__(self, entries: list[dict[str, str]]):
+        first: str = entries[0]["Shaw"]
+        self.first: str = first
+        if entries[0]["tag"] == "0":
+            # The first entry is for every part of speech, so it is the spelling whatever the tag
+            self.default: tuple[str, str] | None = (first, first if first.startswith("⸰") else "·" + first)
+            self.by_tag: dict[str, tuple[str, str]] | None = None
+            self.base_by_tag: dict[str, tuple[str, str]] | None = None
+            self.unused: int = len(entries) - 1
+            return
+
+        # The position of the first entry with each tag
+        positions: dict[str, int] = {}
+        for position, entry in enumerate(entries):
+            positions.setdefault(entry["tag"], position)
+        every_tag: int | None = positions.get("0")
+        base_positions: dict[str, int] = {
+            tag: min(position, every_tag) if every_tag is not None else position
+            for tag, position in positions.items() if tag != "0"
+        }
+        tag_positions: dict[str, int] = dict(base_positions)
+        for proper, common in (("NNP", "NN"), ("NNPS", "NNS")):
+            candidates: list[int] = [positions[tag] for tag in (proper, common, "0") if tag in positions]
+            if proper in positions or common in positions:
+                tag_positions[proper] = min(candidates)
+        self.default = self._spell(entries, every_tag) if every_tag is not None else None
+        self.by_tag = {tag: self._spell(entries, position) for tag, position in tag_positions.items()}
+        self.base_by_tag = {tag: self._spell(entries, position) for tag, position in base_positions.items()}
+        # Entries that no tag ever picks, because an earlier entry has the same tag or is for every part of speech
+        used: set[int] = set(tag_positions.values()) | set(base_positions.values())
+        if every_tag is not None:
+            used.add(every_tag)
+        self.unused = len(entries) - len(used)
+
+    @staticmethod
+    def _spell(entries: list[dict[str, str]], position: int) -> tuple[str, str]:
+        """Return the spelling of the entry at position without and with a namer dot."""
+        shaw: str = entries[position]["Shaw"]
+        return shaw, shaw if shaw.startswith("⸰") else "·" + shaw
+
+    @property
+    def tag_dependent(self) -> bool:
+        """Whether the word is spelt differently depending on its part of speech."""
+        return self.by_tag is not None
+
+    def spelling(self, tag: str) -> tuple[str, str] | None:
+        """Return the (plain, named) spelling of the word tagged tag, or None if no entry applies."""
+        return self.default if self.by_tag is None else self.by_tag.get(tag, self.default)
+
+    def base_spelling(self, tag: str) -> tuple[str, str] | None:
+        """Like spelling(), but without matching proper nouns to common nouns."""
+        return self.default if self.base_by_tag is None else self.base_by_tag.get(tag, self.default)
+
+
+class ResolvedReadLex:
+    """
+    The ReadLex with each word's entries resolved into a ReadLexWord, so that looking up a (word, tag) pair doesn't
+    scan its entries.
+
+    Words are resolved the first time they are looked up and kept, rather than all up front, since most of the ReadLex
+    never comes up in a given book and a ReadLexIndex is meant to open nearly instantly.
+    """
+
+    def __init__(self, readlex: Mapping[str, list[dict[str, str]]]):
+        self.readlex = readlex
+        self._words: dict[str, ReadLexWord] = {}
+
+    def get(self, word: str) -> ReadLexWord | None:
+        """Return the resolved entries of word, or None if it isn't in the ReadLex."""
+        resolved: ReadLexWord | None = self._words.get(word)
+        if resolved is None and word in self.readlex:
+            resolved = self._words[word] = ReadLexWord(self.readlex[word])
+        return resolved
+
+    def report(self) -> dict[str, list[str]]:
+        """
+        List the words with no entry for every part of speech, which are left out entirely where the tagger gives
+        a tag none of their entries has, and those with entries that are never used for any tag.
+        """
+        missing_default: list[str] = []
+        ambiguous: list[str] = []
+        for word, entries in self.readlex.items():
+            if entries[0]["tag"] == "0":
+                # Any later entries are never used, without needing to resolve the word
+                if len(entries) > 1:
+                    ambiguous.append(word)
+                continue
+            resolved = ReadLexWord(entries)
+            if resolved.default is None:
+                missing_default.append(word)
+            if resolved.unused:
+                ambiguous.append(word)
+        return {"missing_default": sorted(missing_default), "ambiguous": sorted(ambiguous)}
+
+
+def print_readlex_report(report: dict[str, list[str]], source: str):
+    """Summarise a ResolvedReadLex report on stderr, if there is anything to report."""
+    if report["missing_default"] or report["ambiguous"]:
+        examples = ", ".join(report["ambiguous"][:5])
+        print(f"{source}: {len(report['missing_default'])} words have no entry for every part of speech and "
+              f"{len(report['ambiguous'])} have entries no tag selects{f' (e.g. {examples})' if examples else ''}; "
+              f"run check-readlex for the full lists", file=sys.stderr, flush=True)
+
+
+def changed_readlex_keys(old: Mapping[str, list[dict[str, str]]],
+                         new: Mapping[str, list[dict[str, str]]]) -> set[str]:
+    """Return the words that were added, removed or given different entries between two versions of the ReadLex."""
+    def spellings(entries: list[dict[str, str]] | None) -> list[tuple[str, str]] | None:
+        # Only the tag and Shavian spelling affect conversion, and they are all the compiled index keeps
+        return None if entries is None else [(entry["tag"], entry["Shaw"]) for entry in entries]
+
+    return {word for word in old.keys() | new.keys() if spellings(old.get(word)) != spellings(new.get(word))}
+
+
+def epub_spine_documents(epub: zipfile.ZipFile) -> list[str]:
+    """
+    Return the archive names of an EPUB's XHTML spine items in reading order, found through META-INF/container.xml and
+    the package document it points to.
+    """
+    container = ElementTree.fromstring(epub.read("META-INF/container.xml"))
+    rootfile = container.find(f".//{_CONTAINER_NAMESPACE}rootfile")
+    if rootfile is None or not rootfile.get("full-path"):
+        raise ValueError("META-INF/container.xml names no package document")
+    package_path: str = rootfile.get("full-path")
+    package = ElementTree.fromstring(epub.read(package_path))
+    manifest: dict[str, ElementTree.Element] = {item.get("id"): item for item in package.iter(f"{_OPF_NAMESPACE}item")}
+    archive_names: set[str] = set(epub.namelist())
+
+    documents: list[str] = []
+    for itemref in package.iter(f"{_OPF_NAMESPACE}itemref"):
+        item: ElementTree.Element | None = manifest.get(itemref.get("idref"))
+        if item is None or item.get("media-type") not in EPUB_DOCUMENT_TYPES:
+            continue
+        # Manifest hrefs are URLs relative to the package document
+        href: str = urllib.parse.unquote(item.get("href", "").partition("#")[0])
+        name: str = posixpath.normpath(posixpath.join(posixpath.dirname(package_path), href))
+        if name in archive_names and name not in documents:
+            documents.append(name)
+    return documents
+
+
+def _xml_safe_entities(text: str) -> str:
+    """Replace the HTML named entities in converted text, like &laquo;, with their characters, as XML lacks them."""
+    def replace(match: re.Match) -> str:
+        name: str = match.group(1)
+        if name in _XML_ENTITIES or name not in html.entities.name2codepoint:
+            return match.group(0)
+        return chr(html.entities.name2codepoint[name])
+
+    return re.sub(r"&([A-Za-z][A-Za-z0-9]*);", replace, text)
+
+
+class SqliteCache:
+    """
+    A persistent string-to-string cache in SQLite that several processes can share.
+
+    The cache is stamped with a version string, and opening it with a different version discards the old entries.
+    Writes and access times are buffered and committed in batches of flush_every, and once the cache holds more than
+    max_entries the least recently
+    used entries are evicted. Each process opens its own connection on first use, so a converter that owns a cache
+    can safely be forked into workers.
+    """
+
+    def __init__(self, path: str, version: str, max_entries: int = 100000, flush_every: int = 256):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._writes: dict[str, str] = {}
+        self._touched: set[str] = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this process's connection, opening it and checking the version if necessary."""
+        if self._conn is None or self._pid != os.getpid():
+            # A connection inherited across fork() must not be used, so drop it along with anything the parent buffered
+            self._writes.clear()
+            self._touched.clear()
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, used REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (self.version,))
+            self._conn.execute("COMMIT")
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for key, or None."""
+        conn = self._connection()
+        if key in self._writes:
+            return self._writes[key]
+        row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._touched.add(key)
+        if len(self._touched) >= self.flush_every:
+            self.flush()
+        return row[0]
+
+    def put(self, key: str, value: str):
+        """Store value under key; it is written to disk on the next flush."""
+        self._connection()
+        self._writes[key] = value
+        if len(self._writes) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Commit buffered writes and access times, then evict the least recently used entries if over budget."""
+        if self._conn is None or self._pid != os.getpid() or not (self._writes or self._touched):
+            return
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany("INSERT OR REPLACE INTO entries (key, value, used) VALUES (?, ?, ?)",
+                                   [(key, value, now) for key, value in self._writes.items()])
+            self._conn.executemany("UPDATE entries SET used = ? WHERE key = ?",
+                                   [(now, key) for key in self._touched - self._writes.keys()])
+            excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used LIMIT ?)", (excess,))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._writes.clear()
+        self._touched.clear()
+
+    def migrate(self, old_version: str, keep: Callable[[str], bool]) -> tuple[int, int]:
+        """
+        Restamp a cache made under old_version with this cache's version, deleting the entries whose value keep()
+        rejects, so the rest survive instead of being discarded when the cache is opened.
+
+        Must be called before the cache is first used. Returns the number of entries kept and dropped; if the cache
+        is missing or was made under any other version, nothing is kept.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            except sqlite3.OperationalError:
+                row = None  # Not a cache yet
+            if row is None or row[0] != old_version:
+                conn.execute("ROLLBACK")
+                return 0, 0
+            dropped: list[tuple[str]] = [(key,) for key, value in conn.execute("SELECT key, value FROM entries")
+                                         if not keep(value)]
+            conn.executemany("DELETE FROM entries WHERE key = ?", dropped)
+            kept: int = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (self.version,))
+            conn.execute("COMMIT")
+            return kept, len(dropped)
+        finally:
+            conn.close()
+
+    def close(self):
+        """Flush and close this process's connection."""
+        self.flush()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+
+class LRUDict(OrderedDict):
+    """A dict of at most max_size items, which forgets the least recently used item to make room for a new one."""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class ResultCache:
+    """
+    Converted text fragments keyed by their Latin text, in a bounded in-memory LRU tier with an optional SqliteCache
+    tier on disk behind it.
+
+    Entries are only valid for one version of everything conversion depends on, which the owner passes in; opening the
+    disk tier with another version discards its entries, unless it is migrated first. The disk tier is keyed by the
+    SHA-256 of the text, so long paragraphs don't bloat its index, and each entry also lists the ReadLex keys its
+    conversion looked up, so that a dictionary update only has to discard the entries that used changed words.
+    """
+
+    def __init__(self, version: str, max_entries: int = 10000, path: str | None = None,
+                 disk_max_entries: int = 1000000):
+        self.version = version
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.disk: SqliteCache | None = SqliteCache(path, version, disk_max_entries) if path else None
+        self._memory: LRUDict = LRUDict(max_entries)
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+
+    def get(self, text: str) -> str | None:
+        """Return the cached result for text, or None."""
+        if text in self._memory:
+            self.hits += 1
+            return self._memory[text]
+        if self.disk is not None:
+            entry = self.disk.get(self._digest(text))
+            if entry is not None:
+                result = json.loads(entry)["text"]
+                self.disk_hits += 1
+                self._remember(text, result)
+                return result
+        self.misses += 1
+        return None
+
+    @property
+    def records_keys(self) -> bool:
+        """Whether put() needs the dictionary keys a result used, which only the disk tier keeps."""
+        return self.disk is not None
+
+    def put(self, text: str, result: str, keys: Iterable[str] = ()):
+        """Cache result for text in both tiers, along with the dictionary keys looked up to convert it."""
+        self._remember(text, result)
+        if self.disk is not None:
+            self.disk.put(self._digest(text), json.dumps({"text": result, "keys": sorted(keys)}, ensure_ascii=False))
+
+    def count_repeat(self):
+        """Count a hit for text that was converted earlier in the same batch rather than looked up."""
+        self.hits += 1
+
+    def _remember(self, text: str, result: str):
+        if self.max_entries > 0:
+            self._memory[text] = result
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def reset(self, version: str):
+        """Drop every entry made under the old version and cache under version from now on."""
+        self.clear()
+        self.version = version
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = SqliteCache(self.path, version, self.disk_max_entries)
+
+    def migrate(self, old_version: str, changed_keys: set[str]) -> tuple[int, int]:
+        """
+        Carry the disk tier over from old_version to this cache's version, dropping the entries that looked up any
+        of changed_keys. Returns the number of entries kept and dropped.
+        """
+        if self.disk is None:
+            return 0, 0
+        return self.disk.migrate(old_version, lambda entry: changed_keys.isdisjoint(json.loads(entry)["keys"]))
+
+    def clear(self):
+        """Empty the in-memory tier."""
+        self._memory.clear()
+
+    def info(self) -> dict[str, float]:
+        """Return hit, miss and size counters, and the fraction of lookups that hit either tier."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "currsize": len(self._memory),
+            "maxsize": self.max_entries,
+        }
+
+    def close(self):
+        """Save anything still buffered in the disk tier."""
+        if self.disk is not None:
+            self.disk.close()
+
+
+class ConversionJournal:
+    """
+    An append-only record of finished conversions, keyed by a hash of each request's mode and text, so that a batch
+    run that is interrupted can be run again without redoing the work it had already finished.
+
+    Each line is a JSON object, written and fsynced as soon as its conversion finishes, so a crash loses at most the
+    request in progress. Opening the journal drops a last line cut short by a crash. The first line records the
+    converter version (see LatinToShavian._result_cache_version), and a journal written by another version is started
+    again, since its results may no longer be right. Failed conversions are never recorded, so they are retried.
+    Only the offset of each record is kept in memory, and its result read back from the file when it is reused, so a
+    journal of a whole library costs a few dozen bytes a record.
+    """
+
+    def __init__(self, path: str, version: str):
+        self.path = path
+        self.version = version
+        # Where each key's record starts in the file
+        self._offsets: dict[str, int] = {}
+        # Results answered from the journal, and recorded in it, since it was opened
+        self.reused: int = 0
+        self.recorded: int = 0
+
+        valid_end: int = 0  # End of the last complete, valid line
+        try:
+            with open(path, "rb") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        record = None
+                    if not isinstance(record, dict):
+                        break
+                    if valid_end == 0 and record.get("version") != version:
+                        print(f"Journal {path} was written by a different converter version, starting it again",
+                              file=sys.stderr, flush=True)
+                        break
+                    if valid_end:
+                        self._offsets[record["key"]] = valid_end
+                    valid_end += len(line)
+        except FileNotFoundError:
+            pass
+
+        # Appending always writes at the end, wherever get() last read from
+        self._file: IO[bytes] = open(path, "a+b")
+        self._file.truncate(valid_end)
+        if not valid_end:
+            self._append({"version": version})
+
+    @staticmethod
+    def _key(text: str, mode: str) -> str:
+        return hashlib.sha256(f"{mode}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, mode: str = "auto") -> str | None:
+        """Return the recorded result of converting text in mode, or None if it hasn't been converted yet."""
+        offset: int | None = self._offsets.get(self._key(text, mode))
+        if offset is None:
+            return None
+        self._file.seek(offset)
+        self.reused += 1
+        return json.loads(self._file.readline())["text"]
+
+    def record(self, text: str, mode: str, result: str):
+        """Record the result of a finished conversion, durably, before returning."""
+        key: str = self._key(text, mode)
+        self._offsets[key] = self._append({"key": key, "text": result})
+        self.recorded += 1
+
+    def _append(self, record: dict) -> int:
+        """Write record durably at the end of the journal, returning where it starts."""
+        offset: int = self._file.seek(0, os.SEEK_END)
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return offset
+
+    def close(self):
+        """Close the journal, noting how much work it saved."""
+        if not self._file.closed:
+            self._file.close()
+            print(f"Journal {self.path}: reused {self.reused} results, recorded {self.recorded}",
+                  file=sys.stderr, flush=True)
+
+
+class EspeakBackend:
+    """
+    Turns words into espeak phoneme mnemonics (the same notation as `espeak -x`) without a process per word.
+
+    Where the espeak(-ng) shared library can be loaded it is used in-process, staying initialised for the life of the
+    process. Otherwise the espeak command is run once per batch, with one word per clause, and its output lines are
+    matched back to the words; if the lines don't line up one-to-one the batch is retried a word at a time. Words that
+    can't be phonemized map to None.
+    """
+
+    # Separates words in a batch so that each becomes its own clause, and so its own line of output
+    BATCH_SEPARATOR = ".\n"
+
+    def __init__(self):
+        self._library = None
+        self._library_path: str | None = None
+        self._library_pid: int | None = None
+        self._library_failed = False
+
+    @functools.cached_property
+    def executable(self) -> str | None:
+        """The espeak command, looked up the first time a word needs it."""
+        return shutil.which("espeak") or shutil.which("espeak-ng")
+
+    @property
+    def available(self) -> bool:
+        """Whether any espeak backend can be used."""
+        return self._load_library() is not None or self.executable is not None
+
+    @functools.cached_property
+    def version(self) -> str:
+        """Describe the backend phonemize() uses and its version, so that caches of its output follow it."""
+        library = self._load_library()
+        if library is not None:
+            info: bytes | None = library.espeak_Info(None)
+            return f"{self._library_path} {info.decode('utf-8', errors='replace') if info else 'unknown version'}"
+        if self.executable is not None:
+            try:
+                result = subprocess.run([self.executable, "--version"], capture_output=True, text=True, check=True)
+                version: str = result.stdout.strip() or "unknown version"
+            except (subprocess.CalledProcessError, OSError):
+                version = "unknown version"
+            return f"{os.path.realpath(self.executable)} {version}"
+        return "no espeak"
+
+    def _load_library(self):
+        """Load and initialise libespeak(-ng) in this process, returning None if it isn't available."""
+        if self._library_failed:
+            return None
+        if self._library is not None and self._library_pid == os.getpid():
+            return self._library
+        library_path = ctypes.util.find_library("espeak-ng") or ctypes.util.find_library("espeak")
+        if library_path is None:
+            self._library_failed = True
+            return None
+        try:
+            library = ctypes.cdll.LoadLibrary(library_path)
+            # AUDIO_OUTPUT_SYNCHRONOUS, no audio buffer, default data path, no options
+            if library.espeak_Initialize(0x02, 0, None, 0) < 0:
+                raise OSError("espeak_Initialize failed")
+            if library.espeak_SetVoiceByName(b"en") != 0:
+                raise OSError("espeak_SetVoiceByName failed")
+            library.espeak_TextToPhonemes.restype = ctypes.c_char_p
+            library.espeak_TextToPhonemes.argtypes = [ctypes.POINTER(ctypes.c_char_p), ctypes.c_int, ctypes.c_int]
+            library.espeak_Info.restype = ctypes.c_char_p
+            library.espeak_Info.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
+        except (OSError, AttributeError) as e:
+            print(f"Could not use {library_path}, falling back to the espeak command: {e}", file=sys.stderr, flush=True)
+            self._library_failed = True
+            return None
+        self._library = library
+        self._library_path = library_path
+        self._library_pid = os.getpid()
+        return library
+
+    def _phonemize_with_library(self, library, word: str) -> str | None:
+        """Phonemize one word through the shared library."""
+        text_ptr = ctypes.pointer(ctypes.c_char_p(word.encode("utf-8")))
+        clauses: list[str] = []
+        # espeak_TextToPhonemes returns one clause at a time and advances the pointer until the text is used up
+        while text_ptr.contents.value is not None:
+            # espeakCHARS_UTF8 input, ASCII phoneme mnemonics output
+            phonemes = library.espeak_TextToPhonemes(text_ptr, 1, 0)
+            if phonemes:
+                clauses.append(phonemes.decode("utf-8").strip())
+        return " ".join(clauses) or None
+
+    def _run_espeak(self, text: str) -> list[str] | None:
+        """Run the espeak command over text, returning its non-blank output lines, or None on failure."""
+        try:
+            result = subprocess.run([self.executable, '-q', '-x', text], capture_output=True, text=True, check=True)
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            return None
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def phonemize(self, words: Iterable[str]) -> dict[str, str | None]:
+        """Return the espeak phonemes for each of words, or None for words espeak can't handle."""
+        words = list(dict.fromkeys(words))
+        if not words:
+            return {}
+        library = self._load_library()
+        if library is not None:
+            return {word: self._phonemize_with_library(library, word) for word in words}
+        if self.executable is None:
+            return {word: None for word in words}
+
+        if len(words) > 1:
+            lines = self._run_espeak(self.BATCH_SEPARATOR.join(words))
+            if lines is not None and len(lines) == len(words):
+                return dict(zip(words, lines))
+        results: dict[str, str | None] = {}
+        for word in words:
+            lines = self._run_espeak(word)
+            # A word espeak says nothing for can't be phonemized either
+            results[word] = " ".join(lines) if lines else None
+        return results
+
+
+class ConversionStats:
+    """
+    Call counts and cumulative time for each way a token can be converted and each stage of the pipeline.
+
+    Token branches are counted whether or not the token cache already held the answer, so the counts describe the text
+    rather than the state of the cache. Times are wall-clock seconds measured with time.perf_counter().
+    """
+
+    def __init__(self):
+        self.branches: dict[str, list[float]] = {}
+        self.stages: dict[str, list[float]] = {}
+
+    def add_branch(self, branch: str, seconds: float):
+        """Record one token converted by branch."""
+        entry = self.branches.setdefault(branch, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def add_stage(self, stage: str, seconds: float):
+        """Record one pass through a pipeline stage."""
+        entry = self.stages.setdefault(stage, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def report(self) -> dict[str, dict[str, dict[str, float]]]:
+        """Return the counters as JSON-serialisable {"branches": {...}, "stages": {...}}."""
+        return {
+            kind: {name: {"count": count, "seconds": seconds} for name, (count, seconds) in sorted(entries.items())}
+            for kind, entries in (("branches", self.branches), ("stages", self.stages))
+        }
+
+
+def merge_stats_reports(reports: Iterable[dict]) -> dict:
+    """Combine stats reports from several converters (e.g. pool workers) by adding up their numbers."""
+    merged: dict = {}
+    for report in reports:
+        for key, value in report.items():
+            if isinstance(value, dict):
+                merged[key] = merge_stats_reports([merged.get(key, {}), value])
+            elif isinstance(value, bool):
+                merged[key] = merged.get(key, False) or value
+            elif isinstance(value, (int, float)):
+                merged[key] = merged.get(key, 0) + value
+            else:
+                merged.setdefault(key, value)
+    if "hit_rate" in merged:
+        # Rates can't be added up, so work them out again from the merged counts
+        hits = merged.get("hits", 0) + merged.get("disk_hits", 0)
+        lookups = hits + merged.get("misses", 0)
+        merged["hit_rate"] = hits / lookups if lookups else 0.0
+    return merged
+
+
+class PhraseMerger:
+    """
+    Merges each multi-word phrase found by a PhraseMatcher into a single token, preferring the longest of overlapping
+    phrases.
+
+    Called on each doc by _postprocess_doc, or run as the last component of the spaCy pipeline so that the merging is
+    done inside nlp.pipe, including in its worker processes.
+    """
+
+    COMPONENT_NAME = "latin2shaw_phrase_merger"
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+
+    def __call__(self, doc: Doc) -> Doc:
+        from spacy.util import filter_spans
+
+        spans = self.matcher(doc, as_spans=True)
+        if spans:
+            with doc.retokenize() as retokenizer:
+                for span in filter_spans(spans) if len(spans) > 1 else spans:
+                    retokenizer.merge(span)
+        return doc
+
+
+class RequestStream:
+    """
+    Decode requests arriving on stdin and encode their responses, in either version of the stdin/stdout protocol.
+
+    Version 1, the default, is one "ID:TEXT" line per request answered by one "ID:RESULT" line, so neither text can
+    contain a newline. The line "STATS" is answered with "STATS:" and the stats report as JSON.
+
+    A client selects version 2 by sending the line "PROTOCOL 2" before any request, which is answered with the line
+    "PROTOCOL 2 OK". From then on messages in both directions are frames of a 4-byte big-endian length followed by that
+    many bytes of UTF-8 JSON. Requests are {"id": ..., "text": ..., "options": {"mode": "auto" | "plain" | "html"}},
+    with options optional, or {"id": ..., "command": "stats"}; responses are {"id": ..., "text": ...} or
+    {"id": ..., "stats": {...}}. The id can be any JSON value and is returned unchanged. Requests can be sent without
+    waiting for earlier responses.
+
+    The socket server (see ConversionServer) also accepts {"id": ..., "command": "cancel"}, which withdraws the earlier
+    request with that id, and a "timeout" in seconds among the options.
+
+    A request that fails, times out or is cancelled is answered with {"id": ..., "error": "..."} in version 2, and
+    with empty text, the line "ID:", in version 1, whose clients can't tell an error from a result.
+    """
+
+    def __init__(self, output: IO[bytes]):
+        self.output = output
+        self.version: int = 1
+        self._buffer: bytes = b""
+        # The version can only be chosen before the first request
+        self._started: bool = False
+
+    def feed(self, data: bytes) -> list[tuple[str, object, str, dict]]:
+        """
+        Add data read from stdin, where empty data marks the end of input, returning the (command, id, text, options)
+        requests it completes. The command is "convert", STATS_REQUEST or CANCEL_REQUEST.
+        """
+        requests: list[tuple[str, object, str, dict]] = []
+        self._buffer += data
+        while True:
+            request: tuple[str, object, str, dict] | None
+            if self.version == 1:
+                end: int = self._buffer.find(b"\n")
+                if end == -1:
+                    if data or not self._buffer:
+                        break
+                    # A last line with no newline at the end of input
+                    end = len(self._buffer)
+                line: str = self._buffer[:end].decode("utf-8", errors="replace").rstrip("\r")
+                self._buffer = self._buffer[end + 1:]
+                request = self._parse_line(line)
+            else:
+                if len(self._buffer) < _FRAME_HEADER.size:
+                    break
+                (length,) = _FRAME_HEADER.unpack_from(self._buffer)
+                end = _FRAME_HEADER.size + length
+                if len(self._buffer) < end:
+                    break
+                payload: bytes = self._buffer[_FRAME_HEADER.size:end]
+                self._buffer = self._buffer[end:]
+                request = self._parse_frame(payload)
+            if request is not None:
+                requests.append(request)
+
+        if not data and self._buffer:
+            print(f"Error: incomplete frame of {len(self._buffer)} bytes at end of input", file=sys.stderr, flush=True)
+            self._buffer = b""
+        return requests
+
+    def _parse_line(self, line: str) -> tuple[str, object, str, dict] | None:
+        """Parse a version 1 request line, handling the protocol handshake and returning None for malformed lines."""
+        if not self._started and line.startswith("PROTOCOL "):
+            version: str = line[len("PROTOCOL "):].strip()
+            if version.isdigit() and int(version) in PROTOCOL_VERSIONS:
+                self.version = int(version)
+                self._write(f"PROTOCOL {version} OK\n".encode("utf-8"))
+            else:
+                self._write(f"PROTOCOL {version} UNSUPPORTED\n".encode("utf-8"))
+            return None
+        self._started = True
+
+        if line == STATS_REQUEST:
+            return STATS_REQUEST, STATS_REQUEST, "", {}
+        # Parse the request format: "ID:TEXT"
+        colon_index = line.find(':')
+        if colon_index == -1:
+            return None
+        return "convert", line[:colon_index], line[colon_index + 1:], {}
+
+    def _parse_frame(self, payload: bytes) -> tuple[str, object, str, dict] | None:
+        """
+        Parse a version 2 request frame, returning None if it has no id to answer. Requests with an id but no usable
+        text are answered as if empty.
+        """
+        try:
+            request = json.loads(payload)
+        except ValueError as e:
+            print(f"Error: malformed request frame: {e}", file=sys.stderr, flush=True)
+            return None
+        if not isinstance(request, dict) or "id" not in request:
+            print("Error: request frame is not an object with an id", file=sys.stderr, flush=True)
+            return None
+
+        if request.get("command") == "stats":
+            return STATS_REQUEST, request["id"], "", {}
+        if request.get("command") == "cancel":
+            return CANCEL_REQUEST, request["id"], "", {}
+        text = request.get("text")
+        options = request.get("options") or {}
+        if "command" in request or not isinstance(text, str) or not isinstance(options, dict):
+            print(f"Error: invalid request frame {request['id']!r}", file=sys.stderr, flush=True)
+            return "convert", request["id"], "", {}
+        return "convert", request["id"], text, options
+
+    def respond(self, request_id: object, text: str):
+        """Send the converted text for a request."""
+        if self.version == 1:
+            self._write(f"{request_id}:{text}\n".encode("utf-8"))
+        else:
+            self._write_frame({"id": request_id, "text": text})
+
+    def respond_error(self, request_id: object, message: str):
+        """Report that a request produced no result, with message in version 2 and as empty text in version 1."""
+        if self.version == 1:
+            self.respond(request_id, "")
+        else:
+            self._write_frame({"id": request_id, "error": message})
+
+    def respond_stats(self, request_id: object, report: dict):
+        """Send the answer to a STATS request."""
+        if self.version == 1:
+            self._write(f"{request_id}:{json.dumps(report)}\n".encode("utf-8"))
+        else:
+            self._write_frame({"id": request_id, "stats": report})
+
+    def _write_frame(self, message: dict):
+        payload: bytes = json.dumps(message, ensure_ascii=False).encode("utf-8")
+        self._write(_FRAME_HEADER.pack(len(payload)) + payload)
+
+    def _write(self, data: bytes):
+        self.output.write(data)
+        self.output.flush()
 
 
 class LatinToShavian:
     """A class for converting Latin text to Shavian script."""
     
-    def __init__(self, readlex_path="readlex/readlex_converter.json", phrases_path="readlex/readlex_converter_phrases.json"):
+    def __init__(self, readlex_path="readlex/readlex_converter.json", phrases_path="readlex/readlex_converter_phrases.json",
+                 index_path=None, token_cache_size=65536, affixes_path=None, pronunciation_cache_path=None,
+                 pronunciation_cache_size=100000, profile=False, snapshot_path=None, phrase_cache_path=None,
+                 pipeline_phrases=False, result_cache_size=10000, result_cache_path=None, ipa_cache_size=100000,
+                 ner=True, adaptive_pipeline=True):
         """Initialize the converter with dictionaries and spaCy model."""
+        started = time.perf_counter()
         self.readlex_path = readlex_path
         self.phrases_path = phrases_path
+        self.index_path = index_path or default_index_path(readlex_path)
+        self.snapshot_path = snapshot_path or default_snapshot_path(phrases_path)
+        self.phrase_cache_path = phrase_cache_path or default_phrase_cache_path(phrases_path)
+        # Whether phrases are merged by a spaCy pipeline component rather than afterwards in _postprocess_doc
+        self.pipeline_phrases: bool = pipeline_phrases
+        # Whether names are found by NER, for namer dots, and whether fragments whose spelling can't depend on the
+        # tagger or NER skip them (see _needs_pipeline)
+        self.ner: bool = ner
+        self.adaptive_pipeline: bool = adaptive_pipeline
         
-        # Load ReadLex dictionary
-        with open(self.readlex_path, 'r', encoding="utf-8") as file:
-            json_data = file.read()
-        self.readlex_dict: dict[str, list[dict[str, str]]] = json.loads(json_data)
+        # Load ReadLex dictionary, preferring the compiled index unless the JSON has changed since it was built
+        self.readlex_dict: Mapping[str, list[dict[str, str]]]
+        if os.path.exists(self.index_path) and (not os.path.exists(self.readlex_path)
+                                                or os.path.getmtime(self.index_path) >= os.path.getmtime(self.readlex_path)):
+            self.readlex_dict = ReadLexIndex(self.index_path)
+            self.dictionary_version: str = self.readlex_dict.source_hash
+        else:
+            if os.path.exists(self.index_path):
+                print(f"{self.index_path} is older than {self.readlex_path}, ignoring it (run build-index to update)",
+                      file=sys.stderr, flush=True)
+            with open(self.readlex_path, 'rb') as file:
+                json_data = file.read()
+            self.readlex_dict = json.loads(json_data)
+            self.dictionary_version = hashlib.sha256(json_data).hexdigest()
+        # The entries of each word resolved by tag. The JSON is checked for consistency as it is loaded, and the
+        # index when it is built.
+        self.readlex: ResolvedReadLex = ResolvedReadLex(self.readlex_dict)
+        if not isinstance(self.readlex_dict, ReadLexIndex):
+            print_readlex_report(self.readlex.report(), self.readlex_path)
 
-        # In-memory cache for IPA conversions
-        self.ipa_cache = {}
+        # In-memory cache for IPA conversions, bounded since a long-running process keeps meeting new names
+        self.ipa_cache: LRUDict = LRUDict(max(ipa_cache_size, 1))
+        # espeak is used for words that eng_to_ipa doesn't know
+        self.espeak = EspeakBackend()
 
         # Categories of letters that determine how a following 's is pronounced
         self.s_follows: set[str] = {"𐑐", "𐑑", "𐑒", "𐑓", "𐑔"}
@@ -58,7 +1178,7 @@ class LatinToShavian:
             "able": "𐑩𐑚𐑩𐑤", "bound": "𐑚𐑬𐑯𐑛", "ful": "𐑓𐑩𐑤", "hood": "𐑣𐑫𐑛",
             "ish": "𐑦𐑖", "ism": "𐑦𐑟𐑩𐑥", "less": "𐑤𐑩𐑕", "like": "𐑤𐑲𐑒", "ness": "𐑯𐑩𐑕"
         }
-        self.affixes: dict[str, str] = self.prefixes | self.suffixes
+        self._index_affixes()
 
         # Words that sometimes change spelling before 'to'
         self.have_to: dict[str, str] = {"have": "𐑣𐑨𐑓", "has": "𐑣𐑨𐑕"}
@@ -67,16 +1187,67 @@ class LatinToShavian:
 
         # Suffixes that follow numerals in ordinal numbers
         self.ordinal_suffixes: dict[str, str] = {"st": "𐑕𐑑", "nd": "𐑯𐑛", "rd": "𐑮𐑛", "th": "𐑔", "s": "𐑟"}
+        self.ordinal_regex: re.Pattern = re.compile(r"([0-9]+(?:[, .]?[0-9]+)*)(st|nd|rd|th|s)")
+
+        # The kinds of markup passed through unchanged in HTML documents
+        self.html_patterns: dict[str, re.Pattern] = {
+            "style": re.compile(r"<style\b[^>]*>.*?</style>", flags=re.DOTALL),
+            "script": re.compile(r"<script\b[^>]*>.*?</script>", flags=re.DOTALL),
+            "tag": re.compile(r"(?!(?:<style[^>]*?>.*?</style>|<script[^>]*?>.*?</script>))<.*?>", flags=re.DOTALL),
+        }
+
+        # Longest fragment passed to spaCy in one go; longer lines are cut at sentence or word boundaries
+        self.max_fragment_length: int = 10000
+        self.sentence_boundary_regex: re.Pattern = re.compile(r"[.!?…][\"')\]]*\s+")
 
         # Entity types that get namer dots
         self.namer_dot_ents: set[str] = {"PERSON", "FAC", "ORG", "GPE", "LOC", "PRODUCT", "EVENT", "WORK_OF_ART", "LAW"}
 
+        # Titles that are pulled into a following person entity so that the namer dot goes on the title
+        self.titles: set[str] = {
+            "archbishop", "archdeacon", "baron", "baroness", "bishop", "captain", "count", "countess",
+            "cpt", "dame", "deacon", "doctor", "dr.", "dr", "duchess", "duke", "earl", "emperor",
+            "empress", "gov.", "gov", "governor", "justice", "king", "lady", "lord", "marchioness",
+            "marquess", "marquis", "miss", "missus", "mister", "mistress", "mr.", "mr", "mrs.", "mrs",
+            "ms.", "ms", "mx.", "mx", "pope", "pres.", "pres", "president", "prince", "princess",
+            "prof.", "prof", "professor", "queen", "rev.", "rev", "reverend", "saint", "sen.", "sen",
+            "senator", "sir", "st.", "st", "viscount", "viscountess"
+        }
+
+        # Bounded cache of context-free token spellings, keyed on (text, tag, starts a named entity). Novels reuse a
+        # small vocabulary over and over, so most tokens are resolved by a single dict lookup.
+        self._resolve_token_cached = functools.lru_cache(maxsize=token_cache_size)(self._resolve_token)
+        # Constructed-word decompositions only depend on the lowercase word, so they are shared between its forms
+        self._constructed_matches_cached = functools.lru_cache(maxsize=token_cache_size)(self._constructed_matches)
+        self._tag_dependent_cached = functools.lru_cache(maxsize=token_cache_size)(self._tag_dependent)
+        if affixes_path:
+            self.load_affixes(affixes_path)
+
         # Initialize phonetic mapping
         self._initialize_phonetic_mapping()
-        
+
+        # Optional on-disk cache of phonetic spellings shared between runs and worker processes
+        self.pronunciation_cache: SqliteCache | None = None
+        if pronunciation_cache_path:
+            self.pronunciation_cache = SqliteCache(pronunciation_cache_path, self._phonetic_version(),
+                                                   max_entries=pronunciation_cache_size)
+
+        # Per-branch and per-stage counters, only collected when profiling since timing every token has a cost
+        self.stats: ConversionStats | None = ConversionStats() if profile else None
+
         # Initialize spaCy
         self._initialize_spacy()
-        
+
+        # Converted fragments, so that repeated paragraphs (running headers, chapter titles, scene breaks, or a whole
+        # book converted again) skip spaCy altogether
+        self.result_cache = ResultCache(self._result_cache_version(), result_cache_size, result_cache_path)
+
+        # How many times the spaCy pipeline has been reloaded to give back memory (see recycle)
+        self.recycles: int = 0
+
+        # Reported when stdin/stdout mode is ready
+        self.startup_seconds: float = time.perf_counter() - started
+
     def _initialize_phonetic_mapping(self):
         """Initialize IPA to Shavian phonetic mapping."""
         # IPA to Shavian mapping based on standard English pronunciation
@@ -106,6 +1277,7 @@ class LatinToShavian:
             'ʓ': '𐑠',  # 'zh' as in 'vision'
             ':': '',    # Length marker (remove)
         }
+        self._ipa_symbols: SymbolMap = SymbolMap(self.ipa_to_shavian)
         
         # Common English letter combinations to IPA patterns
         self.letter_to_ipa_patterns = {
@@ -146,113 +1318,119 @@ class LatinToShavian:
 
     def _espeak_to_ipa(self, word: str) -> str:
         """Convert word to IPA using espeak."""
-        try:
-            result = subprocess.run(['espeak', '-q', '-x', word], 
-                                  capture_output=True, text=True, check=True)
-            espeak_ipa = result.stdout.strip()
-            return self._convert_espeak_to_standard_ipa(espeak_ipa)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        espeak_ipa = self.espeak.phonemize([word])[word]
+        if espeak_ipa is None:
             return word  # Return original word if espeak fails
+        return self._convert_espeak_to_standard_ipa(espeak_ipa)
     
+    # espeak uses different symbols, convert them to standard IPA
+    ESPEAK_TO_IPA: dict[str, str] = {
+        'A': 'ɑ', 'a': 'æ', 'E': 'ɛ', 'e': 'e', 'I': 'ɪ', 'i': 'i',
+        'O': 'ɔ', 'o': 'o', 'U': 'ʊ', 'u': 'u', '@': 'ə', '3': 'ɜ',
+        'V': 'ʌ', 'N': 'ŋ', 'S': 'ʃ', 'Z': 'ʒ', 'T': 'θ', 'D': 'ð',
+        'tS': 'tʃ', 'dZ': 'dʒ', 'j': 'j', 'w': 'w', 'h': 'h',
+        'p': 'p', 'b': 'b', 't': 't', 'd': 'd', 'k': 'k', 'g': 'g',
+        'f': 'f', 'v': 'v', 's': 's', 'z': 'z', 'm': 'm', 'n': 'n',
+        'l': 'l', 'r': 'r'
+    }
+    _ESPEAK_SYMBOLS: SymbolMap = SymbolMap(ESPEAK_TO_IPA)
+
     def _convert_espeak_to_standard_ipa(self, espeak_ipa: str) -> str:
         """Convert espeak IPA format to standard IPA."""
-        # espeak uses different symbols, convert them to standard IPA
-        conversion_map = {
-            'A': 'ɑ', 'a': 'æ', 'E': 'ɛ', 'e': 'e', 'I': 'ɪ', 'i': 'i',
-            'O': 'ɔ', 'o': 'o', 'U': 'ʊ', 'u': 'u', '@': 'ə', '3': 'ɜ',
-            'V': 'ʌ', 'N': 'ŋ', 'S': 'ʃ', 'Z': 'ʒ', 'T': 'θ', 'D': 'ð',
-            'tS': 'tʃ', 'dZ': 'dʒ', 'j': 'j', 'w': 'w', 'h': 'h',
-            'p': 'p', 'b': 'b', 't': 't', 'd': 'd', 'k': 'k', 'g': 'g',
-            'f': 'f', 'v': 'v', 's': 's', 'z': 'z', 'm': 'm', 'n': 'n',
-            'l': 'l', 'r': 'r'
-        }
-        
         # Handle stress marks
-        espeak_ipa = re.sub(r"'", '', espeak_ipa)  # Remove primary stress
-        espeak_ipa = re.sub(r',', '', espeak_ipa)  # Remove secondary stress
-        
-        # Convert characters
-        result = ""
-        i = 0
-        while i < len(espeak_ipa):
-            # Try digraphs first
-            if i < len(espeak_ipa) - 1:
-                digraph = espeak_ipa[i:i+2]
-                if digraph in conversion_map:
-                    result += conversion_map[digraph]
-                    i += 2
-                    continue
-            
-            # Try single characters
-            char = espeak_ipa[i]
-            if char in conversion_map:
-                result += conversion_map[char]
-            else:
-                result += char  # Keep unknown characters
-            
-            i += 1
-        
-        return result
+        espeak_ipa = espeak_ipa.replace("'", "")  # Remove primary stress
+        espeak_ipa = espeak_ipa.replace(",", "")  # Remove secondary stress
+
+        # Convert digraphs before single characters, and keep unknown characters
+        return self._ESPEAK_SYMBOLS(espeak_ipa)
 
     def _get_ipa_from_text(self, word: str) -> str:
         """Convert English text to IPA using eng_to_ipa, fallback to espeak if needed."""
-        if word in self.ipa_cache:
-            return self.ipa_cache[word]
-
-        ipa_str = ipa.convert(word)
-        # If eng_to_ipa returns the word with a '*' suffix, it means it couldn't convert it
-        # In this case, try espeak as a fallback
-        if ipa_str.endswith('*'):
-            espeak_result = self._espeak_to_ipa(word)
+        if word not in self.ipa_cache:
+            self._prefetch_ipa([word])
+        return self.ipa_cache[word]
+
+    def _prefetch_ipa(self, words: Iterable[str]):
+        """
+        Work out the IPA for several words at once and store it in the IPA cache.
+
+        Words eng_to_ipa can't convert are sent to espeak together, so a batch costs at most one espeak round-trip.
+        """
+        import eng_to_ipa as ipa
+
+        unknown: list[str] = []
+        for word in dict.fromkeys(words):
+            if word in self.ipa_cache:
+                continue
+            ipa_str = ipa.convert(word)
+            # If eng_to_ipa returns the word with a '*' suffix, it means it couldn't convert it
+            # In this case, try espeak as a fallback
+            if ipa_str.endswith('*'):
+                unknown.append(word)
+            else:
+                self.ipa_cache[word] = self._clean_ipa(ipa_str)
+
+        if len(unknown) == 1:
+            espeak_results: dict[str, str] = {unknown[0]: self._espeak_to_ipa(unknown[0])}
+        else:
+            espeak_results = {
+                word: self._convert_espeak_to_standard_ipa(espeak_ipa) if espeak_ipa is not None else word
+                for word, espeak_ipa in self.espeak.phonemize(unknown).items()
+            }
+        for word, espeak_result in espeak_results.items():
             if espeak_result != word:  # espeak succeeded
                 self.ipa_cache[word] = self._clean_ipa(espeak_result)
-                return self.ipa_cache[word]
             else:  # espeak also failed, return original word
                 self.ipa_cache[word] = word
-                return self.ipa_cache[word]
-        self.ipa_cache[word] = self._clean_ipa(ipa_str)
-        return self.ipa_cache[word]
-        
-    
+
+    def _prefetch_doc_ipa(self, *docs: spacy.tokens.Doc):
+        """Resolve the IPA of every word in docs that looks bound for the phonetic fallback in one batch."""
+        if not self.espeak.available:
+            return
+        candidates: list[str] = []
+        for token in itertools.chain.from_iterable(docs):
+            word = token.text
+            if (word in self.ipa_cache or not word.isalpha() or token.lower_ in self.readlex_dict
+                    or token.tag_ == "HTML" or any(self._constructed_matches_cached(token.lower_)[:2])):
+                continue
+            if self.pronunciation_cache is not None and self.pronunciation_cache.get(word) is not None:
+                continue
+            candidates.append(word)
+        if candidates:
+            self._prefetch_ipa(candidates)
+
     def _ipa_to_shavian(self, ipa: str) -> str:
         """Convert IPA to Shavian script."""
-        shavian = ""
-        i = 0
-        
-        while i < len(ipa):
-            # Try digraphs first
-            if i < len(ipa) - 1:
-                digraph = ipa[i:i+2]
-                if digraph in self.ipa_to_shavian:
-                    shavian += self.ipa_to_shavian[digraph]
-                    i += 2
-                    continue
-            
-            # Try single characters
-            char = ipa[i]
-            if char in self.ipa_to_shavian:
-                shavian += self.ipa_to_shavian[char]
-            else:
-                # Keep unknown IPA symbols as-is
-                shavian += char
-            
-            i += 1
-        
-        return shavian
+        # Digraphs are matched before single characters, and unknown IPA symbols are kept as-is
+        return self._ipa_symbols(ipa)
     
+    def _phonetic_version(self) -> str:
+        """Describe everything phonetic spellings depend on, so that cached spellings are dropped when it changes."""
+        try:
+            engine = f"eng_to_ipa {importlib.metadata.version('eng_to_ipa')}"
+        except importlib.metadata.PackageNotFoundError:
+            engine = "eng_to_ipa unknown"
+        mapping = hashlib.sha256(json.dumps(self.ipa_to_shavian, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{PHONETIC_CACHE_VERSION}; {engine}; {self.espeak.version}; {mapping}"
+
     def _phonetic_transliterate(self, word: str) -> str:
         """Convert a word to Shavian using phonetic rules."""
-        # Convert to IPA first
-        ipa = self._get_ipa_from_text(word)
+        cached = self.pronunciation_cache.get(word) if self.pronunciation_cache is not None else None
+        if cached is not None:
+            ipa, shavian = json.loads(cached)
+        else:
+            # Convert to IPA first
+            ipa = self._get_ipa_from_text(word)
+            # Convert IPA to Shavian
+            shavian = self._ipa_to_shavian(ipa) if ipa != word else word
+            if self.pronunciation_cache is not None:
+                self.pronunciation_cache.put(word, json.dumps([ipa, shavian], ensure_ascii=False))
         
         # If the IPA is the same as the original word, eng_to_ipa couldn't convert it
         # Return the original word unchanged
         if ipa == word:
             return word
         
-        # Convert IPA to Shavian
-        shavian = self._ipa_to_shavian(ipa)
-        
         # Add dot for proper nouns (words starting with uppercase)
         prefix = "·" if word[0].isupper() else ""
         
@@ -260,72 +1438,167 @@ class LatinToShavian:
         return prefix + shavian + "[p]"
 
     def _initialize_spacy(self):
-        """Initialize spaCy model and custom tokenizer."""
-        # Load spaCy, excluding pipeline components that are not required
-        self.nlp = spacy.load("en_core_web_sm", exclude=["parser", "lemmatizer", "textcat"])
-
-        # Customise the spaCy tokeniser to ensure that initial and final dashes and dashes between words aren't stuck to one
-        # of the surrounding words
-        # Prefixes
-        spacy_prefixes: list[str] = self.nlp.Defaults.prefixes + [r'''^[-–—]+''',]
-        prefix_regex = compile_prefix_regex(spacy_prefixes)
-        self.nlp.tokenizer.prefix_search = prefix_regex.search
-        # Infixes
-        spacy_infixes: list[str] = self.nlp.Defaults.infixes + [r'''[.,?!:;\-–—"~\(\)\[\]]+''',]
-        infix_regex = compile_infix_regex(spacy_infixes)
-        self.nlp.tokenizer.infix_finditer = infix_regex.finditer
-        # Suffixes
-        spacy_suffixes: list[str] = self.nlp.Defaults.suffixes + [r'''[-–—]+$''',]
-        suffix_regex = compile_suffix_regex(spacy_suffixes)
-        self.nlp.tokenizer.suffix_search = suffix_regex.search
+        """Initialize spaCy model and custom tokenizer, from the pipeline snapshot if there is an up-to-date one."""
+        import spacy
+        from spacy.util import compile_infix_regex, compile_prefix_regex, compile_suffix_regex
+
+        self._snapshot_meta_loaded: dict = self._snapshot_meta()
+        if not self._load_snapshot(self._snapshot_meta_loaded):
+            # Load spaCy, excluding pipeline components that are not required
+            self.nlp = spacy.load("en_core_web_sm", exclude=["parser", "lemmatizer", "textcat"])
+
+            # Customise the spaCy tokeniser with the dash rules
+            # Prefixes
+            spacy_prefixes: list[str] = self.nlp.Defaults.prefixes + list(TOKENIZER_PREFIXES)
+            prefix_regex = compile_prefix_regex(spacy_prefixes)
+            self.nlp.tokenizer.prefix_search = prefix_regex.search
+            # Infixes
+            spacy_infixes: list[str] = self.nlp.Defaults.infixes + list(TOKENIZER_INFIXES)
+            infix_regex = compile_infix_regex(spacy_infixes)
+            self.nlp.tokenizer.infix_finditer = infix_regex.finditer
+            # Suffixes
+            spacy_suffixes: list[str] = self.nlp.Defaults.suffixes + list(TOKENIZER_SUFFIXES)
+            suffix_regex = compile_suffix_regex(spacy_suffixes)
+            self.nlp.tokenizer.suffix_search = suffix_regex.search
+
+        if not self.ner and "ner" in self.nlp.pipe_names:
+            self.nlp.disable_pipe("ner")
 
         # Initialize phrase matcher
-        self._initialize_phrase_matcher()
-        
-    def _initialize_phrase_matcher(self):
-        """Initialize the phrase matcher with phrases from the phrases file."""
-        def add_span(matcher, doc, i, matches):
-            match_id, start, end = matches[i]
-
-        # Define the phrase to match
-        with open(self.phrases_path, "r", newline="") as f:
-            reader = csv.reader(f)
-            phrases = [row[0] for row in reader if row]
-        phrase_patterns: list[Doc] = [self.nlp.make_doc(phrase) for phrase in phrases]
+        self._initialize_phrase_matcher(self._load_phrase_patterns())
+
+    def _initialize_phrase_matcher(self, phrase_patterns: list[Doc]):
+        """Initialize the phrase matcher with the tokenised phrases from the phrases file."""
+        from spacy.language import Language
+        from spacy.matcher import PhraseMatcher
+
         self.phrase_matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
-        self.phrase_matcher.add("phrases", phrase_patterns, on_match=add_span)
+        self.phrase_matcher.add("phrases", phrase_patterns)
+        self.phrase_merger = PhraseMerger(self.phrase_matcher)
+        if self.pipeline_phrases:
+            # Merge phrases as the last step of nlp.pipe, after tagging and NER as when merging in _postprocess_doc
+            Language.component(PhraseMerger.COMPONENT_NAME, func=self.phrase_merger)
+            self.nlp.add_pipe(PhraseMerger.COMPONENT_NAME, last=True)
 
-    def tokenise(self, text: str) -> spacy.tokens.Doc:
-        """Tokenise and tag the text using spaCy as doc."""
-        doc = self.nlp(text)
-        phrase_matches = self.phrase_matcher(doc)
-        phrase_spans: list[Span] = []
-        for match_id, start, end in phrase_matches:
-            span = Span(doc, start, end, label=match_id)
-            phrase_spans.append(span)
+    def _phrase_cache_version(self, phrases_data: bytes) -> str:
+        """Describe everything the tokenised phrase patterns depend on: the phrases, spaCy and the tokenizer rules."""
+        version = hashlib.sha256(f"{PHRASE_CACHE_VERSION}; spacy {importlib.metadata.version('spacy')}; ".encode())
+        version.update(self.nlp.tokenizer.to_bytes(exclude=["vocab"]))
+        version.update(phrases_data)
+        return version.hexdigest()
 
-        filtered_spans = filter_spans(phrase_spans)
+    def _load_phrase_patterns(self) -> list[Doc]:
+        """
+        Return the phrases from the phrases file as tokenised pattern docs.
 
-        with doc.retokenize() as retokenizer:
-            for span in filtered_spans:
-                retokenizer.merge(span)
+        The docs are kept in the phrase cache file, which is rebuilt whenever it doesn't match the phrases file, spaCy
+        version or tokenizer rules, so that phrases only have to be tokenised once.
+        """
+        import srsly
+        from spacy.tokens import DocBin
 
-        # Expand person entities to include titles and take initial 'the' out of entity names
-        titles: set[str] = {
-            "archbishop", "archdeacon", "baron", "baroness", "bishop", "captain", "count", "countess",
-            "cpt", "dame", "deacon", "doctor", "dr.", "dr", "duchess", "duke", "earl", "emperor",
-            "empress", "gov.", "gov", "governor", "justice", "king", "lady", "lord", "marchioness",
-            "marquess", "marquis", "miss", "missus", "mister", "mistress", "mr.", "mr", "mrs.", "mrs",
-            "ms.", "ms", "mx.", "mx", "pope", "pres.", "pres", "president", "prince", "princess",
-            "prof.", "prof", "professor", "queen", "rev.", "rev", "reverend", "saint", "sen.", "sen",
-            "senator", "sir", "st.", "st", "viscount", "viscountess"
+        with open(self.phrases_path, "rb") as file:
+            phrases_data: bytes = file.read()
+        version: str = self._phrase_cache_version(phrases_data)
+        self.phrases_version: str = version
+        if os.path.exists(self.phrase_cache_path):
+            try:
+                cached: dict = srsly.read_msgpack(self.phrase_cache_path)
+                if cached.get("version") == version:
+                    return list(DocBin().from_bytes(cached["patterns"]).get_docs(self.nlp.vocab))
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"Could not read {self.phrase_cache_path}, rebuilding it: {e}", file=sys.stderr, flush=True)
+
+        # Define the phrases to match
+        reader = csv.reader(io.StringIO(phrases_data.decode("utf-8"), newline=""))
+        phrase_patterns: list[Doc] = [self.nlp.make_doc(row[0]) for row in reader if row]
+        try:
+            # Written to a temporary file and renamed, so that concurrent starts never see half a cache
+            temp_path = f"{self.phrase_cache_path}.{os.getpid()}.tmp"
+            srsly.write_msgpack(temp_path, {"version": version, "patterns": DocBin(docs=phrase_patterns).to_bytes()})
+            os.replace(temp_path, self.phrase_cache_path)
+        except OSError as e:
+            print(f"Could not write {self.phrase_cache_path}: {e}", file=sys.stderr, flush=True)
+        return phrase_patterns
+
+    def _snapshot_meta(self) -> dict:
+        """Describe everything a pipeline snapshot depends on, so that a stale snapshot is never loaded."""
+        try:
+            model_version: str | None = importlib.metadata.version("en_core_web_sm")
+        except importlib.metadata.PackageNotFoundError:
+            model_version = None
+        tokenizer_rules: str = json.dumps([TOKENIZER_PREFIXES, TOKENIZER_INFIXES, TOKENIZER_SUFFIXES])
+        return {
+            "format": PIPELINE_SNAPSHOT_VERSION,
+            "spacy": importlib.metadata.version("spacy"),
+            "model": model_version,
+            "tokenizer": hashlib.sha256(tokenizer_rules.encode("utf-8")).hexdigest(),
         }
+
+    def _load_snapshot(self, meta: dict) -> bool:
+        """Load the spaCy pipeline from the snapshot, returning whether it was usable."""
+        import spacy
+
+        meta_path = os.path.join(self.snapshot_path, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, "r", encoding="utf-8") as file:
+            if json.load(file) != meta:
+                print(f"{self.snapshot_path} is out of date, ignoring it (run build-snapshot to update)",
+                      file=sys.stderr, flush=True)
+                return False
+        self.nlp = spacy.load(os.path.join(self.snapshot_path, "pipeline"))
+        return True
+
+    def save_snapshot(self, snapshot_path: str | None = None):
+        """
+        Save the customised spaCy pipeline so that later runs can load it directly.
+
+        The snapshot records the spaCy and model versions and the tokeniser rules it was built from, and is ignored once
+        any of them changes. The phrase patterns are cached separately (see _load_phrase_patterns).
+        """
+        snapshot_path = snapshot_path or self.snapshot_path
+        meta_path = os.path.join(snapshot_path, "meta.json")
+        os.makedirs(snapshot_path, exist_ok=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        # The phrase merger is added on every start if wanted, and can't be loaded without its phrase matcher
+        exclude_merger: bool = PhraseMerger.COMPONENT_NAME in self.nlp.pipe_names
+        if exclude_merger:
+            self.nlp.remove_pipe(PhraseMerger.COMPONENT_NAME)
+        try:
+            self.nlp.to_disk(os.path.join(snapshot_path, "pipeline"))
+        finally:
+            if exclude_merger:
+                self.nlp.add_pipe(PhraseMerger.COMPONENT_NAME, last=True)
+        # Written last, so an interrupted build leaves no snapshot rather than a broken one
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump(self._snapshot_meta_loaded, file, indent=2)
+
+    def tokenise(self, text: str) -> spacy.tokens.Doc:
+        """Tokenise and tag the text using spaCy as doc."""
+        return self._postprocess_doc(self.nlp(text))
+
+    def _postprocess_doc(self, doc: spacy.tokens.Doc) -> spacy.tokens.Doc:
+        """Merge multi-word phrases and tidy up entity spans on a freshly tagged doc."""
+        from spacy.tokens import Span
+        from spacy.util import filter_spans
+
+        started: float = self._start_timer()
+        if not self.pipeline_phrases:
+            self.phrase_merger(doc)
+            started = self._record_stage("phrase_merge", started)
+        if not doc.ents:
+            self._record_stage("entity_fixup", started)
+            return doc
+
+        # Expand person entities to include titles and take initial 'the' out of entity names
         new_ents: list[Span] = []
         for ent in doc.ents:
             # Only check for title if it's a person and not the first token
             if ent.label_ == "PERSON" and ent.start != 0:
                 prev_token = doc[ent.start - 1]
-                if prev_token.lower_ in titles:
+                if prev_token.lower_ in self.titles:
                     new_ent = Span(doc, ent.start - 1, ent.end, label=ent.label)
                     new_ents.append(new_ent)
                 else:
@@ -341,238 +1614,1770 @@ class LatinToShavian:
 
         filtered_ents = filter_spans(new_ents)
         doc.ents = tuple(filtered_ents)
+        self._record_stage("entity_fixup", started)
 
         return doc
 
-    def convert(self, doc: spacy.tokens.Doc) -> str:
-        """Apply a series of tests to each token to determine how to Shavianise it."""
+    def convert(self, doc: spacy.tokens.Doc, used_keys: set[str] | None = None,
+                word_counts: dict[tuple[str, str, bool], int] | None = None) -> str:
+        """
+        Apply a series of tests to each token to determine how to Shavianise it.
+
+        If used_keys is given, every ReadLex key looked up along the way is added to it, whether or not it was found.
+        If word_counts is given, it counts the tokens spelt by _resolve_token by their (text, tag, namer) arguments.
+        """
         text_split_shaw: str = ""
 
+        # Look up all the words espeak will be needed for in one go rather than one at a time
+        self._prefetch_doc_ipa(doc)
+
+        stats: ConversionStats | None = self.stats
         for token in doc:
+            if stats is not None:
+                started: float = time.perf_counter()
+
             # Leave HTML tags unchanged
             if token.tag_ == "HTML":
+                branch: str = "html"
                 text_split_shaw += token.text
 
             # Convert contractions
             elif token.lower_ in self.contraction_start and token.i < len(doc) - 1 and doc[token.i + 1].lower_ in self.contraction_end:
+                branch = "contraction"
                 text_split_shaw += self.contraction_start[token.lower_]
             elif token.lower_ in self.contraction_end:
+                branch = "contraction"
                 prefix: str = "𐑩" if token.lower_ != "𐑼" and text_split_shaw and text_split_shaw[-1] in self.consonants else ""
                 text_split_shaw += prefix + self.contraction_end[token.lower_] + token.whitespace_
 
-            # Convert possessive 's
+            # Convert possessive 's, which can also start a fragment with nothing before it
             elif token.lower_ == "'s":
-                suffix: str = "𐑕" if text_split_shaw[-1] in self.s_follows else "𐑩𐑟" if text_split_shaw[-1] in self.uhz_follows else "𐑟"
+                branch = "possessive"
+                last: str = text_split_shaw[-1:]
+                suffix: str = "𐑕" if last in self.s_follows else "𐑩𐑟" if last in self.uhz_follows else "𐑟"
                 text_split_shaw += suffix + token.whitespace_
 
             # Convert possessive '
             elif token.lower_ == "'" and token.tag_ == "POS":
+                branch = "possessive"
                 text_split_shaw += token.whitespace_
 
-            # Handle tokens with internal apostrophes that aren't in the dictionary (e.g., "G'night")
-            elif "'" in token.text and token.lower_ not in self.readlex_dict:
-                try:
-                    base, contraction = token.text.split("'", 1)
-                    # Try to transliterate base and contraction separately
-                    base_shaw = ""
-                    if base.lower() in self.readlex_dict:
-                        for i in self.readlex_dict.get(base.lower(), []):
-                            if i["tag"] == "0" or i["tag"] == token.tag_:
-                                base_shaw = i["Shaw"]
-                                break
-                    else:
-                        # If base not in dictionary, use phonetic transliteration
-                        base_shaw = self._phonetic_transliterate(base) if base.isalpha() else base
-                    
-                    # Handle the contraction part
-                    contraction_shaw = ""
-                    if contraction.lower() in self.contraction_end:
-                        contraction_shaw = self.contraction_end[contraction.lower()]
-                    else:
-                        # If contraction not recognized, try to transliterate it
-                        contraction_shaw = self._phonetic_transliterate(contraction) if contraction.isalpha() else contraction
-                    
-                    text_split_shaw += base_shaw + contraction_shaw + token.whitespace_
+            # Convert verbs that change pronunciation before 'to', e.g. 'have to', 'used to', 'supposed to'. Where
+            # they don't, they are looked up like any other word below.
+            elif (token.lower_ in self.before_to and token.i < len(doc) - 1 and doc[token.i + 1].lower_ == "to"
+                  and (before_to := self._before_to_spelling(doc, token)) is not None):
+                branch = "before_to"
+                text_split_shaw += before_to + token.whitespace_
+
+            # Everything else depends only on the token itself, so look it up in the token cache
+            else:
+                word: tuple[str, str, bool] = self._word_type(token)
+                branch, pieces, keys = self._resolve_token_cached(*word)
+                if word_counts is not None:
+                    word_counts[word] = word_counts.get(word, 0) + 1
+                if used_keys is not None:
+                    used_keys.update(keys)
+                for piece in pieces:
+                    text_split_shaw += piece + token.whitespace_
+
+            if stats is not None:
+                stats.add_branch(branch, time.perf_counter() - started)
+
+        return text_split_shaw
+
+    def _before_to_spelling(self, doc: spacy.tokens.Doc, token: spacy.tokens.Token) -> str | None:
+        """Return the spelling of a verb like 'have' or 'used' that comes before 'to', or None if it isn't changed."""
+        # 'have' only changes pronunciation where 'have to' means 'must'
+        if token.lower_ in self.have_to and token.i < len(doc) - 2 and doc[token.i + 2].tag_ in ["VB", "VBP"]:
+            return self.have_to[token.lower_]
+        # 'used', 'supposed' etc. only change pronunciation in the past tense, not past participle
+        if token.lower_ in self.vbd_to and token.tag_ in ["VBD", "VBN", "."]:
+            return self.vbd_to[token.lower_]
+        return None
+
+    def _word_type(self, token: spacy.tokens.Token) -> tuple[str, str, bool]:
+        """Return the arguments to _resolve_token for token: its text, its tag and whether it starts a name."""
+        return token.text, token.tag_, token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents
+
+    def _needs_pipeline(self, doc: spacy.tokens.Doc) -> bool:
+        """
+        Whether converting a freshly tokenised doc could depend on the tagger or NER, which otherwise it can skip.
+
+        That is when a token might be part of a name, which is only assumed of capitalised tokens, or could be spelt
+        differently by part of speech: heteronyms (including merged phrases), possessive apostrophes and verbs before
+        "to". Tokens that convert() spells from their neighbours without a tag are left out.
+        """
+        for token in doc:
+            lower: str = token.lower_
+            if self.ner and token.text != lower:
+                return True
+            if lower in self.contraction_end or lower == "'s":
+                continue
+            if lower in self.before_to and token.i < len(doc) - 1 and doc[token.i + 1].lower_ == "to":
+                return True
+            if self._tag_dependent_cached(lower):
+                return True
+        return any(self._tag_dependent_cached(span.text.lower()) for span in self.phrase_matcher(doc, as_spans=True))
+
+    def _tag_dependent(self, lower: str) -> bool:
+        """Whether _resolve_token could spell a word differently depending on its tag."""
+        resolved: ReadLexWord | None = self.readlex.get(lower)
+        if resolved is not None:
+            return resolved.tag_dependent
+        # Words with an apostrophe that aren't in the ReadLex are spelt in parts, looking the first up by tag, and a
+        # lone apostrophe is possessive by tag
+        return "'" in lower
+
+    def _resolve_vocabulary(self, docs: list[spacy.tokens.Doc]):
+        """
+        Resolve every distinct word in docs in one pass, after fetching the IPA of all those bound for the phonetic
+        fallback in a single batch, so that converting the docs afterwards only looks spellings up.
+
+        Tokens that convert() spells from their neighbours are skipped; this only has to be close, since anything
+        missed is resolved when it is converted.
+        """
+        started: float = self._start_timer()
+        self._prefetch_doc_ipa(*docs)
+        resolved: set[tuple[str, str, bool]] = set()
+        for doc in docs:
+            for token in doc:
+                if (token.tag_ == "HTML" or token.lower_ in self.contraction_end or token.lower_ in ("'s", "'")
+                        or (token.lower_ in self.contraction_start and token.i < len(doc) - 1
+                            and doc[token.i + 1].lower_ in self.contraction_end)):
                     continue
-                except:
-                    # If splitting fails, fall through to phonetic transliteration
-                    pass
+                word: tuple[str, str, bool] = self._word_type(token)
+                if word not in resolved:
+                    resolved.add(word)
+                    self._resolve_token_cached(*word)
+        self._record_stage("vocabulary", started)
 
-            # Convert verbs that change pronunciation before 'to', e.g. 'have to', 'used to', 'supposed to'
-            elif token.lower_ in self.before_to and token.i < len(doc) - 1 and doc[token.i + 1].lower_ == "to":
-                # 'have' only changes pronunciation where 'have to' means 'must'
-                if token.lower_ in self.have_to and doc[token.i + 2].tag_ in ["VB", "VBP"]:
-                    text_split_shaw += self.have_to[token.lower_] + token.whitespace_
-                # 'used', 'supposed' etc. only change pronunciation in the past tense, not past participle
-                elif token.lower_ in self.vbd_to and token.tag_ in ["VBD", "VBN", "."]:
-                    text_split_shaw += self.vbd_to[token.lower_] + token.whitespace_
-
-            # Match ordinal numbers represented by a numeral and a suffix
-            elif re.fullmatch(r"([0-9]+(?:[, .]?[0-9]+)*)(st|nd|rd|th|s)", token.lower_):
-                number, number_suffix = re.match(r"([0-9]+(?:[, .]?[0-9]+)*)(st|nd|rd|th|s)", token.lower_).groups()
-                text_split_shaw += number + self.ordinal_suffixes[number_suffix] + token.whitespace_
-
-            # Loop through the words in the ReadLex and look for matches, and only apply the namer dot to the first word
-            # in a name (or not at all for initialisms marked with ⸰)
-            elif token.lower_ in self.readlex_dict:
-                for i in self.readlex_dict.get(token.lower_, []):
-                    # Match the part of speech for heteronyms
-                    if i["tag"] == token.tag_:
-                        prefix: str = "·" if token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents and not i["Shaw"].startswith("⸰") else ""
-                        text_split_shaw += prefix + i["Shaw"] + token.whitespace_
-                        break
+    def _resolve_token(self, text: str, tag: str, namer: bool) -> tuple[str, tuple[str, ...], tuple[str, ...]]:
+        """
+        Shavianise a token whose spelling doesn't depend on the tokens around it.
 
-                    # For any proper nouns not in the ReadLex, match if an identical common noun exists
-                    elif (i["tag"] in ["NN", "0"] and token.tag_ == "NNP") or (i["tag"] in ["NNS", "0"] and token.tag_ == "NNPS"):
-                        prefix = "·" if token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents and not i["Shaw"].startswith("⸰") else ""
-                        text_split_shaw += prefix + i["Shaw"] + token.whitespace_
-                        break
+        Returns the name of the branch that handled the token, for profiling; the pieces that convert() writes out,
+        each followed by the token's whitespace, which is usually a single piece, but can be several (or none) where
+        more than one constructed match applies; and the ReadLex keys whose entries (or absence) decided the spelling.
+        """
+        lower: str = text.lower()
 
-                    # Match words with only one pronunciation
-                    elif i["tag"] == "0":
-                        prefix = "·" if token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents and not i["Shaw"].startswith("⸰") else ""
-                        text_split_shaw += prefix + i["Shaw"] + token.whitespace_
-                        break
+        # Handle tokens with internal apostrophes that aren't in the dictionary (e.g., "G'night")
+        if "'" in text and lower not in self.readlex_dict:
+            try:
+                base, contraction = text.split("'", 1)
+                # Try to transliterate base and contraction separately
+                base_shaw = ""
+                base_word: ReadLexWord | None = self.readlex.get(base.lower())
+                if base_word is not None:
+                    base_spelling: tuple[str, str] | None = base_word.base_spelling(tag)
+                    if base_spelling is not None:
+                        base_shaw = base_spelling[0]
+                else:
+                    # If base not in dictionary, use phonetic transliteration
+                    base_shaw = self._phonetic_transliterate(base) if base.isalpha() else base
+
+                # Handle the contraction part
+                contraction_shaw = ""
+                if contraction.lower() in self.contraction_end:
+                    contraction_shaw = self.contraction_end[contraction.lower()]
+                else:
+                    # If contraction not recognized, try to transliterate it
+                    contraction_shaw = self._phonetic_transliterate(contraction) if contraction.isalpha() else contraction
+
+                return "apostrophe", (base_shaw + contraction_shaw,), (lower, base.lower())
+            except:
+                # If splitting fails, the token is dropped
+                return "apostrophe", (), (lower,)
+
+        # Match ordinal numbers represented by a numeral and a suffix
+        ordinal = self.ordinal_regex.fullmatch(lower)
+        if ordinal:
+            number, number_suffix = ordinal.groups()
+            return "ordinal", (number + self.ordinal_suffixes[number_suffix],), ()
+
+        # Look the word up in the ReadLex by part of speech, for heteronyms, falling back to a common noun for proper
+        # nouns and to the entry for every part of speech, and only apply the namer dot to the first word in a name
+        # (or not at all for initialisms marked with ⸰)
+        resolved: ReadLexWord | None = self.readlex.get(lower)
+        if resolved is not None:
+            spelling: tuple[str, str] | None = resolved.spelling(tag)
+            return "readlex", (spelling[namer],) if spelling is not None else (), (lower,)
+
+        # Apply additional tests where there is still no match
+        pieces: list[str] = []
+        constructed_warning: str = "[c]"
+        affix_matches, plural_match, looked_up = self._constructed_matches_cached(lower)
+        keys: tuple[str, ...] = (lower, *looked_up)
+        '''
+        Try to construct a match using common prefixes and suffixes and include a warning symbol to aid proof
+        reading
+        '''
+        for prefix, shaw, suffix in affix_matches:
+            prefix = "·" if namer and not shaw.startswith("⸰") else prefix
+            pieces.append(prefix + shaw + suffix + constructed_warning)
+
+        # Try to construct plurals if not expressly included in the ReadLex, e.g. plurals of proper names.
+        if plural_match is not None:
+            suffix = "𐑕" if plural_match[-1] in self.s_follows else "𐑩𐑟" if plural_match[-1] in self.uhz_follows else "𐑟"
+            prefix = "·" if namer and not plural_match.startswith("⸰") else ""
+            pieces.append(prefix + plural_match + suffix + constructed_warning)
+
+        if pieces:
+            return "constructed" if affix_matches else "plural", tuple(pieces), keys
+
+        # Phonetic fallback: if no match found, try phonetic transliteration
+        if text.isalpha():
+            return "phonetic", (self._phonetic_transliterate(text),), keys
+        return "passthrough", (text,), keys
+
+    def _constructed_matches(self, lower: str) -> tuple[tuple[tuple[str, str, str], ...], str | None, tuple[str, ...]]:
+        """
+        Find every way of building a word that isn't in the ReadLex from a known word.
+
+        Returns the (prefix, Shaw, suffix) affix decompositions in the order of self.affixes, the Shaw of the
+        singular if the word looks like a plural, and every stem that was looked up. Candidate affixes are looked up by
+        length rather than by testing every affix against the word.
+        """
+        matched_prefixes: set[str] = {lower[:length] for length in self._prefix_lengths if length <= len(lower)}
+        matched_prefixes &= self.prefixes.keys()
+        matched_suffixes: set[str] = {lower[-length:] for length in self._suffix_lengths if length <= len(lower)}
+        matched_suffixes &= self.suffixes.keys()
 
-            # Apply additional tests where there is still no match
+        affix_matches: list[tuple[str, str, str]] = []
+        looked_up: list[str] = []
+        for j in sorted(matched_prefixes | matched_suffixes, key=self._affix_order.__getitem__):
+            if j in matched_prefixes:
+                prefix, suffix, target_word = self.prefixes[j], "", lower[len(j):]
             else:
-                found: bool = False
-                constructed_warning: str = "[c]"
-                '''
-                Try to construct a match using common prefixes and suffixes and include a warning symbol to aid proof
-                reading
-                '''
-                for j in self.affixes:
-                    if token.lower_.startswith(j) and j in self.prefixes:
-                        prefix: str = self.prefixes[j]
-                        suffix: str = ""
-                        target_word: str = token.lower_[len(j):]
-                    elif token.lower_.endswith(j) and j in self.suffixes:
-                        prefix = ""
-                        suffix = self.suffixes[j]
-                        target_word = token.lower_[:-len(j)]
-                    else:
+                prefix, suffix, target_word = "", self.suffixes[j], lower[:-len(j)]
+            looked_up.append(target_word)
+            target: ReadLexWord | None = self.readlex.get(target_word)
+            if target is not None:
+                affix_matches.append((prefix, target.first, suffix))
+
+        plural_match: str | None = None
+        if lower.endswith("s"):
+            looked_up.append(lower[:-1])
+            singular: ReadLexWord | None = self.readlex.get(lower[:-1])
+            if singular is not None:
+                plural_match = singular.first
+
+        return tuple(affix_matches), plural_match, tuple(looked_up)
+
+    def _index_affixes(self):
+        """Index the prefixes and suffixes by length so that candidate affixes can be found with a few slices."""
+        self.affixes: dict[str, str] = self.prefixes | self.suffixes
+        self._affix_order: dict[str, int] = {affix: order for order, affix in enumerate(self.affixes)}
+        self._prefix_lengths: set[int] = {len(prefix) for prefix in self.prefixes}
+        self._suffix_lengths: set[int] = {len(suffix) for suffix in self.suffixes}
+
+    def load_affixes(self, affixes_path: str):
+        """Add prefixes and suffixes from a JSON file of the form {"prefixes": {...}, "suffixes": {...}}."""
+        with open(affixes_path, 'r', encoding="utf-8") as file:
+            extra_affixes: dict[str, dict[str, str]] = json.load(file)
+        for kind, affixes in (("prefixes", self.prefixes), ("suffixes", self.suffixes)):
+            for affix, shaw in extra_affixes.get(kind, {}).items():
+                if not affix:
+                    raise ValueError(f"Empty affix in {kind} of {affixes_path}")
+                affixes[affix.lower()] = shaw
+        self._index_affixes()
+        self._constructed_matches_cached.cache_clear()
+        self._resolve_token_cached.cache_clear()
+        # Affixes given to the constructor are loaded before the result cache exists
+        if hasattr(self, "result_cache"):
+            self.result_cache.reset(self._result_cache_version())
+
+    def close(self):
+        """Save anything still buffered in the persistent caches."""
+        if self.pronunciation_cache is not None:
+            self.pronunciation_cache.close()
+        self.result_cache.close()
+
+    def clear_caches(self):
+        """Empty the in-memory caches, e.g. so that benchmark runs start cold."""
+        self._resolve_token_cached.cache_clear()
+        self._constructed_matches_cached.cache_clear()
+        self._tag_dependent_cached.cache_clear()
+        self.ipa_cache.clear()
+        self.result_cache.clear()
+
+    def recycle(self):
+        """
+        Reload the spaCy pipeline to give back the memory of its Vocab and StringStore, which keep every string the
+        converter has ever seen. Conversions afterwards are unaffected, since nothing else refers to them.
+        """
+        self._initialize_spacy()
+        gc.collect()
+        self.recycles += 1
+
+    def recycle_if_due(self, budget: MemoryBudget | None, requests: int = 1):
+        """Count requests just converted against budget, recycling once it has run out."""
+        reason: str | None = budget.check(requests) if budget is not None else None
+        if reason is not None:
+            print(f"Reloading spaCy {reason}", file=sys.stderr, flush=True)
+            self.recycle()
+            budget.reset()
+
+    def _result_cache_version(self, dictionary_version: str | None = None) -> str:
+        """
+        Describe everything converted text depends on, so that cached results are dropped when any of it changes.
+
+        dictionary_version stands in for that of the loaded ReadLex, to work out what an older cache was stamped with.
+        """
+        depends_on = [
+            _source_hash(), dictionary_version or self.dictionary_version, self.phrases_version,
+            self._snapshot_meta_loaded, self.prefixes, self.suffixes, self._phonetic_version(), self.ner,
+            self.adaptive_pipeline,
+        ]
+        return hashlib.sha256(json.dumps(depends_on, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def refresh_result_cache(self, old_readlex_path: str) -> dict[str, int]:
+        """
+        Carry the on-disk result cache over from the ReadLex JSON at old_readlex_path to the loaded dictionary.
+
+        Only the paragraphs that looked up a word whose entries have changed are dropped, including words that were
+        missing and so fell back to a constructed or phonetic spelling, and the rest are reused by later conversions.
+        This must be called before anything is converted. Returns counts of changed keys and kept and dropped entries.
+        """
+        with open(old_readlex_path, "rb") as file:
+            old_data = file.read()
+        changed: set[str] = changed_readlex_keys(json.loads(old_data), self.readlex_dict)
+        old_version: str = self._result_cache_version(hashlib.sha256(old_data).hexdigest())
+        kept, dropped = self.result_cache.migrate(old_version, changed)
+        return {"changed_keys": len(changed), "kept": kept, "dropped": dropped}
+
+    def token_cache_info(self) -> dict[str, int]:
+        """Return hit, miss and size counters for the per-token resolution cache."""
+        return self._resolve_token_cached.cache_info()._asdict()
+
+    def _start_timer(self) -> float:
+        """Return the start time for a stage, or 0 if profiling is off."""
+        return time.perf_counter() if self.stats is not None else 0.0
+
+    def _record_stage(self, stage: str, started: float) -> float:
+        """Record the time since started against stage when profiling, returning the time now as the next start."""
+        if self.stats is None:
+            return 0.0
+        now: float = time.perf_counter()
+        self.stats.add_stage(stage, now - started)
+        return now
+
+    def stats_report(self) -> dict:
+        """Return the profiling counters and token cache statistics as a JSON-serialisable dict."""
+        report: dict = {
+            "enabled": self.stats is not None,
+            "token_cache": self.token_cache_info(),
+            "result_cache": self.result_cache.info(),
+            "ipa_cache": {"size": len(self.ipa_cache), "max_size": self.ipa_cache.max_size},
+            "memory": {"rss_mb": _current_rss_mb(), "peak_rss_mb": _peak_rss_mb(),
+                       "strings": len(self.nlp.vocab.strings), "recycles": self.recycles},
+        }
+        if self.stats is not None:
+            report |= self.stats.report()
+        return report
+
+    def _normalize_apostrophes(self, text: str) -> str:
+        """Normalize apostrophes to ASCII."""
+        return text.replace("’", "'").replace("‘", "'")
+
+    def _split_fragments(self, text: str, mode: str = "auto") -> tuple[bool, list[tuple[bool, str]]]:
+        """
+        Split text into (convert, fragment) pairs, returning whether the text is HTML.
+
+        In "auto" mode text is treated as HTML if it starts with an HTML doctype; "html" and "plain" force one or the
+        other, e.g. for XHTML documents that start with an XML declaration.
+        """
+        if mode not in CONVERSION_MODES:
+            raise ValueError(f"Unknown conversion mode {mode!r}, expected one of {', '.join(CONVERSION_MODES)}")
+        text = self._normalize_apostrophes(text)
+        fragments: list[tuple[bool, str]] = []
+
+        # Split up the string to reduce the risk of spaCy exceeding memory limits
+        if mode == "html" or (mode == "auto" and text.strip().casefold().startswith("<!doctype html")):
+            for kind, text_part in self._scan_html(text):
+                if kind == "text" and "&" in text_part:
+                    # Convert the characters that entities and character references stand for, rather than their
+                    # names; _convert_plans escapes the converted text again
+                    text_part = self._normalize_apostrophes(html.unescape(text_part))
+                fragments.append((kind == "text", text_part))
+            return True, fragments
+
+        return False, self._plain_fragments(text)
+
+    def _scan_html(self, text: str) -> Iterator[tuple[str, str]]:
+        """
+        Split an HTML document into ("style" | "script" | "tag" | "text", text) events in a single pass.
+
+        A <style> or <script> element runs from its opening tag to the first matching closing tag and is passed through
+        whole, as is any other tag up to the first '>'. A '<' that starts no complete tag is ordinary text. Runs of text
+        between markup are emitted whole and empty runs are skipped, except that a run which is itself a complete tag
+        (which only happens around malformed elements like <styles>...</style>) is treated as markup.
+        """
+        position: int = 0  # Start of the text not yet emitted
+        search: int = 0  # Where to look for the next '<'
+        while True:
+            start: int = text.find("<", search)
+            if start == -1:
+                break
+            tag_end: int = text.find(">", start + 1)
+            if tag_end == -1:
+                # Without another '>' nothing from here on can be markup
+                break
+
+            kind: str = "tag"
+            end: int = tag_end + 1
+            for element in ("style", "script"):
+                if not text.startswith(element, start + 1):
+                    continue
+                # The opening tag ends at the first '>' after the element name, and the element at the first closing tag
+                name_end: int = start + 1 + len(element)
+                open_end: int = text.find(">", name_end)
+                close: int = text.find(f"</{element}>", open_end + 1) if open_end != -1 else -1
+                if close == -1:
+                    # Unclosed, so it is just an ordinary tag
+                    break
+                if name_end < len(text) and (text[name_end].isalnum() or text[name_end] == "_"):
+                    # Something like <styles>...</style>: neither an element nor an ordinary tag, so the '<' is text
+                    kind = ""
+                else:
+                    kind, end = element, close + len(element) + 3
+                break
+
+            if not kind:
+                search = start + 1
+                continue
+            if start > position:
+                yield self._classify_text_run(text[position:start]), text[position:start]
+            yield kind, text[start:end]
+            position = search = end
+
+        if position < len(text):
+            yield self._classify_text_run(text[position:]), text[position:]
+
+    def _classify_text_run(self, text_run: str) -> str:
+        """Return the kind of a run of text between markup, which is "text" unless the whole run is a tag."""
+        if not (text_run.startswith("<") and text_run.endswith(">")):
+            return "text"
+        for kind, pattern in self.html_patterns.items():
+            if pattern.fullmatch(text_run):
+                return kind
+        return "text"
+
+    def _plain_fragments(self, text: str) -> list[tuple[bool, str]]:
+        """Split plain text into lines to convert, separated by newlines to pass through."""
+        fragments: list[tuple[bool, str]] = []
+        # Don't use unidecode as it strips Unicode characters including Shavian
+        # text = unidecode.unidecode(text)
+        text = re.sub(r"(\S)(\[)", r"\1 \2", text)
+        text = re.sub(r"](\S)", r"] \1", text)
+        text_split: list[str] = text.splitlines()
+        for i in text_split:
+            fragments.extend((True, piece) for piece in self._split_long_line(i))
+            fragments.append((False, "\n"))
+        return fragments
+
+    def _split_long_line(self, line: str) -> list[str]:
+        """
+        Cut a line into pieces shorter than max_fragment_length so that spaCy never sees an overlong doc.
+
+        Cuts go after the last sentence end in range, or failing that the last run of whitespace, so words (and their
+        contractions and possessives) are never split. Whitespace cuts avoid separating 'have', 'used' etc. from a
+        following 'to' and the word after it.
+        """
+        pieces: list[str] = []
+        while len(line) >= self.max_fragment_length:
+            window: str = line[:self.max_fragment_length - 1]
+            cut: int = 0
+            for match in self.sentence_boundary_regex.finditer(window):
+                cut = match.end()
+            if not cut:
+                for match in re.finditer(r"\s+", window):
+                    before: list[str] = window[:match.start()].rsplit(None, 2)[-2:]
+                    after: str = line[match.end():match.end() + 3].lower()
+                    if after[:2] == "to" and not after[2:3].isalpha():
                         continue
-                    if target_word in self.readlex_dict:
-                        found = True
-                        for i in self.readlex_dict.get(target_word):
-                            prefix = "·" if token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents and not i["Shaw"].startswith("⸰") else prefix
-                            text_split_shaw += prefix + i["Shaw"] + suffix + constructed_warning + token.whitespace_
-                            break
-
-                # Try to construct plurals if not expressly included in the ReadLex, e.g. plurals of proper names.
-                if token.lower_.endswith("s"):
-                    target_word = token.lower_[:-1]
-                    if target_word in self.readlex_dict:
-                        found = True
-                        for i in self.readlex_dict.get(target_word):
-                            suffix = "𐑕" if i["Shaw"][-1] in self.s_follows else "𐑩𐑟" if i["Shaw"][-1] in self.uhz_follows else "𐑟"
-                            prefix = "·" if token.ent_iob_ == "B" and token.ent_type_ in self.namer_dot_ents and not i["Shaw"].startswith("⸰") else ""
-                            text_split_shaw += prefix + i["Shaw"] + suffix + constructed_warning + token.whitespace_
-                            break
-
-                if found is not False:
+                    if len(before) == 2 and before[1].lower() == "to" and before[0].lower() in self.before_to:
+                        continue
+                    cut = match.end()
+            if not cut or cut == len(line):
+                # No usable boundary at all, so fall back to a hard cut
+                cut = self.max_fragment_length - 1
+            pieces.append(line[:cut])
+            line = line[cut:]
+        pieces.append(line)
+        return pieces
+
+    def _finish_text(self, text_shaw: str, is_html: bool, stages: dict[str, float] | None = None) -> str:
+        """
+        Apply typographic clean-up to converted text. If stages is given, the time each step takes is added to it under
+        "typography", "smartypants" and "beautifulsoup", whether or not profiling is on.
+        """
+        def record(stage: str, started: float) -> float:
+            if stages is None:
+                return self._record_stage(stage, started)
+            now: float = time.perf_counter()
+            stages[stage] = stages.get(stage, 0.0) + now - started
+            self._record_stage(stage, started)
+            return now
+
+        started: float = time.perf_counter() if stages is not None else self._start_timer()
+        if not is_html:
+            educated: str | None = educate_plain_text(text_shaw)
+            # Including the attempts that fall back to smartypants
+            started = record("typography", started)
+            if educated is not None:
+                return educated
+
+        import smartypants
+
+        # Convert dumb quotes, double hyphens, etc. to their typographic equivalents
+        text_shaw = smartypants.smartypants(text_shaw)
+        # Convert curly quotes to angle quotes
+        quotation_marks: dict[str, str] = {"&#8216;": "&lsaquo;", "&#8217;": "&rsaquo;", "&#8220;": "&laquo;", "&#8221;": "&raquo;"}
+        for key, value in quotation_marks.items():
+            text_shaw = text_shaw.replace(key, value)
+        started = record("smartypants", started)
+        if not is_html:
+            from bs4 import BeautifulSoup
+            text_shaw = str(BeautifulSoup(text_shaw, features="html.parser"))
+            record("beautifulsoup", started)
+        return text_shaw
+
+    def convert_text(self, text: str, mode: str = "auto") -> str:
+        """Convert Latin text to Shavian script, as plain text or HTML according to mode (see _split_fragments)."""
+        # Markup passes straight through and the text between it goes through spaCy in bulk
+        return next(self._convert_plans([self._split_fragments(text, mode)]))
+
+    def convert_many(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1) -> list[str]:
+        """
+        Convert several texts at once, streaming every fragment through nlp.pipe.
+
+        Produces the same output as calling convert_text on each text in turn, but lets spaCy tag
+        fragments in batches (and optionally across several processes) instead of one call per line.
+        """
+        plans: list[tuple[bool, list[tuple[bool, str]]]] = [self._split_fragments(text) for text in texts]
+        return list(self._convert_plans(plans, batch_size, n_process))
+
+    def _convert_plans(self, plans: list[tuple[bool, list[tuple[bool, str]]]], batch_size: int = 64,
+                       n_process: int = 1, vocabulary_first: bool = False,
+                       word_counts: dict[tuple[str, str, bool], int] | None = None) -> Iterator[str]:
+        """
+        Convert the fragments of split-up texts through nlp.pipe, yielding each finished text.
+
+        Fragments found in the result cache, or repeated within plans, are only tagged and converted once. With
+        vocabulary_first, every fragment is tagged and its words resolved (see _resolve_vocabulary) before any is
+        converted. If word_counts is given, it counts every token spelt by _resolve_token, as convert() does, and the
+        result cache isn't read, since cached fragments couldn't be counted.
+        """
+        # Look up every fragment first, so that only the first occurrence of each uncached one goes through spaCy
+        converted: dict[str, str] = {}
+        occurrences: dict[str, int] = {}
+        to_tag: list[str] = []
+        for _, fragments in plans:
+            for convertible, fragment in fragments:
+                # Empty fragments always convert to an empty string, so don't send them through spaCy
+                if not convertible or not fragment:
                     continue
-                
-                # Phonetic fallback: if no match found, try phonetic transliteration
-                if token.text.isalpha():
-                    phonetic_result = self._phonetic_transliterate(token.text)
-                    text_split_shaw += phonetic_result + token.whitespace_
+                occurrences[fragment] = occurrences.get(fragment, 0) + 1
+                if fragment in converted:
+                    self.result_cache.count_repeat()
+                    continue
+                result: str | None = self.result_cache.get(fragment) if word_counts is None else None
+                if result is None:
+                    to_tag.append(fragment)
+                    result = ""  # Placeholder until it is converted below
+                converted[fragment] = result
+
+        # The glossary lists words by tag, so every fragment is tagged for it
+        docs: Iterator[spacy.tokens.Doc] = self._pipe(to_tag, batch_size, n_process,
+                                                      self.adaptive_pipeline and word_counts is None)
+        if vocabulary_first:
+            started: float = self._start_timer()
+            tagged: list[spacy.tokens.Doc] = list(docs)
+            if n_process != 1:
+                self._record_stage("pipeline", started)
+            tagged = [self._postprocess_doc(doc) for doc in tagged]
+            self._resolve_vocabulary(tagged)
+            docs = iter(tagged)
+        pending: set[str] = set(to_tag)
+
+        for is_html, fragments in plans:
+            text_shaw: list[str] = []
+            for convertible, fragment in fragments:
+                if not convertible:
+                    text_shaw.append(fragment)
+                elif fragment in pending:
+                    # The first occurrence of a fragment that wasn't cached, which is the next doc out of spaCy
+                    pending.discard(fragment)
+                    started = self._start_timer()
+                    doc: spacy.tokens.Doc = next(docs)
+                    if not vocabulary_first:
+                        if n_process != 1:
+                            # Tagging happened in other processes, so all we can see is how long we waited for it
+                            self._record_stage("pipeline", started)
+                        doc = self._postprocess_doc(doc)
+                    started = self._start_timer()
+                    used_keys: set[str] | None = set() if self.result_cache.records_keys else None
+                    fragment_counts: dict[tuple[str, str, bool], int] | None = {} if word_counts is not None else None
+                    converted[fragment] = self.convert(doc, used_keys, fragment_counts)
+                    self._record_stage("convert", started)
+                    if fragment_counts:
+                        # The fragment is only converted once however often it occurs
+                        for word, count in fragment_counts.items():
+                            word_counts[word] = word_counts.get(word, 0) + count * occurrences[fragment]
+                    self.result_cache.put(fragment, converted[fragment], used_keys or ())
+                    text_shaw.append(self._escape_fragment(converted[fragment], is_html))
+                elif fragment:
+                    text_shaw.append(self._escape_fragment(converted[fragment], is_html))
+            yield self._finish_text("".join(text_shaw), is_html)
+
+    @staticmethod
+    def _escape_fragment(text_shaw: str, is_html: bool) -> str:
+        """Escape a converted fragment of HTML text, whose entities _split_fragments decoded, as the Node path does."""
+        return html.escape(text_shaw, quote=False) if is_html else text_shaw
+
+    def convert_book(self, texts: Iterable[str], glossary_path: str | None = None, batch_size: int = 64,
+                     n_process: int = 1) -> list[str]:
+        """
+        Convert the texts of one book, such as its chapters, vocabulary first.
+
+        Everything is tagged before anything is converted, so that each distinct word is resolved once and the IPA of
+        every word bound for the phonetic fallback is fetched in one batch for the whole book. The output is the same
+        as convert_many's. If glossary_path is given, a CSV of the constructed [c] and phonetic [p] spellings used is
+        written there for proofreading; since it lists words by tag, every fragment is then run through the whole
+        pipeline even with adaptive_pipeline, which is slower but converts to the same text.
+        """
+        plans: list[tuple[bool, list[tuple[bool, str]]]] = [self._split_fragments(text) for text in texts]
+        word_counts: dict[tuple[str, str, bool], int] | None = {} if glossary_path else None
+        results: list[str] = list(self._convert_plans(plans, batch_size, n_process, True, word_counts))
+        if glossary_path:
+            self.write_glossary(glossary_path, word_counts)
+        return results
+
+    def write_glossary(self, path: str, word_counts: dict[tuple[str, str, bool], int]):
+        """
+        Write the words of word_counts (see _convert_plans) whose spelling was constructed or phonetic to a CSV file,
+        one row per word and tag, most frequent first.
+        """
+        rows: dict[tuple[str, str], list] = {}
+        for (text, tag, namer), count in word_counts.items():
+            _, pieces, _ = self._resolve_token_cached(text, tag, namer)
+            spelling: str = " ".join(pieces)
+            if "[c]" not in spelling and "[p]" not in spelling:
+                continue
+            if (text, tag) in rows:
+                rows[text, tag][4] += count
+            else:
+                # Names are spelt the same either way apart from the namer dot, so the first spelling seen will do
+                rows[text, tag] = [text, tag, "[c]" if "[c]" in spelling else "[p]", spelling, count]
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["word", "tag", "kind", "shavian", "count"])
+            writer.writerows(sorted(rows.values(), key=lambda row: (-row[4], row[0].lower(), row[1])))
+
+    def convert_epub(self, input_path: str, output_path: str, workers: int = 0, budget: MemoryBudget | None = None,
+                     journal: ConversionJournal | None = None) -> dict[str, int]:
+        """
+        Convert the XHTML spine documents of an EPUB in HTML mode and write the book to output_path, returning how many
+        documents were converted, how many failed (and were kept unchanged) and how many other files were copied.
+
+        Images, stylesheets, fonts and metadata are streamed across unchanged, after the mimetype entry, which the
+        format requires to come first and uncompressed. With workers, the documents are converted in a WorkerPool
+        while the other files are copied, and each is written out as soon as its worker finishes. The book is written
+        to a temporary file first, so a failed run never leaves a truncated one behind. Documents already in the
+        journal aren't converted again.
+        """
+        counts: dict[str, int] = {"converted": 0, "failed": 0, "copied": 0}
+        temp_path: str = output_path + ".tmp"
+        pool: WorkerPool | None = None
+        try:
+            with zipfile.ZipFile(input_path) as epub_in, zipfile.ZipFile(temp_path, "w") as epub_out:
+                documents: list[str] = epub_spine_documents(epub_in)
+
+                def entry(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+                    # A copy of info for the output, compressed the same way
+                    copied = zipfile.ZipInfo(info.filename, info.date_time)
+                    copied.compress_type = info.compress_type
+                    copied.external_attr = info.external_attr
+                    copied.file_size = info.file_size
+                    return copied
+
+                def write_document(index: int, result: str | None, recorded: bool = False):
+                    info: zipfile.ZipInfo = epub_in.getinfo(documents[index])
+                    if not result:
+                        print(f"Error: could not convert {info.filename}, keeping it unchanged",
+                              file=sys.stderr, flush=True)
+                        epub_out.writestr(entry(info), epub_in.read(info))
+                        counts["failed"] += 1
+                        return
+                    if journal is not None and not recorded:
+                        journal.record(texts[index], "html", result)
+                    epub_out.writestr(entry(info), _xml_safe_entities(result).encode("utf-8"))
+                    counts["converted"] += 1
+
+                def collect(timeout: float | None):
+                    ready: list = multiprocessing.connection.wait(pool.wait_objects(), timeout)
+                    for index, result in pool.process(ready):
+                        write_document(index, result)
+
+                mimetype: bytes = (epub_in.read("mimetype") if "mimetype" in epub_in.namelist() else
+                                   b"application/epub+zip")
+                epub_out.writestr(zipfile.ZipInfo("mimetype"), mimetype, zipfile.ZIP_STORED)
+
+                texts: list[str | None] = []
+                for index, name in enumerate(documents):
+                    try:
+                        texts.append(epub_in.read(name).decode("utf-8"))
+                    except UnicodeDecodeError:
+                        texts.append(None)
+                        write_document(index, None)
+                        continue
+                    recorded: str | None = journal.get(texts[index], "html") if journal is not None else None
+                    if recorded is not None:
+                        write_document(index, recorded, recorded=True)
+                        # Nothing left to convert
+                        texts[index] = None
+                if workers > 0:
+                    pool = WorkerPool(self, workers, budget=budget)
+                    for index, text in enumerate(texts):
+                        if text is not None:
+                            pool.submit(index, text, "html")
+
+                converted_names: set[str] = set(documents)
+                for info in epub_in.infolist():
+                    if info.filename == "mimetype" or info.filename in converted_names:
+                        continue
+                    if info.is_dir():
+                        epub_out.writestr(entry(info), b"")
+                    else:
+                        with epub_in.open(info) as source, epub_out.open(entry(info), "w") as target:
+                            shutil.copyfileobj(source, target, 1 << 20)
+                    counts["copied"] += 1
+                    if pool is not None:
+                        # Write out finished documents between files, so that workers aren't kept waiting to send them
+                        collect(0)
+
+                if pool is not None:
+                    while pool.busy:
+                        collect(None)
                 else:
-                    text_split_shaw += token.text + token.whitespace_
+                    for index, text in enumerate(texts):
+                        if text is not None:
+                            write_document(index, self._convert_request(text, "html"))
+                            self.recycle_if_due(budget)
+            os.replace(temp_path, output_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if pool is not None:
+                pool.close()
+        return counts
 
-        return text_split_shaw
+    def _pipe(self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1,
+              adaptive: bool = False) -> Iterator[spacy.tokens.Doc]:
+        """
+        Run texts through the spaCy pipeline like nlp.pipe, recording the time spent in each component if profiling.
 
-    def convert_text(self, text: str) -> str:
-        """Convert Latin text to Shavian script."""
-        # Normalize apostrophes to ASCII
-        text = text.replace("’", "'").replace("‘", "'")
-        # Create the string that will contain the Shavianised text.
-        text_shaw: str = ""
+        If adaptive, each text is tokenised first and only sent through the pipeline components if _needs_pipeline
+        says so; the rest come out as they are, or with their phrases merged if that is a pipeline component. The docs
+        are yielded in the order of texts either way.
+        """
+        profiled: bool = self.stats is not None and n_process == 1
+        if not adaptive:
+            if profiled:
+                return self._profiled_pipe(map(self.nlp.make_doc, texts), batch_size)
+            return self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
 
-        # Split up the string to reduce the risk of spaCy exceeding memory limits
-        if text.strip().casefold().startswith("<!doctype html"):
-            style_pattern: str = r"(<style\b[^>]*>.*?</style>)"
-            script_pattern: str = r"(<script\b[^>]*>.*?</script>)"
-            html_pattern: str = r"(?!(?:<style[^>]*?>.*?</style>|<script[^>]*?>.*?</script>))(<.*?>)"
-            html_patterns: str = f"{style_pattern}|{script_pattern}|{html_pattern}"
-            text_split: list[str] = re.split(html_patterns, text, flags=re.DOTALL)
-            for text_part in text_split:
-                if text_part is None:
-                    pass
-                elif re.fullmatch(style_pattern, text_part, flags=re.DOTALL) or re.fullmatch(
-                        script_pattern, text_part, flags=re.DOTALL) or re.fullmatch(html_pattern, text_part, flags=re.DOTALL):
-                    text_shaw += text_part
+        # Each text's doc if it skips the pipeline, or None if its doc is the next to come out of the pipeline
+        routes: deque[spacy.tokens.Doc | None] = deque()
+
+        def route() -> Iterator[spacy.tokens.Doc]:
+            for text in texts:
+                doc = self.nlp.make_doc(text)
+                if self._needs_pipeline(doc):
+                    routes.append(None)
+                    yield doc
                 else:
-                    doc: spacy.tokens.Doc = self.tokenise(text_part)
-                    text_shaw += self.convert(doc)
+                    routes.append(self.phrase_merger(doc) if self.pipeline_phrases else doc)
 
-            # Convert dumb quotes, double hyphens, etc. to their typographic equivalents
-            text_shaw = smartypants.smartypants(text_shaw)
-            # Convert curly quotes to angle quotes
-            quotation_marks: dict[str, str] = {"&#8216;": "&lsaquo;", "&#8217;": "&rsaquo;", "&#8220;": "&laquo;", "&#8221;": "&raquo;"}
-            for key, value in quotation_marks.items():
-                text_shaw = text_shaw.replace(key, value)
+        def merge(tagged: Iterable[spacy.tokens.Doc]) -> Iterator[spacy.tokens.Doc]:
+            # By the time the pipeline yields a doc, every text before it has been routed
+            for doc in tagged:
+                while routes[0] is not None:
+                    yield routes.popleft()
+                routes.popleft()
+                yield doc
+            yield from routes
 
-        else:
-            # Don't use unidecode as it strips Unicode characters including Shavian
-            # text = unidecode.unidecode(text)
-            text = re.sub(r"(\S)(\[)", r"\1 \2", text)
-            text = re.sub(r"](\S)", r"] \1", text)
-            text_split: list[str] = text.splitlines()
-            for i in text_split:
-                if len(i) < 10000:
-                    doc: spacy.tokens.Doc = self.tokenise(i)
-                    text_shaw += self.convert(doc) + "\n"
-            # Convert dumb quotes, double hyphens, etc. to their typographic equivalents
-            text_shaw = smartypants.smartypants(text_shaw)
-            quotation_marks: dict[str, str] = {"&#8216;": "&lsaquo;", "&#8217;": "&rsaquo;", "&#8220;": "&laquo;", "&#8221;": "&raquo;"}
-            for key, value in quotation_marks.items():
-                text_shaw = text_shaw.replace(key, value)
-            text_shaw = str(BeautifulSoup(text_shaw, features="html.parser"))
+        if profiled:
+            return merge(self._profiled_pipe(route(), batch_size))
+        return merge(self.nlp.pipe(route(), batch_size=batch_size, n_process=n_process))
 
-        return text_shaw
+    def _profiled_pipe(self, docs: Iterable[spacy.tokens.Doc], batch_size: int) -> Iterator[spacy.tokens.Doc]:
+        """
+        Run freshly tokenised docs through the spaCy pipeline components, recording the time spent in each, and the
+        time spent producing docs as tokenising.
+
+        The components are chained generators, so the time taken to pull a doc out of one includes the time its
+        upstream components spent producing it; that is subtracted to leave each component's own time.
+        """
+        total: list[float] = [0.0]
+        docs = self._timed_stage("tokenise", docs, [0.0], total)
+        for name, component in self.nlp.pipeline:
+            if hasattr(component, "pipe"):
+                component_docs: Iterable[spacy.tokens.Doc] = component.pipe(docs, batch_size=batch_size)
+            else:
+                component_docs = map(component, docs)
+            upstream_total, total = total, [0.0]
+            docs = self._timed_stage(f"pipeline.{name}", component_docs, upstream_total, total)
+        return docs
+
+    def _timed_stage(self, stage: str, docs: Iterable[spacy.tokens.Doc], upstream_total: list[float],
+                     total: list[float]) -> Iterator[spacy.tokens.Doc]:
+        """
+        Yield from docs, adding the time taken to produce each doc to total and recording it, less the time
+        upstream_total grew by meanwhile, as the stage's own time.
+        """
+        iterator: Iterator[spacy.tokens.Doc] = iter(docs)
+        while True:
+            upstream_before: float = upstream_total[0]
+            started: float = time.perf_counter()
+            try:
+                doc = next(iterator)
+            except StopIteration:
+                return
+            elapsed: float = time.perf_counter() - started
+            total[0] += elapsed
+            self.stats.add_stage(stage, elapsed - (upstream_total[0] - upstream_before))
+            yield doc
+
+    def iter_convert(self, file_like: IO[str], chunk_size: int = 65536) -> Iterator[str]:
+        """
+        Convert text read incrementally from a file-like object, yielding converted pieces as they are ready.
+
+        Plain text is read chunk_size characters at a time and converted a block of whole lines at a time, with overlong
+        lines cut as in convert_text, so memory stays bounded by the chunk size however large the input is. The result
+        matches convert_text except that quote education and markup clean-up can't see across block boundaries. HTML
+        documents are converted in one go.
+        """
+        buffer: str = self._normalize_apostrophes(file_like.read(chunk_size))
+        # Small chunks are read on until there is enough to tell whether the input starts with a doctype
+        while len(buffer.lstrip()) < len("<!doctype html") and "<!doctype html".startswith(buffer.lstrip().casefold()):
+            more: str = file_like.read(chunk_size)
+            if not more:
+                break
+            buffer += self._normalize_apostrophes(more)
+        if buffer.strip().casefold().startswith("<!doctype html"):
+            yield self.convert_text(buffer + file_like.read())
+            return
+
+        while True:
+            data: str = self._normalize_apostrophes(file_like.read(chunk_size))
+            if not data:
+                # End of input: convert whatever is left
+                if buffer:
+                    yield from self._convert_plans([(False, self._plain_fragments(buffer))])
+                return
+            buffer += data
+
+            # Convert complete lines, leaving any partial last line in the buffer
+            cut: int = buffer.rfind("\n") + 1
+            if cut:
+                block, buffer = buffer[:cut], buffer[cut:]
+                yield from self._convert_plans([(False, self._plain_fragments(block))])
+            elif len(buffer) >= self.max_fragment_length:
+                # A single very long line: convert all but its last piece, which may continue in the next read
+                fragments: list[tuple[bool, str]] = self._plain_fragments(buffer)
+                buffer = fragments[-2][1]
+                yield from self._convert_plans([(False, fragments[:-2])])
+
+    def write_stats(self, path: str, report: dict | None = None):
+        """Write a stats report (by default this converter's own) to path as JSON."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report if report is not None else self.stats_report(), file, indent=2)
+            file.write("\n")
+
+    def _convert_request(self, text: str, mode: str = "auto") -> str | None:
+        """Convert the text of a single request, returning None if conversion fails."""
+        try:
+            return self.convert_text(text, mode)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr, flush=True)
+            return None
+
+    def _convert_requests(self, requests: list[tuple[str, str]]) -> list[str | None]:
+        """
+        Convert the (text, mode) of several requests in one pass through nlp.pipe. If that fails, they are converted
+        one at a time instead, so that one bad request doesn't lose the others' results.
+        """
+        try:
+            return list(self._convert_plans([self._split_fragments(text, mode) for text, mode in requests]))
+        except Exception:
+            return [self._convert_request(text, mode) for text, mode in requests]
+
+    def run_stdin_stdout_mode(self, workers: int = 0, profile_out: str | None = None,
+                              budget: MemoryBudget | None = None, journal: ConversionJournal | None = None):
+        """
+        Run in stdin/stdout mode for long-running processes.
 
-    def run_stdin_stdout_mode(self):
-        """Run in stdin/stdout mode for long-running processes."""
-        import sys
+        Requests are read and answered in either protocol version (see RequestStream), one at a time. The reserved
+        STATS request is answered with the stats report. If profile_out is given, the final stats report is written
+        there on exit. When the memory budget runs out, the spaCy pipeline is reloaded between requests. Requests
+        already in the journal are answered from it, and a request that can't be converted is answered with an error
+        (see RequestStream.respond_error).
+        """
         import traceback
-        
-        print("READY", file=sys.stderr, flush=True)  # Signal that we're ready
+
+        if workers > 0:
+            self._run_worker_pool_mode(workers, profile_out, budget, journal)
+            return
+
+        stream = RequestStream(sys.stdout.buffer)
+        stdin_fd = sys.stdin.fileno()
+
+        # Signal that we're ready
+        print(f"READY startup={self.startup_seconds:.3f}s{_memory_note()}", file=sys.stderr, flush=True)
         
         try:
             while True:
-                try:
-                    # Read a line from stdin
-                    line = sys.stdin.readline()
-                    if not line:  # EOF
-                        break
-                    
-                    line = line.rstrip('\n')
-                    # Parse the request format: "ID:TEXT"
-                    colon_index = line.find(':')
-                    if colon_index == -1:
-                        continue  # Skip malformed requests
-                    
-                    request_id = line[:colon_index]
-                    text = line[colon_index + 1:]
-                    
-                    # If text is empty or whitespace, just return empty string
-                    if not text.strip():
-                        print(f"{request_id}:", flush=True)
+                data = os.read(stdin_fd, 65536)
+                for command, request_id, text, options in stream.feed(data):
+                    # Each request is answered before the next is read, so there is never one left to cancel
+                    if command == CANCEL_REQUEST:
                         continue
-                    
                     try:
-                        result = self.convert_text(text)
-                        print(f"{request_id}:{result}", flush=True)
+                        if command == STATS_REQUEST:
+                            stream.respond_stats(request_id, self.stats_report())
+                        # If text is empty or whitespace, just return empty string
+                        elif not text.strip():
+                            stream.respond(request_id, "")
+                        else:
+                            mode: str = options.get("mode", "auto")
+                            result: str | None = journal.get(text, mode) if journal is not None else None
+                            if result is None:
+                                result = self._convert_request(text, mode)
+                                if result is not None and journal is not None:
+                                    journal.record(text, mode, result)
+                                self.recycle_if_due(budget)
+                            if result is None:
+                                stream.respond_error(request_id, "conversion failed")
+                            else:
+                                stream.respond(request_id, result)
                     except Exception as e:
-                        print(f"Error: {e}", file=sys.stderr, flush=True)
-                        print(f"{request_id}:", flush=True)
-                except Exception as e:
-                    print(f"Exception: {e}", file=sys.stderr, flush=True)
-                    traceback.print_exc(file=sys.stderr)
+                        print(f"Exception: {e}", file=sys.stderr, flush=True)
+                        traceback.print_exc(file=sys.stderr)
+                if not data:  # EOF
+                    break
         except KeyboardInterrupt:
             pass
+        finally:
+            if profile_out:
+                self.write_stats(profile_out)
+
+    def run_server_mode(self, address: str, workers: int = 0, max_pending: int = 256,
+                        request_timeout: float | None = None, profile_out: str | None = None,
+                        budget: MemoryBudget | None = None):
+        """
+        Serve many clients at once on a Unix domain socket ("unix:PATH") or local TCP ("HOST:PORT") until interrupted,
+        converting in this process or in a pool of forked workers (see ConversionServer).
+        """
+        import asyncio
+
+        server = ConversionServer(self, workers, max_pending, request_timeout, budget=budget)
+        asyncio.run(server.serve(address, profile_out))
+
+    def _run_worker_pool_mode(self, workers: int, profile_out: str | None = None, budget: MemoryBudget | None = None,
+                              journal: ConversionJournal | None = None):
+        """
+        Serve the stdin/stdout protocol from a pool of forked workers.
+
+        This process acts as the supervisor: it reads requests, hands them to idle workers and writes each response as
+        soon as its worker finishes, so responses may arrive out of order. The supervisor is deliberately
+        single-threaded, since forking replacement workers from a multi-threaded process is unsafe.
+
+        A STATS request is passed to every worker, and answered with their merged reports once they have all replied.
+        Requests already in the journal are answered by the supervisor without reaching a worker.
+        """
+        pool = WorkerPool(self, workers, budget=budget)
+        stream = RequestStream(sys.stdout.buffer)
+        stdin_fd = sys.stdin.fileno()
+        request_ids: dict[int, object] = {}
+        # The (text, mode) of each request in progress, kept to record its result in the journal
+        request_inputs: dict[int, tuple[str, str]] = {}
+        next_key = 0
+        stdin_open = True
+        # Outstanding STATS requests, as the request ID, the keys of the workers yet to reply and the reports received
+        # so far, and the one gathered on exit for profile_out
+        stats_requests: list[tuple[object, set[int], list[dict]]] = []
+        final_stats: tuple[object, set[int], list[dict]] | None = None
+
+        def request_stats(request_id: object) -> tuple[object, set[int], list[dict]]:
+            nonlocal next_key
+            keys = list(range(next_key, next_key + len(pool)))
+            next_key += len(keys)
+            pool.broadcast(keys, STATS_REQUEST)
+            return request_id, set(keys), []
+
+        # Signal that we're ready
+        print(f"READY startup={self.startup_seconds:.3f}s{_memory_note()}", file=sys.stderr, flush=True)
+
+        try:
+            while stdin_open or pool.busy:
+                ready = multiprocessing.connection.wait(pool.wait_objects() + ([stdin_fd] if stdin_open else []))
+                if stdin_fd in ready:
+                    data = os.read(stdin_fd, 65536)
+                    if not data:  # EOF
+                        stdin_open = False
+                    for command, request_id, text, options in stream.feed(data):
+                        if command == STATS_REQUEST:
+                            stats_requests.append(request_stats(request_id))
+                            continue
+                        if command == CANCEL_REQUEST:
+                            continue
+                        # If text is empty or whitespace, just return empty string
+                        if not text.strip():
+                            stream.respond(request_id, "")
+                            continue
+                        mode: str = options.get("mode", "auto")
+                        if journal is not None:
+                            recorded: str | None = journal.get(text, mode)
+                            if recorded is not None:
+                                stream.respond(request_id, recorded)
+                                continue
+                            request_inputs[next_key] = (text, mode)
+                        request_ids[next_key] = request_id
+                        pool.submit(next_key, text, mode)
+                        next_key += 1
+
+                for key, result in pool.process([obj for obj in ready if obj != stdin_fd]):
+                    if key not in request_ids:
+                        # A worker's stats report; workers that failed to report are left out
+                        for _, waiting, reports in stats_requests + ([final_stats] if final_stats else []):
+                            if key in waiting:
+                                waiting.discard(key)
+                                if result is not None:
+                                    reports.append(result)
+                        continue
+                    request_id = request_ids.pop(key)
+                    inputs: tuple[str, str] | None = request_inputs.pop(key, None)
+                    if result is None:
+                        print(f"Error: request {request_id} could not be converted", file=sys.stderr, flush=True)
+                        stream.respond_error(request_id, "conversion failed")
+                        continue
+                    if inputs is not None:
+                        journal.record(*inputs, result)
+                    stream.respond(request_id, result)
+
+                # Answer STATS requests in order once every worker has reported
+                while stats_requests and not stats_requests[0][1]:
+                    request_id, _, reports = stats_requests.pop(0)
+                    stream.respond_stats(request_id, pool.merge_reports(reports))
+
+                if profile_out and not stdin_open and final_stats is None:
+                    final_stats = request_stats(None)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close()
+
+        if profile_out and final_stats is not None and not final_stats[1]:
+            self.write_stats(profile_out, pool.merge_reports(final_stats[2]))
+
+
+class MemoryBudget:
+    """
+    Decides when a long-running converter should be recycled to give back memory: after recycle_after requests, or
+    once the process's resident set is larger than max_rss_mb. spaCy's Vocab and StringStore keep every string they
+    have seen, so otherwise a process converting a whole library grows until it runs out of memory.
+    """
+
+    def __init__(self, max_rss_mb: float | None = None, recycle_after: int | None = None):
+        self.max_rss_mb = max_rss_mb
+        self.recycle_after = recycle_after
+        # Requests handled since the converter was last recycled
+        self.handled: int = 0
+
+    def check(self, requests: int = 1) -> str | None:
+        """Count requests just handled, returning why the converter should now be recycled, or None if not yet."""
+        self.handled += requests
+        if self.recycle_after is not None and self.handled >= self.recycle_after:
+            return f"after {self.handled} requests"
+        if self.max_rss_mb is not None:
+            rss: float | None = _current_rss_mb()
+            if rss is not None and rss > self.max_rss_mb:
+                return f"at {rss:.1f}MiB after {self.handled} requests"
+        return None
+
+    def reset(self):
+        """Start counting again once the converter has been recycled."""
+        self.handled = 0
+
+
+class _PoolWorker:
+    """Bookkeeping for a single forked worker process."""
+
+    def __init__(self, process: multiprocessing.process.BaseProcess, conn: multiprocessing.connection.Connection):
+        self.process = process
+        self.conn = conn
+        # The (key, kind, payload, target) request the worker is currently handling
+        self.current: tuple[int, str, object, int | None] | None = None
+
+
+def _pool_worker_main(converter: LatinToShavian, conn: multiprocessing.connection.Connection,
+                      supervisor_conns: list[multiprocessing.connection.Connection], budget: MemoryBudget | None):
+    """
+    Handle requests received from the supervisor until the connection is closed, or until the memory budget runs
+    out, when the worker flags its last response so that the supervisor forks a fresh one in its place.
+    """
+    # The supervisor's ends of the pipes are inherited by fork(), and while they are open here neither this worker nor
+    # the ones forked before it would see the supervisor close them
+    for supervisor_conn in supervisor_conns:
+        supervisor_conn.close()
+    # Interrupts are handled by the supervisor, which shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # A worker forked by the socket server would otherwise pass its signals on to the server's event loop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    if budget is not None:
+        budget.reset()
+    while True:
+        try:
+            key, kind, payload = conn.recv()
+        except EOFError:
+            break
+        result = converter.stats_report() if kind == STATS_REQUEST else converter._convert_request(*payload)
+        reason: str | None = budget.check() if budget is not None and kind != STATS_REQUEST else None
+        if reason is not None:
+            print(f"Worker {os.getpid()} retiring {reason}", file=sys.stderr, flush=True)
+        try:
+            conn.send((key, result, reason is not None))
+        except BrokenPipeError:
+            break  # The supervisor shut down while this request was being handled
+        if reason is not None:
+            break
+    converter.close()
+
+
+class WorkerPool:
+    """
+    A pool of converter processes forked from a supervisor that has already loaded the dictionaries and spaCy model.
+
+    Each worker is given one request at a time, so the supervisor always knows which request a worker was holding. If a
+    worker dies, it is replaced and its request is resubmitted, up to max_attempts times before the request is reported
+    as failed. Workers that have used up the memory budget retire after answering a request and are replaced by fresh
+    forks of the supervisor, which never converts anything itself and so stays the size it was at startup.
+    """
+
+    def __init__(self, converter: LatinToShavian, workers: int, max_attempts: int = 3,
+                 budget: MemoryBudget | None = None):
+        self.converter = converter
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self._context = multiprocessing.get_context("fork")
+        # Requests waiting for a worker, as (key, kind, payload, target), where target is the index of the worker that
+        # must handle the request, or None for any worker
+        self._pending: deque[tuple[int, str, object, int | None]] = deque()
+        self._attempts: dict[int, int] = {}
+        self._workers: list[_PoolWorker] = []
+        for _ in range(workers):
+            self._workers.append(self._spawn())
+        # How many workers have been replaced, which changes wait_objects(), and how many of them retired
+        self.restarts: int = 0
+        self.recycled: int = 0
+
+    def _spawn(self) -> _PoolWorker:
+        """Fork a new worker process."""
+        parent_conn, child_conn = self._context.Pipe()
+        supervisor_conns = [worker.conn for worker in self._workers] + [parent_conn]
+        process = self._context.Process(target=_pool_worker_main,
+                                        args=(self.converter, child_conn, supervisor_conns, self.budget), daemon=True)
+        process.start()
+        child_conn.close()
+        return _PoolWorker(process, parent_conn)
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    @property
+    def busy(self) -> bool:
+        """Whether any submitted request has not yet been returned by process()."""
+        return bool(self._pending) or any(worker.current is not None for worker in self._workers)
+
+    def wait_objects(self) -> list:
+        """Objects to pass to multiprocessing.connection.wait(), followed by process() on the ready ones."""
+        return [worker.conn for worker in self._workers] + [worker.process.sentinel for worker in self._workers]
+
+    def submit(self, key: int, text: str, mode: str = "auto"):
+        """Queue text for conversion; its result is returned by process() under the same key."""
+        self._pending.append((key, "convert", (text, mode), None))
+        self._attempts[key] = 0
+        self._dispatch()
+
+    def broadcast(self, keys: list[int], kind: str):
+        """
+        Send a request of the given kind to every worker, whose results are returned by process() under keys. Each
+        worker handles it after any requests submitted before it that it picks up.
+        """
+        for index, key in enumerate(keys[:len(self._workers)]):
+            self._pending.append((key, kind, None, index))
+            self._attempts[key] = 0
+        self._dispatch()
+
+    def cancel(self, key: int):
+        """Withdraw a request that no worker has picked up yet; one already being handled still returns its result."""
+        for position, request in enumerate(self._pending):
+            if request[0] == key:
+                del self._pending[position]
+                del self._attempts[key]
+                return
+
+    def process(self, ready: list) -> list[tuple[int, object]]:
+        """
+        Handle ready wait objects, returning (key, result) pairs, where a None result means the request failed: it
+        couldn't be converted, or every worker that tried it died.
+
+        Results are converted text, or the stats report for a STATS request.
+        """
+        results: list[tuple[int, object]] = []
+        for index, worker in enumerate(self._workers):
+            if worker.conn in ready:
+                try:
+                    key, result, retiring = worker.conn.recv()
+                except (EOFError, OSError):
+                    self._replace(index, results)
+                    continue
+                worker.current = None
+                del self._attempts[key]
+                results.append((key, result))
+                if retiring:
+                    self._respawn(index)
+                    self.recycled += 1
+            elif worker.process.sentinel in ready:
+                self._replace(index, results)
+        self._dispatch()
+        return results
+
+    def _replace(self, index: int, results: list[tuple[int, object]]):
+        """Restart a dead worker and resubmit the request it was holding."""
+        worker = self._workers[index]
+        self._respawn(index)
+        print(f"Worker {worker.process.pid} exited with code {worker.process.exitcode}, restarting",
+              file=sys.stderr, flush=True)
+        if worker.current is not None:
+            key = worker.current[0]
+            self._attempts[key] += 1
+            if self._attempts[key] >= self.max_attempts:
+                del self._attempts[key]
+                results.append((key, None))
+            else:
+                self._pending.appendleft(worker.current)
+
+    def _respawn(self, index: int):
+        """Wait for a worker that has exited or is exiting, and fork another in its place."""
+        worker = self._workers[index]
+        worker.process.join()
+        worker.conn.close()
+        self.restarts += 1
+        self._workers[index] = self._spawn()
+
+    def merge_reports(self, reports: list[dict]) -> dict:
+        """Merge the stats reports of the workers that replied, adding the pool's own counters."""
+        merged: dict = merge_stats_reports(reports) | {"workers": len(reports), "recycled_workers": self.recycled}
+        merged.setdefault("memory", {})["supervisor_rss_mb"] = _current_rss_mb()
+        return merged
+
+    def _dispatch(self):
+        """Hand each idle worker the oldest pending request it can take."""
+        for index, worker in enumerate(self._workers):
+            if worker.current is not None:
+                continue
+            for position, request in enumerate(self._pending):
+                if request[3] is None or request[3] == index:
+                    del self._pending[position]
+                    worker.current = request
+                    worker.conn.send(request[:3])
+                    break
+
+    def close(self):
+        """Stop all workers."""
+        for worker in self._workers:
+            worker.conn.close()
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+
+
+class _StreamWriterOutput:
+    """Lets RequestStream write its responses to an asyncio StreamWriter."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+
+    def write(self, data: bytes):
+        # Responses for a client that has gone away are dropped
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def flush(self):
+        pass
+
+
+class ConversionServer:
+    """
+    Serve many clients at once from one loaded converter, over a Unix domain socket or local TCP.
+
+    Each connection speaks the stdin/stdout protocol (see RequestStream), and its requests are answered as they finish,
+    so possibly out of order. Conversions either run in a thread of this process, which takes every request waiting at
+    the time through nlp.pipe as one batch, or in a WorkerPool whose pipes are watched by the event loop. At most
+    max_pending requests are in progress across all clients; beyond that the server stops reading from connections,
+    so clients are held back by the sockets' own flow control. A request can be cancelled by its client, and times out
+    after request_timeout seconds unless its options give another "timeout". Once the memory budget runs out, the
+    conversion thread reloads the spaCy pipeline between batches, or a worker is replaced by a fresh one.
+    """
+
+    def __init__(self, converter: LatinToShavian, workers: int = 0, max_pending: int = 256,
+                 request_timeout: float | None = None, batch_size: int = 64, budget: MemoryBudget | None = None):
+        self.converter = converter
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.batch_size = batch_size
+        self.budget = budget
+        # Fork the workers before the event loop and any client connections exist
+        self.pool: WorkerPool | None = WorkerPool(converter, workers, budget=budget) if workers > 0 else None
+        self._futures: dict[int, asyncio.Future] = {}
+        self._next_key: int = 0
+        self._watched: list[int] = []
+        self._watched_restarts: int = -1
+        # Requests waiting for the conversion thread, as (text, mode, future)
+        self._queue: deque[tuple[str, str, asyncio.Future]] = deque()
+        self._batches: asyncio.Task | None = None
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    async def serve(self, address: str, profile_out: str | None = None):
+        """
+        Listen on address, "unix:PATH" or "HOST:PORT", until SIGINT or SIGTERM. If profile_out is given, the final
+        stats report is written there before the server exits.
+        """
+        import asyncio
+        import concurrent.futures
+
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.pool is None:
+            # One thread, since the converter isn't thread-safe, which leaves the event loop free to handle clients
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="latin2shaw")
+        stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+
+        socket_path: str | None = address[len("unix:"):] if address.startswith("unix:") else None
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self._handle_client, path=socket_path)
+        else:
+            host, _, port = address.rpartition(":")
+            server = await asyncio.start_server(self._handle_client, host or "127.0.0.1", int(port))
+            # The port actually bound, for clients of a server started on port 0
+            address = "{}:{}".format(*server.sockets[0].getsockname()[:2])
+        self._watch_pool()
+
+        # Signal that we're ready
+        print(f"READY startup={self.converter.startup_seconds:.3f}s{_memory_note()} address={address}", file=sys.stderr,
+              flush=True)
+        try:
+            await stopping.wait()
+        finally:
+            server.close()
+            if profile_out:
+                self.converter.write_stats(profile_out, await self._stats())
+            for fd in self._watched:
+                loop.remove_reader(fd)
+            if self.pool is not None:
+                self.pool.close()
+            if self._executor is not None:
+                self._executor.shutdown()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read a client's requests, starting a task to answer each, until it disconnects."""
+        import asyncio
+
+        stream = RequestStream(_StreamWriterOutput(writer))
+        # Tasks answering this client's outstanding requests, by the JSON of their id, since ids may be unhashable
+        tasks: dict[str, asyncio.Task] = {}
+
+        def finished(task: asyncio.Task, request_id: object, id_key: str):
+            # Unless the id has since been reused by a newer request
+            if tasks.get(id_key) is task:
+                del tasks[id_key]
+            self._slots.release()
+            # A task cancelled before it started never got the chance to answer
+            if task.cancelled():
+                stream.respond_error(request_id, "cancelled")
+
+        try:
+            while True:
+                data: bytes = await reader.read(65536)
+                for command, request_id, text, options in stream.feed(data):
+                    id_key: str = json.dumps(request_id, sort_keys=True)
+                    if command == CANCEL_REQUEST:
+                        if id_key in tasks:
+                            tasks[id_key].cancel()
+                        continue
+                    # Stop reading from this client until there is room for another request
+                    await self._slots.acquire()
+                    task = asyncio.create_task(self._answer(stream, writer, command, request_id, text, options))
+                    tasks[id_key] = task
+                    task.add_done_callback(functools.partial(finished, request_id=request_id, id_key=id_key))
+                if not data:  # EOF, after which the requests already sent are still answered
+                    break
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            # Workers forked after the client connected hold copies of its socket, so closing ours wouldn't end it
+            if writer.can_write_eof() and not writer.is_closing():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+            writer.close()
+
+    async def _answer(self, stream: RequestStream, writer: asyncio.StreamWriter, command: str, request_id: object,
+                      text: str, options: dict):
+        """Carry out one request and send its response."""
+        import asyncio
+
+        try:
+            timeout = options.get("timeout", self.request_timeout)
+            try:
+                if timeout is not None and (not isinstance(timeout, (int, float)) or isinstance(timeout, bool)):
+                    stream.respond_error(request_id, f"invalid timeout {timeout!r}")
+                elif command == STATS_REQUEST:
+                    stream.respond_stats(request_id, await asyncio.wait_for(self._stats(), timeout))
+                # If text is empty or whitespace, just return empty string
+                elif not text.strip():
+                    stream.respond(request_id, "")
+                else:
+                    result: str | None = await asyncio.wait_for(self._convert(text, options.get("mode", "auto")),
+                                                                timeout)
+                    if result is None:
+                        stream.respond_error(request_id, "conversion failed")
+                    else:
+                        stream.respond(request_id, result)
+            except asyncio.TimeoutError:
+                stream.respond_error(request_id, "timed out")
+            except asyncio.CancelledError:
+                stream.respond_error(request_id, "cancelled")
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _convert(self, text: str, mode: str) -> str | None:
+        """Convert the text of one request, returning None if every worker that tried it died."""
+        import asyncio
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        if self.pool is None:
+            self._queue.append((text, mode, future))
+            if self._batches is None or self._batches.done():
+                self._batches = asyncio.create_task(self._run_batches())
+            return await future
+
+        key: int = self._next_key
+        self._next_key += 1
+        self._futures[key] = future
+        self.pool.submit(key, text, mode)
+        try:
+            return await future
+        finally:
+            # Still there if the request was cancelled or timed out before a worker finished it
+            if self._futures.pop(key, None) is not None:
+                self.pool.cancel(key)
+
+    async def _run_batches(self):
+        """Convert queued requests in the conversion thread, taking everything queued up to batch_size at a time."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            batch: list[tuple[str, str, asyncio.Future]] = []
+            while self._queue and len(batch) < self.batch_size:
+                request = self._queue.popleft()
+                # Requests cancelled while they waited are skipped
+                if not request[2].done():
+                    batch.append(request)
+            if not batch:
+                continue
+            results: list[str | None] = await loop.run_in_executor(
+                self._executor, self.converter._convert_requests, [(text, mode) for text, mode, _ in batch])
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            await loop.run_in_executor(self._executor, self.converter.recycle_if_due, self.budget, len(batch))
+
+    async def _stats(self) -> dict:
+        """Return the stats report, merged across the workers if there are any."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self.pool is None:
+            return await loop.run_in_executor(self._executor, self.converter.stats_report)
+        keys: list[int] = list(range(self._next_key, self._next_key + len(self.pool)))
+        self._next_key += len(keys)
+        futures: list[asyncio.Future] = [loop.create_future() for _ in keys]
+        self._futures.update(zip(keys, futures))
+        self.pool.broadcast(keys, STATS_REQUEST)
+        # Workers that failed to report are left out
+        reports: list[dict] = [report for report in await asyncio.gather(*futures) if report is not None]
+        return self.pool.merge_reports(reports)
+
+    def _on_pool_ready(self, ready: object):
+        """Pass results from a worker's pipe, or the failure of a request whose workers died, to its waiting task."""
+        for key, result in self.pool.process([ready]):
+            future = self._futures.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+        self._watch_pool()
+
+    def _watch_pool(self):
+        """Have the event loop watch the workers' pipes, again whenever a worker has been replaced."""
+        import asyncio
+
+        if self.pool is None or self.pool.restarts == self._watched_restarts:
+            return
+        loop = asyncio.get_running_loop()
+        for fd in self._watched:
+            loop.remove_reader(fd)
+        self._watched = []
+        for wait_object in self.pool.wait_objects():
+            # A dead worker's pipe reaches EOF as well, so its process sentinel isn't needed. Sentinels are inherited
+            # by the workers forked after them, which would keep a closed one registered with epoll.
+            if isinstance(wait_object, int):
+                continue
+            loop.add_reader(wait_object.fileno(), self._on_pool_ready, wait_object)
+            self._watched.append(wait_object.fileno())
+        self._watched_restarts = self.pool.restarts
+
+
+BENCHMARK_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark", "corpus")
+# _finish_text's steps are timed separately, since which of them runs depends on the text
+BENCHMARK_STAGES = ("split", "tokenise", "convert", "typography", "smartypants", "beautifulsoup")
+
+
+def _synthetic_name_text(rng: random.Random, paragraphs: int = 60) -> str:
+    """Generate paragraphs dense with invented names, titles and places, which exercise NER and the phonetic fallback."""
+    syllables = ["ar", "bel", "cor", "dra", "el", "fen", "gar", "hal", "is", "jor", "kel", "lor", "mir", "nor", "oth",
+                 "pel", "quin", "ras", "sil", "tor", "ul", "vax", "wen", "xan", "yr", "zel"]
+    titles = ["Captain", "Lady", "Lord", "Dr.", "Professor", "Queen", "Sir", "Mrs.", "Mr."]
+    verbs = ["met", "followed", "argued with", "wrote to", "travelled with", "betrayed", "rescued", "visited"]
+
+    def name() -> str:
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).capitalize()
+
+    lines: list[str] = []
+    for _ in range(paragraphs):
+        sentences = [f"{rng.choice(titles)} {name()} {rng.choice(verbs)} {name()} {name()} in {name()} near the "
+                     f"{name()} River." for _ in range(rng.randint(2, 5))]
+        lines.append(" ".join(sentences))
+    return "\n\n".join(lines) + "\n"
+
+
+def _synthetic_apostrophe_text(rng: random.Random, paragraphs: int = 60) -> str:
+    """Generate paragraphs full of contractions, possessives and clipped words."""
+    fragments = ["I'd've", "wouldn't", "can't", "don't", "y'all", "'tis", "o'er", "G'night", "ma'am", "it's", "they're",
+                 "we'll", "she'd", "you've", "I'm", "the Smiths'", "James's", "the cat's", "rock 'n' roll", "ne'er",
+                 "Kel'tar's", "shan't", "won't", "ain't", "e'en"]
+    fillers = ["said", "the", "old", "sailor", "and", "then", "left", "home", "quickly", "again", "for", "good"]
+    lines: list[str] = []
+    for _ in range(paragraphs):
+        words = [rng.choice(fragments) if rng.random() < 0.4 else rng.choice(fillers) for _ in range(rng.randint(20, 60))]
+        lines.append(f'"{" ".join(words).capitalize()}," she said.')
+    return "\n\n".join(lines) + "\n"
+
+
+def _as_html_document(text: str) -> str:
+    """Wrap the paragraphs of plain text in a minimal XHTML document."""
+    paragraphs = [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()]
+    body = "".join(f"<p>{html.escape(paragraph, quote=False)}</p>\n" for paragraph in paragraphs)
+    return f"<!DOCTYPE html>\n<html xmlns=\"http://www.w3.org/1999/xhtml\">\n<head><title>Benchmark</title></head>\n<body>\n{body}</body>\n</html>\n"
+
+
+def benchmark_corpus(corpus_dir: str = BENCHMARK_CORPUS_DIR, seed: int = 1) -> dict[str, str]:
+    """
+    Build the benchmark corpus: the bundled samples plus seeded synthetic text, each plain sample also as HTML.
+
+    Returns a mapping of sample name to text, in a stable order.
+    """
+    rng = random.Random(seed)
+    plain: dict[str, str] = {}
+    corpus: dict[str, str] = {}
+    for filename in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, filename), "r", encoding="utf-8") as file:
+            text = file.read()
+        if filename.endswith(".txt"):
+            plain[os.path.splitext(filename)[0]] = text
+        else:
+            corpus[f"{os.path.splitext(filename)[0]} (html)"] = text
+    plain["synthetic-names"] = _synthetic_name_text(rng)
+    plain["synthetic-apostrophes"] = _synthetic_apostrophe_text(rng)
+    for name, text in plain.items():
+        corpus[f"{name} (plain)"] = text
+        corpus[f"{name} (html)"] = _as_html_document(text)
+    return dict(sorted(corpus.items()))
+
+
+def _benchmark_sample(converter: LatinToShavian, text: str) -> dict:
+    """
+    Convert one sample the way convert_text does, timing each stage separately.
+
+    As in _convert_plans, each distinct fragment is tagged and converted once, and tagging goes through _pipe, so
+    fragments that need no tags skip the pipeline if the converter is adaptive. The result cache isn't used.
+    """
+    stages: dict[str, float] = dict.fromkeys(BENCHMARK_STAGES, 0.0)
+    start = time.perf_counter()
+    is_html, fragments = converter._split_fragments(text)
+    occurrences: dict[str, int] = {}
+    for convertible, fragment in fragments:
+        if convertible and fragment:
+            occurrences[fragment] = occurrences.get(fragment, 0) + 1
+    stages["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    docs: dict[str, spacy.tokens.Doc] = {
+        fragment: converter._postprocess_doc(doc)
+        for fragment, doc in zip(occurrences, converter._pipe(occurrences, adaptive=converter.adaptive_pipeline))
+    }
+    stages["tokenise"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    converted: dict[str, str] = {fragment: converter.convert(doc) for fragment, doc in docs.items()}
+    text_shaw: list[str] = [converter._escape_fragment(converted[fragment], is_html) if convertible else fragment
+                            for convertible, fragment in fragments if fragment or not convertible]
+    stages["convert"] = time.perf_counter() - start
+
+    result = converter._finish_text("".join(text_shaw), is_html, stages)
+
+    seconds = sum(stages.values())
+    # Repeated fragments count every time, so that the throughput describes the text
+    tokens = sum(len(docs[fragment]) * count for fragment, count in occurrences.items())
+    return {
+        "mode": "html" if is_html else "plain",
+        "characters": len(text),
+        "tokens": tokens,
+        "seconds": seconds,
+        "tokens_per_second": tokens / seconds if seconds else 0.0,
+        "stages": stages,
+        "output_sha256": hashlib.sha256(result.encode("utf-8")).hexdigest(),
+    }
+
+
+def _peak_rss_mb() -> float | None:
+    """Return the peak resident set size of this process in MiB, where the platform reports it."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _current_rss_mb() -> float | None:
+    """Return the resident set size of this process in MiB, or the peak where the current size isn't available."""
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _memory_note() -> str:
+    """Describe this process's memory use for the READY line."""
+    rss: float | None = _current_rss_mb()
+    return f" rss={rss:.1f}MiB" if rss is not None else ""
+
+
+def run_benchmark(converter_args: dict, corpus_dir: str = BENCHMARK_CORPUS_DIR, repeat: int = 3, seed: int = 1) -> dict:
+    """
+    Measure converter throughput on the benchmark corpus.
+
+    Each sample is converted repeat times with cold in-memory caches and the fastest run is kept. Returns a JSON-ready
+    report of startup time, peak RSS, and per-sample and total tokens, timings per stage and output checksums.
+    """
+    start = time.perf_counter()
+    converter = LatinToShavian(**converter_args)
+    startup_seconds = time.perf_counter() - start
+
+    samples: dict[str, dict] = {}
+    for name, text in benchmark_corpus(corpus_dir, seed).items():
+        runs: list[dict] = []
+        for _ in range(repeat):
+            converter.clear_caches()
+            runs.append(_benchmark_sample(converter, text))
+        samples[name] = min(runs, key=lambda run: run["seconds"])
+    converter.close()
+
+    total_stages = {stage: sum(sample["stages"][stage] for sample in samples.values()) for stage in BENCHMARK_STAGES}
+    total_seconds = sum(total_stages.values())
+    total_tokens = sum(sample["tokens"] for sample in samples.values())
+    return {
+        "python": platform.python_version(),
+        "spacy": importlib.metadata.version("spacy"),
+        "dictionary_version": converter.dictionary_version,
+        "seed": seed,
+        "repeat": repeat,
+        "startup_seconds": startup_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "samples": samples,
+        "total": {
+            "tokens": total_tokens,
+            "seconds": total_seconds,
+            "tokens_per_second": total_tokens / total_seconds if total_seconds else 0.0,
+            "stages": total_stages,
+        },
+    }
+
+
+def compare_benchmarks(old: dict, new: dict, tolerance: float = 0.1) -> list[str]:
+    """
+    Compare two benchmark reports, printing a summary and returning a description of each regression.
+
+    Throughput that drops, or startup time that grows, by more than tolerance (a fraction) counts as a regression, as
+    does any sample whose output changed.
+    """
+    regressions: list[str] = []
+
+    def check_throughput(label: str, old_result: dict, new_result: dict):
+        old_rate, new_rate = old_result["tokens_per_second"], new_result["tokens_per_second"]
+        change = (new_rate - old_rate) / old_rate if old_rate else 0.0
+        print(f"{label:<45} {old_rate:>10.0f} -> {new_rate:>10.0f} tokens/s ({change:+.1%})", file=sys.stderr)
+        if change < -tolerance:
+            regressions.append(f"{label}: throughput fell by {-change:.1%}")
+
+    for name, old_sample in old["samples"].items():
+        new_sample = new["samples"].get(name)
+        if new_sample is None:
+            regressions.append(f"{name}: missing from the new results")
+            continue
+        check_throughput(name, old_sample, new_sample)
+        if new_sample["output_sha256"] != old_sample["output_sha256"]:
+            regressions.append(f"{name}: output changed")
+    check_throughput("total", old["total"], new["total"])
+
+    old_startup, new_startup = old["startup_seconds"], new["startup_seconds"]
+    print(f"{'startup':<45} {old_startup:>10.3f} -> {new_startup:>10.3f} s", file=sys.stderr)
+    # Ignore jitter in startups that are already very fast
+    if new_startup > old_startup * (1 + tolerance) and new_startup - old_startup > 0.05:
+        regressions.append(f"startup: grew from {old_startup:.3f}s to {new_startup:.3f}s")
+    return regressions
 
 
 def latin2shaw(text):
@@ -582,7 +3387,7 @@ def latin2shaw(text):
         result = converter.convert_text(text)
         return result
     finally:
-        pass # No cache to save
+        converter.close()
 
 
 if __name__ == "__main__":
@@ -591,28 +3396,208 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert Latin text to Shavian script")
     parser.add_argument("--stdin-stdout", action="store_true", 
                        help="Run in stdin/stdout mode for long-running processes")
+    parser.add_argument("--workers", type=int, default=0,
+                       help="Worker processes to fork in stdin/stdout or server mode (0 converts in this process)")
+    parser.add_argument("--serve", type=str, default=None, metavar="ADDRESS",
+                       help="Serve many clients on a Unix domain socket (unix:PATH) or local TCP (HOST:PORT)")
+    parser.add_argument("--max-pending", type=int, default=256,
+                       help="Requests the server works on at once across all clients before it stops reading more")
+    parser.add_argument("--request-timeout", type=float, default=None,
+                       help="Seconds after which the server gives up on a request, unless the request sets its own")
+    parser.add_argument("--max-rss", type=float, default=None, metavar="MIB",
+                       help="Recycle a converter once it uses more than this many MiB (stdin/stdout or server mode)")
+    parser.add_argument("--recycle-after", type=int, default=None, metavar="N",
+                       help="Recycle a converter after every N requests (stdin/stdout or server mode)")
     parser.add_argument("--text", type=str, help="Text to convert (if not using stdin/stdout mode)")
+    parser.add_argument("--glossary", type=str, default=None,
+                       help="Convert the text as one book, vocabulary first, and write a CSV of its [c] and [p] words here")
+    parser.add_argument("--epub", type=str, default=None, metavar="IN",
+                        help="Convert the XHTML documents of an EPUB file, in parallel with --workers")
+    parser.add_argument("--out", type=str, default=None, help="Where to write the EPUB converted with --epub")
+    parser.add_argument("--journal", type=str, default=None, metavar="PATH",
+                        help="Record finished requests or EPUB documents here, so a rerun skips them")
     parser.add_argument("--readlex-path", type=str, default="readlex/readlex_converter.json",
                        help="Path to ReadLex converter JSON file")
     parser.add_argument("--phrases-path", type=str, default="readlex/readlex_converter_phrases.json",
                        help="Path to phrases JSON file")
+    parser.add_argument("--index-path", type=str, default=None,
+                       help="Path to the compiled ReadLex index (defaults to the ReadLex path with an .idx extension)")
+    parser.add_argument("--snapshot-path", type=str, default=None,
+                       help="Directory of the spaCy pipeline snapshot (defaults to spacy-snapshot next to the phrases file)")
+    parser.add_argument("--phrase-cache-path", type=str, default=None,
+                       help="File caching the tokenised phrases (defaults to the phrases path with a .patterns extension)")
+    parser.add_argument("--pipeline-phrases", action="store_true",
+                       help="Merge phrases in a spaCy pipeline component, so nlp.pipe does it in batches")
+    parser.add_argument("--no-ner", action="store_true",
+                       help="Don't look for names, for speed at the cost of namer dots")
+    parser.add_argument("--full-pipeline", action="store_true",
+                       help="Tag every fragment and look for names in it, even where no spelling could depend on it")
+    parser.add_argument("--affixes-path", type=str, default=None,
+                       help='JSON file of extra affixes for constructed words: {"prefixes": {...}, "suffixes": {...}}')
+    parser.add_argument("--pronunciation-cache", type=str, default=None,
+                       help="SQLite file for caching phonetic spellings between runs and worker processes")
+    parser.add_argument("--pronunciation-cache-size", type=int, default=100000,
+                       help="Maximum number of words kept in the pronunciation cache")
+    parser.add_argument("--token-cache-size", type=int, default=65536,
+                       help="Maximum number of token spellings kept in the per-token cache")
+    parser.add_argument("--result-cache", type=str, default=None,
+                       help="SQLite file for caching converted paragraphs between runs and worker processes")
+    parser.add_argument("--result-cache-size", type=int, default=10000,
+                       help="Maximum number of converted paragraphs kept in memory (0 disables the memory tier)")
+    parser.add_argument("--ipa-cache-size", type=int, default=100000,
+                       help="Maximum number of words whose IPA is kept in memory for the phonetic fallback")
+    parser.add_argument("--profile", action="store_true",
+                       help="Count and time each conversion branch and pipeline stage (see the STATS request)")
+    parser.add_argument("--profile-out", type=str, default=None,
+                       help="Write the profiling stats to this JSON file on exit (implies --profile)")
+
+    # Subcommands accept the shared options too, without overriding values given before the subcommand
+    common = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    common.add_argument("--readlex-path", type=str, help="Path to ReadLex converter JSON file")
+    common.add_argument("--index-path", type=str, help="Path to the compiled ReadLex index")
+    common.add_argument("--phrases-path", type=str, help="Path to phrases JSON file")
+    common.add_argument("--snapshot-path", type=str, help="Directory of the spaCy pipeline snapshot")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("build-index", parents=[common],
+                          help="Compile the ReadLex JSON into a memory-mappable index for fast startup")
+    subparsers.add_parser("check-readlex", parents=[common],
+                          help="List ReadLex words with no entry for every part of speech or entries no tag selects")
+    subparsers.add_parser("build-snapshot", parents=[common],
+                          help="Save the customised spaCy pipeline and phrase patterns for fast startup")
+    refresh_parser = subparsers.add_parser("refresh", parents=[common],
+                                           help="Keep the cached results that a ReadLex update doesn't affect")
+    refresh_parser.add_argument("--old-readlex-path", type=str, required=True,
+                                help="The ReadLex converter JSON file the result cache was built with")
+    benchmark_parser = subparsers.add_parser("benchmark", parents=[common],
+                                             help="Measure conversion throughput on a reproducible corpus")
+    benchmark_parser.add_argument("--corpus-dir", type=str, default=BENCHMARK_CORPUS_DIR,
+                                  help="Directory of sample .txt and .xhtml files")
+    benchmark_parser.add_argument("--repeat", type=int, default=3, help="Runs per sample; the fastest is reported")
+    benchmark_parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic samples")
+    benchmark_parser.add_argument("--output", type=str, default=None, help="Write the JSON report here")
+    benchmark_parser.add_argument("--compare", type=str, nargs=2, metavar=("OLD", "NEW"), default=None,
+                                  help="Compare two reports instead of running, failing on regressions")
+    benchmark_parser.add_argument("--tolerance", type=float, default=0.1,
+                                  help="Fractional slowdown allowed by --compare")
     
     args = parser.parse_args()
+    if args.epub and not args.out:
+        parser.error("--epub needs --out")
+    if args.journal and args.serve:
+        parser.error("--journal can't be used with --serve")
+
+    if args.command == "build-index":
+        index_path = args.index_path or default_index_path(args.readlex_path)
+        count = build_readlex_index(args.readlex_path, index_path)
+        print(f"Wrote {count} words to {index_path}", file=sys.stderr)
+        print_readlex_report(ResolvedReadLex(ReadLexIndex(index_path)).report(), args.readlex_path)
+        sys.exit(0)
+
+    if args.command == "check-readlex":
+        with open(args.readlex_path, "r", encoding="utf-8") as file:
+            print(json.dumps(ResolvedReadLex(json.load(file)).report(), ensure_ascii=False, indent=2))
+        sys.exit(0)
+
+    if args.command == "build-snapshot":
+        snapshot_path = args.snapshot_path or default_snapshot_path(args.phrases_path)
+        if os.path.exists(os.path.join(snapshot_path, "meta.json")):
+            os.remove(os.path.join(snapshot_path, "meta.json"))  # Always rebuild from the installed model
+        converter = LatinToShavian(args.readlex_path, args.phrases_path, args.index_path, snapshot_path=snapshot_path)
+        converter.save_snapshot()
+        converter.close()
+        print(f"Wrote spaCy pipeline snapshot to {snapshot_path}", file=sys.stderr)
+        sys.exit(0)
+
+    if args.command == "refresh":
+        if not args.result_cache:
+            parser.error("refresh needs --result-cache")
+        # The options the cache's version depends on must be those it was built with
+        converter = LatinToShavian(args.readlex_path, args.phrases_path, args.index_path,
+                                   affixes_path=args.affixes_path, snapshot_path=args.snapshot_path,
+                                   phrase_cache_path=args.phrase_cache_path, result_cache_path=args.result_cache,
+                                   pipeline_phrases=args.pipeline_phrases, ner=not args.no_ner,
+                                   adaptive_pipeline=not args.full_pipeline)
+        counts = converter.refresh_result_cache(args.old_readlex_path)
+        converter.close()
+        print(f"{counts['changed_keys']} words changed: kept {counts['kept']} cached results, "
+              f"dropped {counts['dropped']}", file=sys.stderr)
+        sys.exit(0)
+
+    if args.command == "benchmark":
+        if args.compare:
+            reports = []
+            for report_path in args.compare:
+                with open(report_path, "r", encoding="utf-8") as file:
+                    reports.append(json.load(file))
+            regressions = compare_benchmarks(*reports, tolerance=args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION: {regression}", file=sys.stderr)
+            sys.exit(1 if regressions else 0)
+        # The same converter options as a conversion run, apart from the result cache, which would skip the work
+        report = run_benchmark({"readlex_path": args.readlex_path, "phrases_path": args.phrases_path,
+                                "index_path": args.index_path, "affixes_path": args.affixes_path,
+                                "snapshot_path": args.snapshot_path, "phrase_cache_path": args.phrase_cache_path,
+                                "pipeline_phrases": args.pipeline_phrases, "ner": not args.no_ner,
+                                "adaptive_pipeline": not args.full_pipeline, "token_cache_size": args.token_cache_size,
+                                "pronunciation_cache_path": args.pronunciation_cache,
+                                "pronunciation_cache_size": args.pronunciation_cache_size,
+                                "ipa_cache_size": args.ipa_cache_size},
+                               args.corpus_dir, args.repeat, args.seed)
+        report_json = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                file.write(report_json + "\n")
+        print(report_json)
+        sys.exit(0)
     
-    converter = LatinToShavian(args.readlex_path, args.phrases_path)
+    converter = LatinToShavian(args.readlex_path, args.phrases_path, args.index_path, args.token_cache_size,
+                               args.affixes_path, args.pronunciation_cache, args.pronunciation_cache_size,
+                               profile=args.profile or bool(args.profile_out), snapshot_path=args.snapshot_path,
+                               phrase_cache_path=args.phrase_cache_path, pipeline_phrases=args.pipeline_phrases,
+                               result_cache_size=args.result_cache_size, result_cache_path=args.result_cache,
+                               ipa_cache_size=args.ipa_cache_size, ner=not args.no_ner,
+                               adaptive_pipeline=not args.full_pipeline)
+    budget = MemoryBudget(args.max_rss, args.recycle_after) if args.max_rss or args.recycle_after else None
+    if args.max_rss and (_current_rss_mb() or 0) > args.max_rss:
+        print(f"Warning: {_current_rss_mb():.1f}MiB is already in use, more than --max-rss, so converters will be "
+              f"recycled after every request", file=sys.stderr, flush=True)
+    journal = ConversionJournal(args.journal, converter._result_cache_version()) if args.journal else None
     
     try:
-        if args.stdin_stdout:
+        if args.serve:
+            converter.run_server_mode(args.serve, args.workers, args.max_pending, args.request_timeout,
+                                      args.profile_out, budget)
+        elif args.stdin_stdout:
             # Run in stdin/stdout mode
-            converter.run_stdin_stdout_mode()
-        elif args.text:
-            # Convert provided text
-            result = converter.convert_text(args.text)
-            print(result)
+            converter.run_stdin_stdout_mode(args.workers, args.profile_out, budget, journal)
+        elif args.epub:
+            started = time.perf_counter()
+            counts = converter.convert_epub(args.epub, args.out, args.workers, budget, journal)
+            print(f"Converted {counts['converted']} documents and copied {counts['copied']} other files to {args.out} "
+                  f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            if counts["failed"]:
+                print(f"{counts['failed']} documents could not be converted and were kept unchanged", file=sys.stderr)
+            # The workers' stats stay in the workers
+            if args.profile_out and not args.workers:
+                converter.write_stats(args.profile_out)
+            if counts["failed"]:
+                sys.exit(1)
         else:
-            # Read from stdin if no text provided
-            text = sys.stdin.read()
-            result = converter.convert_text(text)
-            print(result)
+            if args.glossary:
+                # The whole text is needed up front to resolve its vocabulary first
+                print(converter.convert_book([args.text if args.text else sys.stdin.read()], args.glossary)[0])
+            elif args.text:
+                # Convert provided text
+                result = converter.convert_text(args.text)
+                print(result)
+            else:
+                # Read from stdin if no text provided, converting as it streams in
+                for piece in converter.iter_convert(sys.stdin):
+                    sys.stdout.write(piece)
+                print()
+            if args.profile_out:
+                converter.write_stats(args.profile_out)
     finally:
-        pass # No cache to save
\ No newline at end of file
+        if journal is not None:
+            journal.close()
+        converter.close()
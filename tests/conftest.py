@@ -0,0 +1,239 @@
+"""
+Shared fixtures for the latin2shaw tests: a small ReadLex and phrases file, and a stub spaCy pipeline standing in for
+en_core_web_sm, so that the tests need neither the model nor the full dictionary.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("eng_to_ipa")
+
+from spacy.language import Language
+from spacy.tokens import Span
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+import latin2shaw  # noqa: E402
+
+READLEX: dict[str, list[dict[str, str]]] = {
+    "the": [{"tag": "0", "Shaw": "𐑞"}],
+    "a": [{"tag": "0", "Shaw": "𐑩"}],
+    "cat": [{"tag": "0", "Shaw": "𐑒𐑨𐑑"}],
+    "read": [{"tag": "VBD", "Shaw": "𐑮𐑧𐑛"}, {"tag": "0", "Shaw": "𐑮𐑰𐑛"}],
+    "dog": [{"tag": "NN", "Shaw": "𐑛𐑪𐑜"}],
+    "bob": [{"tag": "0", "Shaw": "𐑚𐑪𐑚"}],
+    "london": [{"tag": "0", "Shaw": "𐑤𐑳𐑯𐑛𐑩𐑯"}],
+    "bbc": [{"tag": "0", "Shaw": "⸰𐑚𐑚𐑕"}],
+    "have": [{"tag": "0", "Shaw": "𐑣𐑨𐑝"}],
+    "to": [{"tag": "0", "Shaw": "𐑑"}],
+    "go": [{"tag": "0", "Shaw": "𐑜𐑴"}],
+    "used": [{"tag": "0", "Shaw": "𐑿𐑟𐑛"}],
+    "i": [{"tag": "0", "Shaw": "𐑲"}],
+    "it": [{"tag": "0", "Shaw": "𐑦𐑑"}],
+    "friend": [{"tag": "0", "Shaw": "𐑓𐑮𐑧𐑯𐑛"}],
+    "kind": [{"tag": "0", "Shaw": "𐑒𐑲𐑯𐑛"}],
+    "is": [{"tag": "0", "Shaw": "𐑦𐑟"}],
+    "night": [{"tag": "0", "Shaw": "𐑯𐑲𐑑"}],
+    "happy": [{"tag": "0", "Shaw": "𐑣𐑨𐑐𐑦"}],
+    "of": [{"tag": "0", "Shaw": "𐑝"}],
+    "course": [{"tag": "0", "Shaw": "𐑒𐑹𐑕"}],
+    "of course": [{"tag": "0", "Shaw": "𐑩𐑝𐑒𐑹𐑕"}],
+    "and": [{"tag": "0", "Shaw": "𐑯"}],
+    "smith": [{"tag": "NN", "Shaw": "𐑕𐑥𐑦𐑔"}],
+    "judge": [{"tag": "0", "Shaw": "𐑡𐑳𐑡"}],
+    "mr": [{"tag": "0", "Shaw": "𐑥𐑦𐑕𐑑𐑼"}],
+    "wind": [{"tag": "NN", "Shaw": "𐑢𐑦𐑯𐑛"}, {"tag": "VB", "Shaw": "𐑢𐑲𐑯𐑛"}],
+    "in": [{"tag": "0", "Shaw": "𐑦𐑯"}],
+    "lead": [{"tag": "VB", "Shaw": "𐑤𐑰𐑛"}, {"tag": "NN", "Shaw": "𐑤𐑧𐑛"}],
+    "tom": [{"tag": "0", "Shaw": "𐑑𐑪𐑥"}],
+    "do": [{"tag": "0", "Shaw": "𐑛𐑵"}],
+    "can": [{"tag": "0", "Shaw": "𐑒𐑨𐑯"}],
+    "said": [{"tag": "0", "Shaw": "𐑕𐑧𐑛"}],
+    "yes": [{"tag": "0", "Shaw": "𐑘𐑧𐑕"}],
+}
+
+PHRASES: list[str] = ["of course", "new york"]
+
+# Fine-grained tags the stub tagger gives particular words; other words are NNP when capitalised and NN otherwise
+TAGS: dict[str, str] = {
+    "read": "VBD", "dog": "NN", "wind": "VB", "go": "VB", "used": "VBD", "'s": "POS", "lead": "NN", "smith": "NNP",
+    "bob": "NNP", "london": "NNP", "bbc": "NNP", "judge": "NNP", "zorblaxes": "NNS", "cats": "NNS", "do": "VB",
+}
+
+# Texts covering each branch of convert(), in plain text and HTML
+CORPUS: list[str] = [
+    "The cat read the dog.",
+    "Bob's friend is kind.",
+    "I have to go and it used to wind.",
+    "I have to the dog, and I have to",
+    "Mr Smith met Bob Smith in London at the BBC.",
+    "G'night, happy zorblax!",
+    "Don't do it, I can't.",
+    "The 21st and 3rd and 1990s.",
+    "Unhappy dogs and antifriends, kindness, cats.",
+    "Of course the Zorblaxes won't.",
+    '"Quoted" -- and \'single\' ... done',
+    "Tom's cat's dogs'",
+    "'s cat",
+    "x [note]y z",
+    "line one\nline two\n\nline four",
+    "<!DOCTYPE html><html><head><style>p {color:red}</style><script>var a = '<b>';</script></head>"
+    "<body><p class=\"x\">The cat read Bob's dog.</p><p>Of course \"yes\"</p></body></html>",
+    "<!doctype html>\n<p>multi\nline</p><br/>Mr Smith</html>",
+    "The lead wind it read.",
+    "Ten-year-old — dashes–here -lead trail-",
+    "Wow " * 300,
+]
+
+
+# What the converter at the baseline commit made of each CORPUS text, and a mixed text in each mode
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "baseline_outputs.json"), "r",
+          encoding="utf-8") as _file:
+    BASELINE_OUTPUTS: list[dict[str, str]] = json.load(_file)["outputs"]
+
+
+@Language.component("stub_tagger")
+def stub_tagger(doc):
+    for token in doc:
+        token.tag_ = TAGS.get(token.lower_, "NNP" if token.text[:1].isupper() else "NN")
+    return doc
+
+
+@Language.component("stub_ner")
+def stub_ner(doc):
+    # Runs of capitalised words after the first token are people, or organisations if in capitals
+    entities: list[Span] = []
+    i = 1
+    while i < len(doc):
+        if doc[i].text[:1].isupper() and doc[i].is_alpha:
+            j = i
+            while j < len(doc) and doc[j].text[:1].isupper() and doc[j].is_alpha:
+                j += 1
+            entities.append(Span(doc, i, j, label="ORG" if doc[i].text.isupper() else "PERSON"))
+            i = j
+        else:
+            i += 1
+    doc.ents = entities
+    return doc
+
+
+_real_load = spacy.load
+
+
+def stub_load(name, exclude=(), disable=(), **kwargs):
+    """Stand-in for spacy.load: a blank English pipeline with the stub tagger and NER for en_core_web_sm."""
+    if os.path.isdir(str(name)):
+        # A pipeline snapshot saved by the converter
+        return _real_load(name, exclude=exclude, disable=disable, **kwargs)
+    nlp = spacy.blank("en")
+    nlp.add_pipe("stub_tagger", name="tagger")
+    nlp.add_pipe("stub_ner", name="ner")
+    for component in disable or ():
+        if component in nlp.pipe_names:
+            nlp.disable_pipe(component)
+    return nlp
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stub_spacy_model():
+    """Make spacy.load("en_core_web_sm") return the stub pipeline."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(spacy, "load", stub_load)
+        yield
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory) -> str:
+    """A directory holding the test ReadLex and phrases file."""
+    path = tmp_path_factory.mktemp("readlex")
+    with open(path / "readlex.json", "w", encoding="utf-8") as file:
+        json.dump(READLEX, file, ensure_ascii=False)
+    with open(path / "phrases.csv", "w", encoding="utf-8", newline="") as file:
+        csv.writer(file).writerows([phrase] for phrase in PHRASES)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def make_converter(data_dir):
+    """Build a converter on the test ReadLex, passing any other constructor options through."""
+    def make(**kwargs) -> latin2shaw.LatinToShavian:
+        kwargs.setdefault("readlex_path", os.path.join(data_dir, "readlex.json"))
+        return latin2shaw.LatinToShavian(phrases_path=os.path.join(data_dir, "phrases.csv"), **kwargs)
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def converter(make_converter) -> latin2shaw.LatinToShavian:
+    """A converter shared between tests that don't change its caches or options."""
+    shared = make_converter()
+    yield shared
+    shared.close()
+
+
+# Run by converter_command in a fresh process, with the test converter as converter. Requests whose text is "fail"
+# fail to convert, "crash" kills the process converting it, "crash once PATH" does so unless PATH exists (creating it),
+# and "sleep SECONDS ..." takes that long.
+_CONVERTER_SCRIPT = """
+import os
+import sys
+import time
+
+sys.path[:0] = [{tests!r}, {lib!r}]
+import spacy
+
+import conftest
+import latin2shaw
+
+spacy.load = conftest.stub_load
+split_fragments = latin2shaw.LatinToShavian._split_fragments
+
+
+def faulty_split_fragments(self, text, mode="auto"):
+    if text == "fail":
+        raise ValueError("failing as asked")
+    if text == "crash" or (text.startswith("crash once ") and not os.path.exists(text[len("crash once "):])):
+        if text != "crash":
+            open(text[len("crash once "):], "w").close()
+        os._exit(1)
+    if text.startswith("sleep "):
+        time.sleep(float(text.split()[1]))
+    return split_fragments(self, text, mode)
+
+
+latin2shaw.LatinToShavian._split_fragments = faulty_split_fragments
+converter = latin2shaw.LatinToShavian({readlex!r}, {phrases!r}, **{options!r})
+"""
+
+
+def converter_command(data_dir: str, script: str, **options) -> list[str]:
+    """The command to run script in a fresh process with the test converter, built with options, as converter."""
+    code: str = _CONVERTER_SCRIPT.format(
+        tests=os.path.dirname(os.path.abspath(__file__)), lib=os.path.dirname(os.path.abspath(latin2shaw.__file__)),
+        readlex=os.path.join(data_dir, "readlex.json"), phrases=os.path.join(data_dir, "phrases.csv"), options=options)
+    return [sys.executable, "-c", code + script]
+
+
+def encode_frames(*messages: dict) -> bytes:
+    """Encode messages as protocol 2 frames."""
+    payloads: list[bytes] = [json.dumps(message).encode("utf-8") for message in messages]
+    return b"".join(latin2shaw._FRAME_HEADER.pack(len(payload)) + payload for payload in payloads)
+
+
+def decode_frames(data: bytes) -> tuple[list[dict], bytes]:
+    """Decode the complete protocol 2 frames at the start of data, returning them and the bytes left over."""
+    messages: list[dict] = []
+    header: int = latin2shaw._FRAME_HEADER.size
+    while len(data) >= header:
+        (length,) = latin2shaw._FRAME_HEADER.unpack_from(data)
+        if len(data) < header + length:
+            break
+        messages.append(json.loads(data[header:header + length]))
+        data = data[header + length:]
+    return messages, data
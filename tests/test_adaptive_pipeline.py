@@ -0,0 +1,60 @@
+"""The adaptive pipeline, which only tags and names the paragraphs whose spelling could depend on it, and --no-ner."""
+from __future__ import annotations
+
+import pytest
+
+from conftest import BASELINE_OUTPUTS
+
+
+def needs_pipeline(converter, text: str) -> bool:
+    return converter._needs_pipeline(converter.nlp.make_doc(text))
+
+
+@pytest.mark.parametrize("text", ["the cat is kind and happy.", "i have it, of course.", "a cat's friend", ""])
+def test_plain_paragraphs_skip_the_pipeline(converter, text):
+    assert not needs_pipeline(converter, text)
+
+
+@pytest.mark.parametrize("text", ["the cat read it.", "the wind", "a lead", "i have to go.", "it used to be",
+                                  "the cat is Kind."])
+def test_tag_dependent_paragraphs_need_the_pipeline(converter, text):
+    assert needs_pipeline(converter, text)
+
+
+def test_capitals_only_need_the_pipeline_for_ner(make_converter):
+    converter = make_converter(ner=False)
+    try:
+        assert not needs_pipeline(converter, "The cat is kind.")
+        assert needs_pipeline(converter, "The cat read it.")
+    finally:
+        converter.close()
+
+
+def test_skipped_docs_are_neither_tagged_nor_named(converter):
+    plain, heteronym, named = converter._pipe(["the cat is kind.", "the cat read it.", "Bob Smith is kind."],
+                                              adaptive=True)
+    assert not any(token.tag_ for token in plain) and not plain.ents
+    assert all(token.tag_ for token in heteronym) and all(token.tag_ for token in named)
+    assert [ent.text for ent in named.ents] == ["Smith"]
+
+
+def test_full_pipeline_matches_the_baseline(make_converter):
+    converter = make_converter(adaptive_pipeline=False)
+    try:
+        outputs = [output for output in BASELINE_OUTPUTS if output["mode"] == "auto"]
+        assert converter.convert_many([output["text"] for output in outputs]) == [output["shavian"] for output in outputs]
+    finally:
+        converter.close()
+
+
+def test_no_ner_drops_namer_dots(make_converter):
+    text = "Mr Smith met Bob Smith in London at the BBC."
+    named, unnamed = make_converter(), make_converter(ner=False)
+    try:
+        assert "·" in named.convert_text(text)
+        assert "ner" not in unnamed.nlp.pipe_names
+        converted = unnamed.convert_text(text)
+        assert "·" not in converted and converted == named.convert_text(text).replace("·", "")
+    finally:
+        named.close()
+        unnamed.close()
@@ -0,0 +1,64 @@
+"""Constructed [c] spellings from the affix index against testing every affix in turn, as convert() used to."""
+from __future__ import annotations
+
+import json
+import random
+
+import pytest
+
+from conftest import READLEX
+
+
+def linear_constructed_matches(converter, lower: str) -> tuple[tuple[tuple[str, str, str], ...], str | None]:
+    """The affix decompositions and plural of lower, found by checking every affix against the word."""
+    matches: list[tuple[str, str, str]] = []
+    for affix in converter.affixes:
+        if lower.startswith(affix) and affix in converter.prefixes:
+            prefix, suffix, target_word = converter.prefixes[affix], "", lower[len(affix):]
+        elif lower.endswith(affix) and affix in converter.suffixes:
+            prefix, suffix, target_word = "", converter.suffixes[affix], lower[:-len(affix)]
+        else:
+            continue
+        if target_word in converter.readlex_dict:
+            matches.append((prefix, converter.readlex_dict[target_word][0]["Shaw"], suffix))
+    plural: str | None = None
+    if lower.endswith("s") and lower[:-1] in converter.readlex_dict:
+        plural = converter.readlex_dict[lower[:-1]][0]["Shaw"]
+    return tuple(matches), plural
+
+
+def candidate_words(converter, count: int = 3000) -> list[str]:
+    """Known words with affixes added, plus random strings that are mostly affixes."""
+    rng = random.Random(5)
+    affixes = list(converter.affixes)
+    words: list[str] = []
+    for _ in range(count):
+        stem = rng.choice(list(READLEX) + ["", "s", "x"])
+        word = rng.choice(affixes + [""]) + stem + rng.choice(affixes + ["", "s"])
+        words.append(word if rng.random() < 0.8 else "".join(rng.sample(word, len(word))))
+    return words
+
+
+def test_affix_index_matches_linear_scan(converter):
+    for word in candidate_words(converter):
+        assert converter._constructed_matches(word)[:2] == linear_constructed_matches(converter, word), word
+
+
+def test_affix_index_after_loading_overlapping_affixes(make_converter, tmp_path):
+    affixes_path = tmp_path / "affixes.json"
+    # Affixes that are both prefixes and suffixes, and one that repeats inside another
+    with open(affixes_path, "w", encoding="utf-8") as file:
+        json.dump({"prefixes": {"s": "𐑕", "ness": "𐑯𐑧𐑕", "Kind": "𐑒𐑲𐑯𐑛"}, "suffixes": {"s": "𐑟", "re": "𐑼"}}, file)
+    converter = make_converter(affixes_path=str(affixes_path))
+    assert "kind" in converter.prefixes
+    for word in candidate_words(converter):
+        assert converter._constructed_matches(word)[:2] == linear_constructed_matches(converter, word), word
+    converter.close()
+
+
+def test_empty_affixes_are_rejected(make_converter, tmp_path):
+    affixes_path = tmp_path / "affixes.json"
+    with open(affixes_path, "w", encoding="utf-8") as file:
+        json.dump({"suffixes": {"": "𐑟"}}, file)
+    with pytest.raises(ValueError):
+        make_converter(affixes_path=str(affixes_path))
@@ -0,0 +1,68 @@
+"""The benchmark, which must convert its samples as a conversion run with the same options would."""
+from __future__ import annotations
+
+import hashlib
+import os
+
+import pytest
+
+import latin2shaw
+from conftest import CORPUS
+
+
+@pytest.fixture()
+def small_corpus(monkeypatch) -> dict[str, str]:
+    """Benchmark the test corpus in place of the real one and its large synthetic samples."""
+    corpus: dict[str, str] = {f"sample {number:02}": text for number, text in enumerate(CORPUS)}
+    monkeypatch.setattr(latin2shaw, "benchmark_corpus", lambda corpus_dir, seed: corpus)
+    return corpus
+
+
+@pytest.mark.parametrize("options", [{}, {"ner": False}, {"adaptive_pipeline": False}, {"pipeline_phrases": True}])
+def test_benchmark_output_matches_convert_text(make_converter, data_dir, small_corpus, options):
+    converter_args = {"readlex_path": os.path.join(data_dir, "readlex.json"),
+                      "phrases_path": os.path.join(data_dir, "phrases.csv"), **options}
+    report = latin2shaw.run_benchmark(converter_args, repeat=1)
+    converter = make_converter(**options)
+    for name, text in small_corpus.items():
+        expected = hashlib.sha256(converter.convert_text(text).encode("utf-8")).hexdigest()
+        assert report["samples"][name]["output_sha256"] == expected, name
+    converter.close()
+
+
+def test_benchmark_tags_through_the_adaptive_pipeline(make_converter, monkeypatch):
+    converter = make_converter()
+    calls: list[bool] = []
+    pipe = converter._pipe
+
+    def recording_pipe(texts, *args, adaptive=False, **kwargs):
+        calls.append(adaptive)
+        return pipe(texts, *args, adaptive=adaptive, **kwargs)
+
+    monkeypatch.setattr(converter, "_pipe", recording_pipe)
+    sample = latin2shaw._benchmark_sample(converter, "The cat read the dog.\nThe cat read the dog.")
+    assert calls == [True]
+    # The repeated line is tagged once but its tokens count twice
+    assert sample["tokens"] == 2 * len(converter.nlp.make_doc("The cat read the dog."))
+    converter.close()
+
+
+def test_benchmark_times_each_finishing_step(make_converter):
+    converter = make_converter()
+    plain = latin2shaw._benchmark_sample(converter, "The cat read the dog.")
+    html = latin2shaw._benchmark_sample(converter, "<!DOCTYPE html><p>The cat read the dog.</p>")
+    converter.close()
+    assert tuple(plain["stages"]) == tuple(html["stages"]) == latin2shaw.BENCHMARK_STAGES
+    # Plain text is educated directly, HTML goes through smartypants and neither is parsed by BeautifulSoup
+    assert plain["stages"]["typography"] > 0 and plain["stages"]["smartypants"] == 0
+    assert html["stages"]["smartypants"] > 0 and html["stages"]["typography"] == 0
+    assert html["stages"]["beautifulsoup"] == plain["stages"]["beautifulsoup"] == 0
+    assert plain["seconds"] == sum(plain["stages"].values())
+
+
+def test_plain_text_falls_back_to_smartypants_and_beautifulsoup(make_converter, monkeypatch):
+    monkeypatch.setattr(latin2shaw, "educate_plain_text", lambda text: None)
+    converter = make_converter()
+    stages = latin2shaw._benchmark_sample(converter, "The cat read the dog.")["stages"]
+    converter.close()
+    assert stages["typography"] > 0 and stages["smartypants"] > 0 and stages["beautifulsoup"] > 0
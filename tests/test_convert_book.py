@@ -0,0 +1,42 @@
+"""convert_book, which resolves a whole book's vocabulary before converting it, against convert_many."""
+from __future__ import annotations
+
+import csv
+
+from conftest import CORPUS
+
+
+def read_glossary(path) -> list[dict[str, str]]:
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def test_convert_book_matches_convert_many(make_converter):
+    # Each starts with cold caches, since the book resolves its vocabulary up front
+    book, many = make_converter(), make_converter()
+    assert book.convert_book(CORPUS) == many.convert_many(CORPUS)
+    assert book.convert_book(CORPUS, batch_size=3) == many.convert_many(CORPUS, batch_size=3)
+
+
+def test_glossary_counts_every_occurrence(make_converter, tmp_path):
+    converter = make_converter()
+    results = converter.convert_book(CORPUS, str(tmp_path / "glossary.csv"))
+    assert results == make_converter().convert_many(CORPUS)
+    rows = read_glossary(tmp_path / "glossary.csv")
+    assert rows and all(row["kind"] in ("[c]", "[p]") and row["kind"] in row["shavian"] for row in rows)
+    assert [int(row["count"]) for row in rows] == sorted((int(row["count"]) for row in rows), reverse=True)
+    output = "".join(results)
+    for row in rows:
+        assert output.count(row["shavian"]) == int(row["count"]), row
+
+    # Fragments repeated in the book are converted once but counted every time
+    converter.convert_book(CORPUS + CORPUS, str(tmp_path / "twice.csv"))
+    assert [int(row["count"]) for row in read_glossary(tmp_path / "twice.csv")] == [2 * int(row["count"]) for row in rows]
+
+
+def test_glossary_ignores_the_result_cache(make_converter, tmp_path):
+    converter = make_converter()
+    converter.convert_many(CORPUS)
+    converter.convert_book(CORPUS, str(tmp_path / "glossary.csv"))
+    make_converter().convert_book(CORPUS, str(tmp_path / "cold.csv"))
+    assert read_glossary(tmp_path / "glossary.csv") == read_glossary(tmp_path / "cold.csv")
@@ -0,0 +1,50 @@
+"""
+convert_text and convert_many, which batch fragments through nlp.pipe, against the output of the converter as it was
+before any of the performance work (see tests/data/baseline_outputs.json).
+"""
+from __future__ import annotations
+
+import pytest
+
+from conftest import BASELINE_OUTPUTS, CORPUS
+
+AUTO = [output for output in BASELINE_OUTPUTS if output["mode"] == "auto"]
+
+
+@pytest.mark.parametrize("output", BASELINE_OUTPUTS, ids=lambda output: f"{output['mode']}:{output['text'][:30]}")
+def test_convert_text_matches_baseline(converter, output):
+    assert converter.convert_text(output["text"], output["mode"]) == output["shavian"]
+
+
+def test_convert_many_matches_baseline(converter):
+    assert converter.convert_many([output["text"] for output in AUTO]) == [output["shavian"] for output in AUTO]
+
+
+def test_convert_many_in_small_batches(make_converter):
+    # A fresh converter, so that the result cache doesn't answer for the batches
+    converter = make_converter()
+    assert converter.convert_many([output["text"] for output in AUTO], batch_size=2) == [output["shavian"]
+                                                                                          for output in AUTO]
+    converter.close()
+
+
+def test_baseline_covers_the_corpus():
+    # CORPUS can only grow along with the baseline outputs, which need the baseline converter to regenerate
+    assert [output["text"] for output in AUTO] == CORPUS
+
+
+def test_baseline_crashes_are_fixed():
+    # The baseline raised IndexError on these; every other output is the baseline's own
+    assert {output["text"] for output in BASELINE_OUTPUTS if "baseline" in output} == {
+        "I have to the dog, and I have to", "'s cat"}
+
+
+def test_possessive_at_start_of_fragment(converter):
+    assert converter.convert_text("'s cat") == "𐑟 𐑒𐑨𐑑\n"
+
+
+def test_before_to_verbs(converter):
+    assert converter.convert_text("I have to go") == "𐑲 𐑣𐑨𐑓 𐑑 𐑜𐑴\n"
+    # 'have' keeps its usual spelling when 'have to' doesn't mean 'must', and at the end of a fragment
+    assert converter.convert_text("I have to the dog") == "𐑲 𐑣𐑨𐑝 𐑑 𐑞 𐑛𐑪𐑜\n"
+    assert converter.convert_text("I have to") == "𐑲 𐑣𐑨𐑝 𐑑\n"
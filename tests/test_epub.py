@@ -0,0 +1,73 @@
+"""EPUB conversion, whose chapters must stay well-formed XHTML."""
+from __future__ import annotations
+
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+import pytest
+
+import latin2shaw
+
+XHTML = "{http://www.w3.org/1999/xhtml}"
+CONTAINER = ('<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+             '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+             '</rootfiles></container>')
+PACKAGE = ('<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0"><metadata/><manifest>'
+           '<item id="ch1" href="ch1.xhtml" media-type="application/xhtml+xml"/>'
+           '<item id="css" href="style.css" media-type="text/css"/></manifest><spine><itemref idref="ch1"/></spine>'
+           '</package>')
+
+
+def chapter(body: str) -> str:
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml"><head><title>One'
+            f'</title><style>p {{ margin: 0 }}</style></head><body>{body}</body></html>')
+
+
+def make_epub(path, body: str):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as epub:
+        epub.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", zipfile.ZIP_STORED)
+        epub.writestr("META-INF/container.xml", CONTAINER)
+        epub.writestr("OEBPS/content.opf", PACKAGE)
+        epub.writestr("OEBPS/style.css", "p { margin: 0 }")
+        epub.writestr("OEBPS/ch1.xhtml", chapter(body))
+
+
+def paragraphs(path) -> list[str]:
+    """The text of each paragraph of the converted chapter, which must parse as XML."""
+    with zipfile.ZipFile(path) as epub:
+        assert epub.namelist()[0] == "mimetype"
+        root = ElementTree.fromstring(epub.read("OEBPS/ch1.xhtml"))
+    return ["".join(paragraph.itertext()) for paragraph in root.iter(f"{XHTML}p")]
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_entities_are_converted_as_the_characters_they_stand_for(make_converter, tmp_path, workers):
+    make_epub(tmp_path / "in.epub", "<p>The cat &amp; the dog</p><p>Bob&#8217;s&nbsp;cat</p><p>the &lt;dog&gt;</p>"
+                                    "<p>&#x201C;Of course&#x201D; &amp;c</p>")
+    converter = make_converter()
+    counts = converter.convert_epub(str(tmp_path / "in.epub"), str(tmp_path / "out.epub"), workers)
+    assert counts == {"converted": 1, "failed": 0, "copied": 3}
+    converted = paragraphs(tmp_path / "out.epub")
+    assert converted[0] == "𐑞 𐑒𐑨𐑑 & 𐑞 𐑛𐑪𐑜"
+    # The curly apostrophe is read as a possessive, and the no-break space kept as it was
+    assert converted[1] == "𐑚𐑪𐑚𐑟\N{NO-BREAK SPACE}𐑒𐑨𐑑"
+    assert converted[2] == "𐑞 <𐑛𐑪𐑜>"
+    # Curly double quotes are kept, as in plain text, rather than read as entity names
+    assert converted[3].startswith("“·𐑩𐑝𐑒𐑹𐑕” &")
+    converter.close()
+
+
+def test_html_text_is_escaped_like_the_node_path(converter):
+    text = "<!doctype html><p>The cat &amp; dog &lt;3 a > b</p>"
+    assert converter.convert_text(text) == "<!doctype html><p>𐑞 𐑒𐑨𐑑 &amp; 𐑛𐑪𐑜 &lt;3 𐑩 &gt; 𐑚𐑦[p]</p>"
+
+
+def test_failed_documents_are_kept(make_converter, tmp_path, monkeypatch):
+    make_epub(tmp_path / "in.epub", "<p>The cat</p>")
+    converter = make_converter()
+    monkeypatch.setattr(converter, "_convert_request", lambda text, mode: None)
+    counts = converter.convert_epub(str(tmp_path / "in.epub"), str(tmp_path / "out.epub"))
+    assert counts["failed"] == 1
+    with zipfile.ZipFile(tmp_path / "out.epub") as epub:
+        assert epub.read("OEBPS/ch1.xhtml").decode("utf-8") == chapter("<p>The cat</p>")
+    assert latin2shaw.epub_spine_documents(zipfile.ZipFile(tmp_path / "out.epub")) == ["OEBPS/ch1.xhtml"]
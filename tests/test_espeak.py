@@ -0,0 +1,94 @@
+"""EspeakBackend batching, against stand-ins for the espeak command and shared library."""
+from __future__ import annotations
+
+import ctypes.util
+import os
+import subprocess
+
+import pytest
+
+import latin2shaw
+
+PHONEMES: dict[str, str] = {"zorblax": "z'o@blaks", "quuxle": "kw'Vks@l", "frindle": "fr'Ind@l", "grzmph": ""}
+
+
+@pytest.fixture()
+def espeak_runs(monkeypatch) -> list[str]:
+    """Stand in for the espeak command, returning the texts it is run over."""
+    runs: list[str] = []
+
+    def run(args, **kwargs):
+        if args[1:] == ["--version"]:
+            return subprocess.CompletedProcess(args, 0, "eSpeak NG text-to-speech: 1.51\n", "")
+        assert args[:3] == ["espeak", "-q", "-x"]
+        runs.append(args[3])
+        # Each clause on a line of its own, as espeak does, except for words it says nothing for
+        clauses = [clause.strip().rstrip(".") for clause in args[3].split(latin2shaw.EspeakBackend.BATCH_SEPARATOR)]
+        if "broken" in clauses:
+            raise subprocess.CalledProcessError(1, args)
+        stdout = "".join(f" {PHONEMES[clause]}\n" if PHONEMES[clause] else "\n" for clause in clauses)
+        return subprocess.CompletedProcess(args, 0, stdout, "")
+
+    monkeypatch.setattr(ctypes.util, "find_library", lambda name: None)
+    monkeypatch.setattr(subprocess, "run", run)
+    monkeypatch.setattr(latin2shaw.EspeakBackend, "executable", "espeak")
+    return runs
+
+
+def test_batch_is_matched_back_to_its_words(espeak_runs):
+    backend = latin2shaw.EspeakBackend()
+    assert backend.phonemize(["zorblax", "quuxle", "zorblax", "frindle"]) == {
+        "zorblax": "z'o@blaks", "quuxle": "kw'Vks@l", "frindle": "fr'Ind@l"}
+    assert espeak_runs == [".\n".join(["zorblax", "quuxle", "frindle"])]
+
+
+def test_word_without_output_is_retried_alone(espeak_runs):
+    backend = latin2shaw.EspeakBackend()
+    # The batch's lines don't line up with its words, so each word is run on its own
+    assert backend.phonemize(["zorblax", "grzmph", "frindle"]) == {
+        "zorblax": "z'o@blaks", "grzmph": None, "frindle": "fr'Ind@l"}
+    assert espeak_runs[1:] == ["zorblax", "grzmph", "frindle"]
+
+
+def test_failed_run(espeak_runs):
+    assert latin2shaw.EspeakBackend().phonemize(["zorblax", "broken"]) == {"zorblax": "z'o@blaks", "broken": None}
+
+
+def test_converter_batches_unknown_words(make_converter, espeak_runs):
+    converter = make_converter()
+    converter.espeak = latin2shaw.EspeakBackend()
+    converter._prefetch_ipa(["zorblax", "grzmph", "quuxle"])
+    assert converter.ipa_cache["zorblax"] == "zoəblæks" and converter.ipa_cache["quuxle"] == "kwʌksəl"
+    # Left as it is, for the letter-by-letter fallback
+    assert converter.ipa_cache["grzmph"] == "grzmph"
+    converter.close()
+
+
+def test_without_espeak(make_converter, monkeypatch, tmp_path):
+    monkeypatch.setattr(ctypes.util, "find_library", lambda name: None)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    backend = latin2shaw.EspeakBackend()
+    assert not backend.available and backend.version == "no espeak"
+    assert backend.phonemize(["zorblax", "quuxle"]) == {"zorblax": None, "quuxle": None}
+    converter = make_converter()
+    converter.espeak = backend
+    converter._prefetch_ipa(["zorblax", "quuxle"])
+    assert converter.ipa_cache["zorblax"] == "zorblax" and converter.ipa_cache["quuxle"] == "quuxle"
+    converter.close()
+
+
+class FakeLibrary:
+    """Stands in for libespeak-ng, phonemizing a whole text as one clause."""
+
+    def espeak_TextToPhonemes(self, text_ptr, text_mode: int, phoneme_mode: int) -> bytes | None:
+        word: str = text_ptr.contents.value.decode("utf-8")
+        text_ptr.contents.value = None
+        return PHONEMES[word].encode("utf-8") or None
+
+
+def test_library_phonemizes_each_word(monkeypatch):
+    monkeypatch.setattr(subprocess, "run", pytest.fail)
+    backend = latin2shaw.EspeakBackend()
+    backend._library, backend._library_pid = FakeLibrary(), os.getpid()
+    assert backend.phonemize(["quuxle", "grzmph", "zorblax"]) == {
+        "quuxle": "kw'Vks@l", "grzmph": None, "zorblax": "z'o@blaks"}
@@ -0,0 +1,55 @@
+"""
+Entities and character references in HTML text, which are decoded before conversion and escaped again after it.
+
+Each test pins a deliberate change from the baseline, which converted the names of entities as if they were words.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+def convert_html(converter, body: str) -> str:
+    return converter.convert_text(f"<p>{body}</p>", "html").removeprefix("<p>").removesuffix("</p>")
+
+
+def test_quot_is_educated_like_a_quotation_mark(converter):
+    # The baseline kept &quot; and the word after it unconverted: '&quot;·𐑞 cat&quot; 𐑮𐑧𐑛.'
+    assert convert_html(converter, "&quot;The cat&quot; read.") == "&laquo;·𐑞 𐑒𐑨𐑑&raquo; 𐑮𐑧𐑛."
+    assert convert_html(converter, "&quot;The cat&quot; read.") == convert_html(converter, '"The cat" read.')
+
+
+def test_nbsp_becomes_the_character(converter):
+    # The baseline left "The&nbsp;" unconverted
+    assert convert_html(converter, "The&nbsp;cat") == "𐑞 𐑒𐑨𐑑"
+
+
+def test_escaped_tags_are_text(converter):
+    # What a reader sees as "<b>" is text, so the words in it are converted and the brackets escaped again
+    assert convert_html(converter, "&lt;b&gt;The cat&lt;/b&gt;") == "&lt;𐑚𐑦[p]&gt;·𐑞 cat&lt;/b&gt;"
+    assert convert_html(converter, "a &lt; b") == "𐑩 &lt; 𐑚𐑦[p]"
+
+
+def test_amp_is_escaped_again(converter):
+    # The baseline spelt out "amp": '𐑒𐑨𐑑 &𐑨𐑥𐑐[p]; 𐑛𐑪𐑜'
+    assert convert_html(converter, "cat &amp; dog") == "𐑒𐑨𐑑 &amp; 𐑛𐑪𐑜"
+
+
+@pytest.mark.parametrize("apostrophe", ["&#39;", "&#x27;", "&#8217;", "&rsquo;", "&apos;"])
+def test_numeric_apostrophes_are_apostrophes(converter, apostrophe):
+    # The baseline split the possessive off: 'Bob&#39;𐑧𐑕[p]'
+    assert convert_html(converter, f"Bob{apostrophe}s dog") == "𐑚𐑪𐑚𐑟 𐑛𐑪𐑜"
+
+
+def test_numeric_references_become_their_characters(converter):
+    assert convert_html(converter, "cat &#x2014; dog &#8212; cat") == "𐑒𐑨𐑑 — 𐑛𐑪𐑜 — 𐑒𐑨𐑑"
+    # As the characters themselves would; the baseline turned these references alone into &laquo; and &raquo;
+    assert convert_html(converter, "&#8220;The cat&#8221;") == convert_html(converter, "“The cat”") == "“·𐑞 𐑒𐑨𐑑”"
+
+
+def test_unknown_entities_are_kept_as_text(converter):
+    assert convert_html(converter, "&unknown; cat") == "&amp;𐑩𐑯𐑯𐑴𐑯[p]; 𐑒𐑨𐑑"
+
+
+def test_plain_text_is_not_decoded(converter):
+    # "&amp;" is just text here, whose "&" BeautifulSoup escapes
+    assert converter.convert_text("cat &amp; dog", "plain") == "𐑒𐑨𐑑 &amp;𐑨𐑥𐑐[p]; 𐑛𐑪𐑜\n"
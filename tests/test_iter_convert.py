@@ -0,0 +1,61 @@
+"""iter_convert, which converts a stream a block of lines at a time, and the cutting of overlong lines."""
+from __future__ import annotations
+
+import io
+
+import pytest
+
+from conftest import CORPUS
+
+PLAIN: list[str] = [text for text in CORPUS if not text.startswith("<")]
+
+
+def iter_converted(converter, text: str, chunk_size: int) -> str:
+    return "".join(converter.iter_convert(io.StringIO(text), chunk_size))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 65536])
+def test_iter_convert_matches_convert_text(converter, chunk_size):
+    for text in PLAIN:
+        assert iter_converted(converter, text, chunk_size) == converter.convert_text(text), text
+    document = "\n".join(PLAIN) + "\n"
+    assert iter_converted(converter, document, chunk_size) == converter.convert_text(document)
+
+
+def test_iter_convert_html_in_one_go(converter):
+    text = "<!DOCTYPE html>\n<p>The cat\nread Bob's dog.</p>\n<p>Of course</p>"
+    assert iter_converted(converter, text, 5) == converter.convert_text(text)
+
+
+@pytest.fixture()
+def short_fragments(make_converter):
+    converter = make_converter()
+    converter.max_fragment_length = 40
+    yield converter
+    converter.close()
+
+
+def test_long_line_is_fully_converted(short_fragments, converter):
+    line = " ".join(["the cat read the dog and it is kind"] * 30)
+    pieces = short_fragments._split_long_line(line)
+    assert len(pieces) > 1 and "".join(pieces) == line
+    assert all(len(piece) < short_fragments.max_fragment_length for piece in pieces)
+    converted = short_fragments.convert_text(line)
+    assert converted == converter.convert_text(line)
+    assert not any(character.isascii() and character.isalpha() for character in converted)
+    assert iter_converted(short_fragments, line, 16) == converted
+
+
+def test_long_line_without_spaces_is_cut_hard(short_fragments):
+    line = "x" * 100
+    assert short_fragments._split_long_line(line) == ["x" * 39, "x" * 39, "x" * 22]
+
+
+def test_no_cut_between_have_and_to(short_fragments, converter):
+    line = " ".join(["i have to go and it used to wind", "i have to the dog", "it used to"] * 10)
+    pieces = short_fragments._split_long_line(line)
+    assert len(pieces) > 1 and "".join(pieces) == line
+    for before, after in zip(pieces, pieces[1:]):
+        assert after.split()[0] != "to", (before, after)
+        assert before.split()[-2:] not in (["have", "to"], ["used", "to"]), (before, after)
+    assert short_fragments.convert_text(line) == converter.convert_text(line)
@@ -0,0 +1,111 @@
+"""The conversion journal, and how the stdin/stdout modes answer requests that fail."""
+from __future__ import annotations
+
+import io
+import json
+import subprocess
+
+import pytest
+
+import latin2shaw
+from conftest import converter_command, decode_frames, encode_frames
+
+
+def test_journal_round_trips_across_runs(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = latin2shaw.ConversionJournal(path, "1")
+    journal.record("The cat", "auto", "𐑞 𐑒𐑨𐑑\n")
+    journal.record("a\nb", "html", "𐑩\n𐑚 ‹𐑒›")
+    assert journal.get("The cat") == "𐑞 𐑒𐑨𐑑\n"
+    journal.close()
+
+    journal = latin2shaw.ConversionJournal(path, "1")
+    # Only offsets are kept in memory; results are read back from the file
+    assert all(isinstance(offset, int) for offset in journal._offsets.values())
+    assert journal.get("a\nb", "html") == "𐑩\n𐑚 ‹𐑒›"
+    assert journal.get("a\nb", "plain") is None and journal.get("The dog") is None
+    journal.record("The dog", "auto", "𐑞 𐑛𐑪𐑜\n")
+    # Reads in between don't move where records are appended
+    assert journal.get("The cat") == "𐑞 𐑒𐑨𐑑\n" and journal.get("The dog") == "𐑞 𐑛𐑪𐑜\n"
+    assert (journal.reused, journal.recorded) == (3, 1)
+    journal.close()
+    with open(path, "rb") as file:
+        assert [json.loads(line).get("text") for line in file] == [None, "𐑞 𐑒𐑨𐑑\n", "𐑩\n𐑚 ‹𐑒›", "𐑞 𐑛𐑪𐑜\n"]
+
+
+def test_journal_drops_a_torn_record(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    journal = latin2shaw.ConversionJournal(path, "1")
+    journal.record("one", "auto", "𐑢𐑳𐑯")
+    journal.close()
+    with open(path, "ab") as file:
+        file.write(b'{"key": "abc", "te')
+
+    journal = latin2shaw.ConversionJournal(path, "1")
+    assert journal.get("one") == "𐑢𐑳𐑯"
+    journal.record("two", "auto", "𐑑𐑵")
+    journal.close()
+    assert latin2shaw.ConversionJournal(path, "1").get("two") == "𐑑𐑵"
+
+
+def test_journal_of_another_version_is_started_again(tmp_path, capsys):
+    path = str(tmp_path / "run.jsonl")
+    journal = latin2shaw.ConversionJournal(path, "1")
+    journal.record("one", "auto", "𐑢𐑳𐑯")
+    journal.close()
+    journal = latin2shaw.ConversionJournal(path, "2")
+    assert journal.get("one") is None
+    assert "different converter version" in capsys.readouterr().err
+    journal.close()
+    with open(path, "rb") as file:
+        assert [json.loads(line) for line in file] == [{"version": "2"}]
+
+
+def test_errors_are_empty_text_in_version_1_and_error_frames_in_version_2():
+    output = io.BytesIO()
+    stream = latin2shaw.RequestStream(output)
+    stream.respond_error("7", "timed out")
+    assert output.getvalue() == b"7:\n"
+
+    output = io.BytesIO()
+    stream = latin2shaw.RequestStream(output)
+    stream.feed(b"PROTOCOL 2\n")
+    stream.respond_error(7, "conversion failed")
+    payload = output.getvalue().split(b"\n", 1)[1][latin2shaw._FRAME_HEADER.size:]
+    assert json.loads(payload) == {"id": 7, "error": "conversion failed"}
+
+
+def response_lines(stdout: bytes) -> list[bytes]:
+    # Plain text results end with a newline of their own
+    return sorted(line for line in stdout.splitlines() if line)
+
+
+def run_stdin_mode(data_dir, journal_path: str, workers: int, requests: bytes) -> tuple[bytes, str]:
+    script = (f"journal = latin2shaw.ConversionJournal({journal_path!r}, converter._result_cache_version())\n"
+              f"converter.run_stdin_stdout_mode({workers}, journal=journal)\n"
+              f"journal.close()\n")
+    child = subprocess.run(converter_command(data_dir, script), input=requests, capture_output=True, timeout=120)
+    assert child.returncode == 0, child.stderr.decode()
+    return child.stdout, child.stderr.decode()
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_stdin_mode_answers_failures_and_reuses_the_journal(data_dir, tmp_path, workers):
+    journal_path = str(tmp_path / "run.jsonl")
+    requests = b"1:The cat\n2:fail\n3:The dog\n"
+    stdout, _ = run_stdin_mode(data_dir, journal_path, workers, requests)
+    assert response_lines(stdout) == ["1:𐑞 𐑒𐑨𐑑".encode(), b"2:", "3:𐑞 𐑛𐑪𐑜".encode()]
+
+    stdout, stderr = run_stdin_mode(data_dir, journal_path, workers, requests)
+    assert response_lines(stdout) == ["1:𐑞 𐑒𐑨𐑑".encode(), b"2:", "3:𐑞 𐑛𐑪𐑜".encode()]
+    # The failed request was tried again rather than answered from the journal
+    assert "reused 2 results, recorded 0" in stderr
+
+    requests = encode_frames({"id": 1, "text": "The cat"}, {"id": 2, "text": "fail"})
+    stdout, _ = run_stdin_mode(data_dir, journal_path, workers, b"PROTOCOL 2\n" + requests)
+    handshake, frames = stdout.split(b"\n", 1)
+    assert handshake == b"PROTOCOL 2 OK"
+    messages, rest = decode_frames(frames)
+    assert not rest
+    assert sorted(messages, key=lambda message: message["id"]) == [
+        {"id": 1, "text": "𐑞 𐑒𐑨𐑑\n"}, {"id": 2, "error": "conversion failed"}]
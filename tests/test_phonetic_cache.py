@@ -0,0 +1,54 @@
+"""Versioning of the phonetic fallback's caches, and the SQLite cache behind them."""
+from __future__ import annotations
+
+import ctypes.util
+import os
+import sqlite3
+import stat
+
+import latin2shaw
+
+
+def fake_espeak(directory, version: str) -> str:
+    """Write an espeak command that only reports its version, returning the directory to put on PATH."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "espeak")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"#!/bin/sh\necho '{version}'\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return str(directory)
+
+
+def test_espeak_version_follows_the_command(monkeypatch, tmp_path):
+    monkeypatch.setattr(ctypes.util, "find_library", lambda name: None)
+    versions: list[str] = []
+    for version in ["eSpeak NG text-to-speech: 1.50", "eSpeak NG text-to-speech: 1.51"]:
+        monkeypatch.setenv("PATH", fake_espeak(tmp_path / version.split()[-1], version))
+        versions.append(latin2shaw.EspeakBackend().version)
+    assert versions[0].endswith("1.50") and versions[1].endswith("1.51")
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    assert latin2shaw.EspeakBackend().version == "no espeak"
+
+
+def test_phonetic_version_includes_the_espeak_backend(converter):
+    assert converter.espeak.version in converter._phonetic_version()
+
+
+def test_sqlite_cache_flushes_access_times_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = latin2shaw.SqliteCache(path, "1", flush_every=4)
+    for number in range(10):
+        cache.put(str(number), str(number))
+    cache.flush()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE entries SET used = 0")
+    for number in range(10):
+        assert cache.get(str(number)) == str(number)
+        assert len(cache._touched) < cache.flush_every
+    with sqlite3.connect(path) as conn:
+        # Eight of the ten lookups were written back as they were made, the rest wait for the next flush
+        assert conn.execute("SELECT COUNT(*) FROM entries WHERE used > 0").fetchone()[0] == 8
+    cache.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM entries WHERE used > 0").fetchone()[0] == 10
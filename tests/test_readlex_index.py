@@ -0,0 +1,59 @@
+"""The memory-mapped ReadLex index against the JSON it is compiled from."""
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+import latin2shaw
+from conftest import CORPUS, READLEX
+
+
+@pytest.fixture()
+def index_path(data_dir, tmp_path) -> str:
+    path = str(tmp_path / "readlex.idx")
+    assert latin2shaw.build_readlex_index(os.path.join(data_dir, "readlex.json"), path) == len(READLEX)
+    return path
+
+
+def test_index_round_trips_every_entry(index_path):
+    index = latin2shaw.ReadLexIndex(index_path)
+    assert len(index) == len(READLEX)
+    assert sorted(index) == sorted(READLEX)
+    assert {word: index[word] for word in index} == READLEX
+
+
+def test_index_lookups_of_missing_words(index_path):
+    index = latin2shaw.ReadLexIndex(index_path)
+    for word in ["", "zorblax", "cats", "the ", "THE", "𐑞"]:
+        assert word not in index
+        assert index.get(word) is None
+        with pytest.raises(KeyError):
+            index[word]
+
+
+def test_index_of_random_words(tmp_path):
+    import random
+
+    rng = random.Random(1)
+    alphabet = "abcdefghijklmnopqrstuvwxyz' -éø𐑞"
+    readlex = {
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))): [
+            {"tag": rng.choice(["0", "NN", "VB", "VBD", "NNP"]), "Shaw": "".join(rng.choice("𐑐𐑑𐑒𐑓⸰") for _ in range(4))}
+            for _ in range(rng.randint(1, 3))
+        ]
+        for _ in range(2000)
+    }
+    json_path, index_path = str(tmp_path / "readlex.json"), str(tmp_path / "readlex.idx")
+    with open(json_path, "w", encoding="utf-8") as file:
+        json.dump(readlex, file, ensure_ascii=False)
+    latin2shaw.build_readlex_index(json_path, index_path)
+    index = latin2shaw.ReadLexIndex(index_path)
+    assert dict(index.items()) == readlex
+
+
+def test_converter_gives_the_same_output_from_the_index(make_converter, converter, index_path):
+    indexed = make_converter(index_path=index_path)
+    assert isinstance(indexed.readlex_dict, latin2shaw.ReadLexIndex)
+    assert indexed.convert_many(CORPUS) == converter.convert_many(CORPUS)
@@ -0,0 +1,72 @@
+"""ReadLexWord's resolved spellings against the loops over a word's entries that convert() used to run per token."""
+from __future__ import annotations
+
+import random
+
+import latin2shaw
+from conftest import READLEX
+
+TAGS = ["0", "NN", "NNS", "NNP", "NNPS", "VB", "VBD", "JJ"]
+
+
+def loop_spelling(entries: list[dict[str, str]], tag: str, namer: bool) -> str | None:
+    """The spelling of a whole word, as convert() picked it from the entries."""
+    for i in entries:
+        # Match the part of speech for heteronyms, proper nouns to common nouns, and words with one pronunciation
+        if (i["tag"] == tag or (i["tag"] in ["NN", "0"] and tag == "NNP") or (i["tag"] in ["NNS", "0"] and tag == "NNPS")
+                or i["tag"] == "0"):
+            return ("·" if namer and not i["Shaw"].startswith("⸰") else "") + i["Shaw"]
+    return None
+
+
+def loop_base_spelling(entries: list[dict[str, str]], tag: str) -> str | None:
+    """The spelling of the part of a word before an apostrophe, as convert() picked it from the entries."""
+    for i in entries:
+        if i["tag"] == "0" or i["tag"] == tag:
+            return i["Shaw"]
+    return None
+
+
+def random_entries(rng: random.Random) -> list[dict[str, str]]:
+    return [{"tag": rng.choice(TAGS), "Shaw": rng.choice(["⸰", "", ""]) + f"𐑕{number}"}
+            for number in range(rng.randint(1, 4))]
+
+
+def check(entries: list[dict[str, str]]):
+    word = latin2shaw.ReadLexWord(entries)
+    assert word.first == entries[0]["Shaw"]
+    assert word.tag_dependent == (entries[0]["tag"] != "0")
+    for tag in TAGS + ["", "RB"]:
+        spelling = word.spelling(tag)
+        for namer in (False, True):
+            assert (spelling[namer] if spelling else None) == loop_spelling(entries, tag, namer), (entries, tag)
+        base_spelling = word.base_spelling(tag)
+        assert (base_spelling[0] if base_spelling else None) == loop_base_spelling(entries, tag), (entries, tag)
+    # An entry is unused if no tag, proper noun or not, picks it
+    picked = {loop_spelling(entries, tag, False) for tag in TAGS} | {loop_base_spelling(entries, tag) for tag in TAGS}
+    assert word.unused == sum(entry["Shaw"] not in picked for entry in entries), entries
+
+
+def test_readlex_words_match_entry_loops():
+    for entries in READLEX.values():
+        check(entries)
+
+
+def test_random_words_match_entry_loops():
+    rng = random.Random(22)
+    for _ in range(20000):
+        check(random_entries(rng))
+
+
+def test_report_matches_entry_loops():
+    rng = random.Random(23)
+    readlex = {f"word{number}": random_entries(rng) for number in range(3000)} | READLEX
+    resolved = latin2shaw.ResolvedReadLex(readlex)
+    report = resolved.report()
+    assert report["missing_default"] == sorted(word for word, entries in readlex.items()
+                                               if all(entry["tag"] != "0" for entry in entries))
+    assert report["ambiguous"] == sorted(word for word, entries in readlex.items()
+                                         if latin2shaw.ReadLexWord(entries).unused)
+    # Reporting resolves nothing for later lookups, which resolve each word once
+    assert not resolved._words
+    assert resolved.get("read") is resolved.get("read") and resolved.get("zorblax") is None
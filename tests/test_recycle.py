@@ -0,0 +1,78 @@
+"""Recycling a long-running converter's spaCy pipeline, and the MemoryBudget that decides when."""
+from __future__ import annotations
+
+import multiprocessing.connection
+
+import latin2shaw
+from conftest import BASELINE_OUTPUTS
+
+
+def convert_baseline(converter: latin2shaw.LatinToShavian) -> list[str]:
+    return [converter.convert_text(output["text"], output["mode"]) for output in BASELINE_OUTPUTS]
+
+
+def test_recycled_converter_matches_a_fresh_one(make_converter):
+    converter = make_converter()
+    try:
+        before = convert_baseline(converter)
+        nlp = converter.nlp
+        converter.recycle()
+        assert converter.nlp is not nlp and converter.recycles == 1
+        # Twice, since the first run after recycling fills the caches again
+        assert convert_baseline(converter) == convert_baseline(converter) == before
+    finally:
+        converter.close()
+    fresh = make_converter()
+    try:
+        assert convert_baseline(fresh) == before
+    finally:
+        fresh.close()
+
+
+def test_recycle_after_requests(make_converter):
+    converter = make_converter()
+    budget = latin2shaw.MemoryBudget(recycle_after=3)
+    try:
+        converter.recycle_if_due(budget)
+        converter.recycle_if_due(budget)
+        assert converter.recycles == 0 and budget.handled == 2
+        converter.recycle_if_due(budget)
+        assert converter.recycles == 1 and budget.handled == 0
+        # A batch counts all of its requests
+        converter.recycle_if_due(budget, 5)
+        assert converter.recycles == 2
+        converter.recycle_if_due(None, 100)
+        assert converter.recycles == 2
+    finally:
+        converter.close()
+
+
+def test_recycle_over_max_rss(make_converter, monkeypatch):
+    converter = make_converter()
+    budget = latin2shaw.MemoryBudget(max_rss_mb=400)
+    try:
+        monkeypatch.setattr(latin2shaw, "_current_rss_mb", lambda: 300.0)
+        converter.recycle_if_due(budget)
+        assert converter.recycles == 0
+        monkeypatch.setattr(latin2shaw, "_current_rss_mb", lambda: 500.0)
+        converter.recycle_if_due(budget)
+        assert converter.recycles == 1 and budget.handled == 0
+    finally:
+        converter.close()
+
+
+def test_pool_workers_retire_after_their_budget(converter):
+    pool = latin2shaw.WorkerPool(converter, 1, budget=latin2shaw.MemoryBudget(recycle_after=2))
+    results: dict[int, object] = {}
+    try:
+        for key, output in enumerate(BASELINE_OUTPUTS[:5]):
+            pool.submit(key, output["text"], output["mode"])
+        while pool.busy:
+            ready = multiprocessing.connection.wait(pool.wait_objects(), 60)
+            assert ready, "the pool stopped answering"
+            results.update(pool.process(ready))
+    finally:
+        pool.close()
+    assert [results[key] for key in range(5)] == [output["shavian"] for output in BASELINE_OUTPUTS[:5]]
+    # Retired after the second and fourth requests, and replaced by fresh forks
+    assert pool.recycled == pool.restarts == 2
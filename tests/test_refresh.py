@@ -0,0 +1,45 @@
+"""The refresh subcommand, which carries a result cache over to an updated ReadLex."""
+from __future__ import annotations
+
+import json
+import os
+import runpy
+import sys
+
+import pytest
+
+import latin2shaw
+from conftest import CORPUS, READLEX
+
+
+def run_main(monkeypatch, *argv: str):
+    """Run the converter's command line in this process, so that it uses the stub spaCy pipeline."""
+    monkeypatch.setattr(sys, "argv", ["latin2shaw.py", *argv])
+    with pytest.raises(SystemExit) as exit_info:
+        runpy.run_path(latin2shaw.__file__, run_name="__main__")
+    assert exit_info.value.code in (0, None)
+
+
+@pytest.mark.parametrize("flags", [[], ["--no-ner"], ["--full-pipeline"], ["--no-ner", "--pipeline-phrases"]])
+def test_refresh_keeps_unaffected_entries(make_converter, data_dir, monkeypatch, tmp_path, capsys, flags):
+    options = {"ner": "--no-ner" not in flags, "adaptive_pipeline": "--full-pipeline" not in flags,
+               "pipeline_phrases": "--pipeline-phrases" in flags}
+    old_path, new_path = os.path.join(data_dir, "readlex.json"), str(tmp_path / "readlex.json")
+    cache_path = str(tmp_path / "results.sqlite")
+    texts = [text for text in CORPUS if text.startswith("The")]
+    converter = make_converter(result_cache_path=cache_path, **options)
+    converter.convert_many(texts)
+    converter.close()
+
+    # Only the texts with "dog" in them looked it up
+    with open(new_path, "w", encoding="utf-8") as file:
+        json.dump(READLEX | {"dog": [{"tag": "NN", "Shaw": "𐑛𐑭𐑜"}]}, file, ensure_ascii=False)
+    run_main(monkeypatch, "--readlex-path", new_path, "--phrases-path", os.path.join(data_dir, "phrases.csv"),
+             "--result-cache", cache_path, *flags, "refresh", "--old-readlex-path", old_path)
+    with_dog = sum("dog" in text for text in texts)
+    assert f"kept {len(texts) - with_dog} cached results, dropped {with_dog}" in capsys.readouterr().err
+
+    refreshed = make_converter(readlex_path=new_path, result_cache_path=cache_path, **options)
+    assert refreshed.convert_many(texts) == make_converter(readlex_path=new_path, **options).convert_many(texts)
+    assert refreshed.result_cache.info()["disk_hits"] == len(texts) - with_dog
+    refreshed.close()
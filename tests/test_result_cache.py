@@ -0,0 +1,24 @@
+"""The in-memory tier of the result cache."""
+from __future__ import annotations
+
+import latin2shaw
+
+
+def test_memory_tier_forgets_the_least_recently_used():
+    cache = latin2shaw.ResultCache("1", max_entries=2)
+    cache.put("a", "𐑩")
+    cache.put("b", "𐑚")
+    assert cache.get("a") == "𐑩"
+    cache.put("c", "𐑒")
+    assert cache.get("b") is None
+    assert cache.get("a") == "𐑩" and cache.get("c") == "𐑒"
+    assert cache.info() | {"hit_rate": 0} == {"hits": 3, "disk_hits": 0, "misses": 1, "hit_rate": 0, "currsize": 2,
+                                               "maxsize": 2}
+
+
+def test_memory_tier_can_be_disabled(tmp_path):
+    cache = latin2shaw.ResultCache("1", max_entries=0, path=str(tmp_path / "results.sqlite"))
+    cache.put("a", "𐑩")
+    assert cache.info()["currsize"] == 0
+    assert cache.get("a") == "𐑩" and cache.disk_hits == 1
+    cache.close()
@@ -0,0 +1,45 @@
+"""The single-pass HTML scanner against the regular expression split convert_text used before it."""
+from __future__ import annotations
+
+import random
+import re
+
+import pytest
+
+STYLE_PATTERN = r"(<style\b[^>]*>.*?</style>)"
+SCRIPT_PATTERN = r"(<script\b[^>]*>.*?</script>)"
+HTML_PATTERN = r"(?!(?:<style[^>]*?>.*?</style>|<script[^>]*?>.*?</script>))(<.*?>)"
+
+
+def regex_split(text: str) -> list[tuple[bool, str]]:
+    """Split text into (is_markup, part) pairs as the old regular expressions did, leaving out empty parts."""
+    parts: list[tuple[bool, str]] = []
+    for part in re.split(f"{STYLE_PATTERN}|{SCRIPT_PATTERN}|{HTML_PATTERN}", text, flags=re.DOTALL):
+        if not part:
+            continue
+        markup = any(re.fullmatch(pattern, part, flags=re.DOTALL)
+                     for pattern in (STYLE_PATTERN, SCRIPT_PATTERN, HTML_PATTERN))
+        parts.append((markup, part))
+    return parts
+
+
+def scanned(converter, text: str) -> list[tuple[bool, str]]:
+    return [(kind != "text", part) for kind, part in converter._scan_html(text)]
+
+
+PIECES = ["<p>", "</p>", "<br/>", "<style>", "</style>", "<script type='x'>", "</script>", "<styles>", "<scripts>",
+          "<", ">", "a < b", "c > d", "The cat", " read", "\n", "<!-- note -->", "<a href='<x>'>", "&amp;", "'s"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_scanner_matches_regex_split(converter, seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+        assert scanned(converter, text) == regex_split(text), text
+
+
+def test_scanner_on_a_document(converter):
+    text = ("<!DOCTYPE html><html><head><style>p {color:red}</style><script>var a = '<b>';</script></head>"
+            "<body><p class=\"x\">The cat read Bob's dog.</p></body></html>")
+    assert scanned(converter, text) == regex_split(text)
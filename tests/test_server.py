@@ -0,0 +1,110 @@
+"""ConversionServer over local TCP, run in a subprocess with the test converter."""
+from __future__ import annotations
+
+import re
+import signal
+import socket
+import subprocess
+
+import pytest
+
+from conftest import converter_command, decode_frames, encode_frames
+
+
+@pytest.fixture(params=[0, 2], ids=["thread", "workers"])
+def server(request, data_dir):
+    """The address of a server on an ephemeral port, converting in its thread or in two workers."""
+    child = subprocess.Popen(converter_command(data_dir, f"converter.run_server_mode('127.0.0.1:0', {request.param})\n"),
+                             stderr=subprocess.PIPE, text=True)
+    try:
+        for line in child.stderr:
+            if line.startswith("READY"):
+                break
+        match = re.search(r"address=(\S+):(\d+)$", line.strip())
+        assert match, line
+        yield request.param, (match[1], int(match[2]))
+    finally:
+        child.send_signal(signal.SIGTERM)
+        child.wait(timeout=30)
+        child.stderr.close()
+
+
+class Client:
+    """A protocol 2 connection to the server."""
+
+    def __init__(self, address: tuple[str, int]):
+        self.socket = socket.create_connection(address, timeout=60)
+        self.socket.sendall(b"PROTOCOL 2\n")
+        self.buffer: bytes = b""
+        while b"\n" not in self.buffer:
+            self.buffer += self.socket.recv(4096)
+        handshake, self.buffer = self.buffer.split(b"\n", 1)
+        assert handshake == b"PROTOCOL 2 OK"
+
+    def send(self, *messages: dict):
+        self.socket.sendall(encode_frames(*messages))
+
+    def receive(self, count: int) -> list[dict]:
+        """Wait for the next count responses, in the order they arrive."""
+        messages: list[dict] = []
+        while len(messages) < count:
+            received, self.buffer = decode_frames(self.buffer)
+            messages += received
+            if len(messages) < count:
+                data: bytes = self.socket.recv(65536)
+                assert data, "the server closed the connection"
+                self.buffer += data
+        assert len(messages) == count
+        return messages
+
+    def close(self):
+        self.socket.close()
+
+
+@pytest.fixture()
+def client(server):
+    connection = Client(server[1])
+    yield connection
+    connection.close()
+
+
+def test_conversion(client):
+    client.send({"id": 1, "text": "The cat"}, {"id": 2, "text": "<p>The dog</p>", "options": {"mode": "html"}})
+    assert sorted(client.receive(2), key=lambda message: message["id"]) == [
+        {"id": 1, "text": "𐑞 𐑒𐑨𐑑\n"}, {"id": 2, "text": "<p>𐑞 𐑛𐑪𐑜</p>"}]
+
+
+def test_responses_come_as_requests_finish(server, client):
+    if server[0] == 0:
+        pytest.skip("the conversion thread answers its requests in turn")
+    client.send({"id": "slow", "text": "sleep 2 The cat"})
+    client.send({"id": "quick", "text": "The dog"})
+    assert [message["id"] for message in client.receive(2)] == ["quick", "slow"]
+
+
+def test_cancel(client):
+    client.send({"id": 1, "text": "sleep 3 The cat"}, {"id": 1, "command": "cancel"}, {"id": 2, "text": "The dog"})
+    # Request 1 is answered at once, whether or not its conversion had started
+    assert client.receive(2) == [{"id": 1, "error": "cancelled"}, {"id": 2, "text": "𐑞 𐑛𐑪𐑜\n"}]
+
+
+def test_timeout(client):
+    client.send({"id": 1, "text": "sleep 3 The cat", "options": {"timeout": 0.5}})
+    assert client.receive(1) == [{"id": 1, "error": "timed out"}]
+
+
+def test_failed_conversion(client):
+    client.send({"id": 1, "text": "fail"}, {"id": 2, "text": "The cat"})
+    assert sorted(client.receive(2), key=lambda message: message["id"]) == [
+        {"id": 1, "error": "conversion failed"}, {"id": 2, "text": "𐑞 𐑒𐑨𐑑\n"}]
+
+
+def test_clients_are_served_at_once(server, client):
+    other = Client(server[1])
+    try:
+        other.send({"id": 1, "text": "The dog"})
+        client.send({"id": 1, "text": "The cat"})
+        assert client.receive(1) == [{"id": 1, "text": "𐑞 𐑒𐑨𐑑\n"}]
+        assert other.receive(1) == [{"id": 1, "text": "𐑞 𐑛𐑪𐑜\n"}]
+    finally:
+        other.close()
@@ -0,0 +1,23 @@
+"""Pipeline snapshots, which must only be loaded while they match what a fresh pipeline would be."""
+from __future__ import annotations
+
+import latin2shaw
+from conftest import CORPUS
+
+
+def test_snapshot_converts_like_a_fresh_pipeline(make_converter, converter, tmp_path):
+    snapshot_path = str(tmp_path / "snapshot")
+    make_converter(snapshot_path=snapshot_path).save_snapshot()
+    loaded = make_converter(snapshot_path=snapshot_path)
+    assert loaded._load_snapshot(loaded._snapshot_meta())
+    assert loaded.convert_many(CORPUS) == converter.convert_many(CORPUS)
+
+
+def test_snapshot_is_stale_once_the_tokenizer_rules_change(make_converter, monkeypatch, tmp_path, capsys):
+    snapshot_path = str(tmp_path / "snapshot")
+    make_converter(snapshot_path=snapshot_path).save_snapshot()
+    monkeypatch.setattr(latin2shaw, "TOKENIZER_INFIXES", latin2shaw.TOKENIZER_INFIXES + (r"[+]",))
+    converter = make_converter(snapshot_path=snapshot_path)
+    assert "out of date" in capsys.readouterr().err
+    # The new rule took effect, where the snapshot's tokeniser would have kept "a+b" whole
+    assert [token.text for token in converter.nlp.make_doc("a+b")] == ["a", "+", "b"]
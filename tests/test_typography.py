@@ -0,0 +1,67 @@
+"""educate_plain_text against the smartypants and BeautifulSoup post-processing it stands in for."""
+from __future__ import annotations
+
+import os
+import random
+
+import pytest
+
+import latin2shaw
+from conftest import CORPUS
+
+smartypants = pytest.importorskip("smartypants")
+bs4 = pytest.importorskip("bs4")
+
+
+def legacy_finish(text: str) -> str:
+    """_finish_text on plain text before educate_plain_text: smartypants, angle quotes, then a BeautifulSoup parse."""
+    text = smartypants.smartypants(text)
+    for key, value in {"&#8216;": "&lsaquo;", "&#8217;": "&rsaquo;", "&#8220;": "&laquo;", "&#8221;": "&raquo;"}.items():
+        text = text.replace(key, value)
+    return str(bs4.BeautifulSoup(text, features="html.parser"))
+
+
+def golden_texts() -> list[str]:
+    """The plain-text benchmark samples and seeded synthetic ones, with the plain texts of the test corpus."""
+    texts: list[str] = [text for text in CORPUS if not text.startswith("<")]
+    corpus_dir: str = latin2shaw.BENCHMARK_CORPUS_DIR
+    if os.path.isdir(corpus_dir):
+        for filename in sorted(os.listdir(corpus_dir)):
+            if filename.endswith(".txt"):
+                with open(os.path.join(corpus_dir, filename), "r", encoding="utf-8") as file:
+                    texts.append(file.read())
+    rng = random.Random(1)
+    texts += [latin2shaw._synthetic_apostrophe_text(rng), latin2shaw._synthetic_name_text(rng)]
+    # Paragraphs one at a time as well, since quotes at the start and end of a text are a case of their own
+    return texts + [paragraph for text in texts for paragraph in text.split("\n\n")]
+
+
+def check(text: str):
+    educated: str | None = latin2shaw.educate_plain_text(text)
+    assert educated is None or educated == legacy_finish(text), text
+
+
+@pytest.mark.parametrize("text", golden_texts())
+def test_golden_texts(text):
+    # The rules only look at punctuation and spacing, so Latin text exercises them as well as Shavian
+    check(text)
+
+
+def test_converted_corpus(converter):
+    for text in CORPUS:
+        is_html, fragments = converter._split_fragments(text)
+        if not is_html:
+            # What convert_text passes to _finish_text
+            check("".join(converter.convert(converter._postprocess_doc(converter.nlp(fragment))) if convertible
+                          else fragment for convertible, fragment in fragments if fragment))
+
+
+PIECES = ["'", '"', "''", "``", "--", "---", "...", ". . .", " ", "\n", "\t", "(", ")", "[", "-", ".", ",", "!", "?",
+          "a", "𐑒𐑨𐑑", "'s", "'em", "'90s", "9", "·𐑚𐑪𐑚"]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_punctuation(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        check("".join(rng.choice(PIECES) for _ in range(rng.randint(1, 14))))
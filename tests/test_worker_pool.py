@@ -0,0 +1,112 @@
+"""The fork-based WorkerPool, and the stdin/stdout mode that runs requests through it."""
+from __future__ import annotations
+
+import multiprocessing.connection
+import os
+import signal
+import subprocess
+import time
+
+import pytest
+
+import latin2shaw
+from conftest import BASELINE_OUTPUTS, converter_command, decode_frames, encode_frames
+
+
+def collect(pool: latin2shaw.WorkerPool, timeout: float = 60) -> dict[int, object]:
+    """Wait for every request submitted to pool, returning the results by key."""
+    results: dict[int, object] = {}
+    deadline: float = time.monotonic() + timeout
+    while pool.busy:
+        remaining: float = deadline - time.monotonic()
+        assert remaining > 0, "the pool stopped answering"
+        results.update(pool.process(multiprocessing.connection.wait(pool.wait_objects(), remaining)))
+    return results
+
+
+@pytest.fixture()
+def slow_converter(make_converter, tmp_path, monkeypatch):
+    """A converter whose workers hang on the text "hang" until tmp_path/release exists."""
+    converter = make_converter()
+    split_fragments = converter._split_fragments
+
+    def hanging_split_fragments(text: str, mode: str = "auto"):
+        if text == "crash":
+            os._exit(1)
+        while text == "hang" and not os.path.exists(tmp_path / "release"):
+            time.sleep(0.05)
+        return split_fragments(text, mode)
+
+    monkeypatch.setattr(converter, "_split_fragments", hanging_split_fragments)
+    yield converter
+    converter.close()
+
+
+def test_pool_matches_the_baseline(converter):
+    pool = latin2shaw.WorkerPool(converter, 2)
+    try:
+        for key, output in enumerate(BASELINE_OUTPUTS):
+            pool.submit(key, output["text"], output["mode"])
+        results = collect(pool)
+    finally:
+        pool.close()
+    assert [results[key] for key in range(len(BASELINE_OUTPUTS))] == [output["shavian"] for output in BASELINE_OUTPUTS]
+
+
+def test_killed_worker_request_is_answered(slow_converter, tmp_path):
+    pool = latin2shaw.WorkerPool(slow_converter, 2)
+    try:
+        pool.submit(0, "hang")
+        pool.submit(1, "The cat")
+        holder = next(worker for worker in pool._workers if worker.current and worker.current[0] == 0)
+        # The replacement converts the request straight away
+        (tmp_path / "release").touch()
+        os.kill(holder.process.pid, signal.SIGKILL)
+        results = collect(pool)
+    finally:
+        pool.close()
+    assert results == {0: slow_converter.convert_text("hang"), 1: "𐑞 𐑒𐑨𐑑\n"}
+    assert pool.restarts == 1
+
+
+def test_request_that_kills_every_worker_fails(slow_converter):
+    pool = latin2shaw.WorkerPool(slow_converter, 2, max_attempts=3)
+    try:
+        pool.submit(0, "crash")
+        pool.submit(1, "The dog")
+        results = collect(pool)
+    finally:
+        pool.close()
+    assert results == {0: None, 1: "𐑞 𐑛𐑪𐑜\n"}
+    assert pool.restarts == 3
+
+
+def run_stdin_mode(data_dir: str, workers: int, requests: bytes) -> list[dict]:
+    """Send protocol 2 requests to the stdin/stdout mode, returning the responses in the order they came."""
+    child = subprocess.run(converter_command(data_dir, f"converter.run_stdin_stdout_mode({workers})\n"),
+                           input=b"PROTOCOL 2\n" + requests, capture_output=True, timeout=120)
+    assert child.returncode == 0, child.stderr.decode()
+    handshake, frames = child.stdout.split(b"\n", 1)
+    assert handshake == b"PROTOCOL 2 OK"
+    messages, rest = decode_frames(frames)
+    assert not rest
+    return messages
+
+
+def test_workers_give_the_same_output_as_one_process(data_dir):
+    requests = encode_frames(*({"id": key, "text": output["text"], "options": {"mode": output["mode"]}}
+                               for key, output in enumerate(BASELINE_OUTPUTS)))
+    single = run_stdin_mode(data_dir, 0, requests)
+    pooled = run_stdin_mode(data_dir, 2, requests)
+    assert sorted(pooled, key=lambda message: message["id"]) == single
+    assert [message["text"] for message in single] == [output["shavian"] for output in BASELINE_OUTPUTS]
+
+
+def test_stdin_workers_answer_after_a_worker_dies(data_dir, tmp_path):
+    marker = str(tmp_path / "crashed")
+    requests = encode_frames({"id": 1, "text": f"crash once {marker}"}, {"id": 2, "text": "crash"},
+                             {"id": 3, "text": "The cat"})
+    responses = sorted(run_stdin_mode(data_dir, 2, requests), key=lambda message: message["id"])
+    # The first worker to try request 1 died, and its replacement converted it
+    assert os.path.exists(marker) and "text" in responses[0]
+    assert responses[1:] == [{"id": 2, "error": "conversion failed"}, {"id": 3, "text": "𐑞 𐑒𐑨𐑑\n"}]